@@ -7,21 +7,83 @@ Usage:
     python batch_download.py --count 5
     python batch_download.py --symbols HDFCB,IOCL,RELIANCE
     python batch_download.py --all
+    python batch_download.py --industry "Banks,IT - Software"
+    python batch_download.py --screen "Market Capitalization > 5000 and Debt < 1000"
+    python batch_download.py --all --pack 25
+    python batch_download.py --all --workers 4 --hits-per-minute 5000
+    python batch_download.py --all --resume
+    python batch_download.py --all --pipeline
+    python batch_download.py --all --dry-run
+    python batch_download.py --all --dropbox /Bloomberg
+    python batch_download.py --all --pack 50 --backend api
 """
 
 import argparse
-import pandas as pd
+from contextlib import ExitStack
 from pathlib import Path
-from download_bloomberg_data import BloombergDataDownloader
+# The stores, the screener, the template catalog (pandas / numpy / pyarrow),
+# the worker pool and the Dropbox client are imported on the code paths that
+# use them, so --help and small runs do not pay for them
+from download_bloomberg_data import BloombergDataDownloader, add_output_arguments, parse_formats
+from job_journal import JobJournal
+from listing_map import ListingMap
+from metrics import MetricsSink
+from pipeline import Pipeline
+from rate_limiter import RateLimiter, RateLimitExceeded
+from refresh_cache import FRESH, RefreshCache, load_result_dates, parse_ttl
+from refresh_backends import BACKENDS, INVALID_SECURITY, make_backend
+from symbol_universe import DEFAULT_CSV, SymbolUniverse, bare_symbol
+from symbol_validation import DEFAULT_INVALID_TTL, InvalidSymbolCache, preflight, print_preflight
 import time
 
 
-def load_symbols_from_csv(csv_path: str = "BB_symbol.csv", count: int = None):
-    """Load Bloomberg symbols from CSV file"""
-    df = pd.read_csv(csv_path)
+def print_plan(plan: dict, template_path: str = None, fields: str = None) -> None:
+    """Dry-run report: what would be refreshed, why, and what the cache saves"""
+    from template_catalog import compile_template
+
+    reasons = {}
+    for symbol in plan['refresh']:
+        reasons.setdefault(plan['reasons'][symbol], []).append(symbol)
     
-    # Extract symbol from Ticker column (remove " Equity" suffix)
-    symbols = df['Ticker'].str.replace(' Equity', '', regex=False).tolist()
+    print(f"\n{'='*60}")
+    print(f"🧪 DRY RUN: refresh plan")
+    print(f"{'='*60}")
+    print(f"🔄 Would refresh: {len(plan['refresh'])}")
+    for reason, symbols in sorted(reasons.items(), key=lambda item: -len(item[1])):
+        sample = ", ".join(symbols[:5]) + (", ..." if len(symbols) > 5 else "")
+        print(f"   {reason:24s} {len(symbols):5d}  ({sample})")
+    print(f"♻️  Would serve from cache ({FRESH}): {len(plan['skip'])}")
+    
+    saved = f"~{plan['saved_seconds']:.0f}s of terminal time"
+    if plan['skip'] and template_path and Path(template_path).exists():
+        per_symbol = compile_template(template_path, fields).data_formulas
+        saved += (f", ~{per_symbol * len(plan['skip']):,} data hits "
+                  f"({per_symbol} BDH/BDP/BDS formula cells per symbol)")
+    print(f"💰 Saves {saved}")
+    print(f"{'='*60}\n")
+
+
+FAKE_PROFILE_KEYS = {'sigma': 'latency_sigma', 'invalid': 'invalid_rate',
+                     'timeout': 'timeout_rate', 'jitter': 'jitter', 'seed': 'seed'}
+
+
+def parse_fake_profile(value: str) -> dict:
+    """Turn "sigma=0.5,invalid=0.02" into FakeBackend keyword arguments"""
+    options = {}
+    for part in (value or "").split(","):
+        if not part.strip():
+            continue
+        key, _, number = part.partition("=")
+        key = key.strip().lower()
+        if key not in FAKE_PROFILE_KEYS:
+            raise ValueError(f"Unknown fake profile key '{key}' (use: {', '.join(FAKE_PROFILE_KEYS)})")
+        options[FAKE_PROFILE_KEYS[key]] = int(number) if key == 'seed' else float(number)
+    return options
+
+
+def load_symbols_from_csv(csv_path: str = "BB_symbol.csv", count: int = None):
+    """Load Bloomberg symbols (Ticker without " IN Equity") via the cached universe index"""
+    symbols = list(SymbolUniverse.load(csv_path).symbols)
     
     if count:
         symbols = symbols[:count]
@@ -29,39 +91,146 @@ def load_symbols_from_csv(csv_path: str = "BB_symbol.csv", count: int = None):
     return symbols
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description='Batch download Bloomberg data for multiple symbols'
-    )
-    
-    group = parser.add_mutually_exclusive_group(required=True)
-    group.add_argument('--count', '-c', type=int,
-                      help='Download first N symbols from BB_symbol.csv')
-    group.add_argument('--symbols', '-s',
-                      help='Comma-separated list of symbols (e.g., HDFCB,IOCL,RELIANCE)')
-    group.add_argument('--all', '-a', action='store_true',
-                      help='Download all symbols from BB_symbol.csv')
-    
-    parser.add_argument('--output_dir', '-o', default='./output',
-                       help='Output directory (default: ./output)')
-    parser.add_argument('--template', '-t',
-                       default=r'C:\blp\data\FA1_vwijagme.xlsx',
-                       help='Bloomberg Excel template path')
-    parser.add_argument('--wait', '-w', type=int, default=15,
-                       help='Seconds to wait for Bloomberg refresh (default: 15)')
-    parser.add_argument('--delay', '-d', type=int, default=5,
-                       help='Seconds to wait between downloads (default: 5)')
-    
-    args = parser.parse_args()
-    
+def run_sequential(downloader, packs: list, wait_seconds: int, delay: float,
+                   limiter=None, hits_per_symbol: int = 0):
+    """
+    Refresh packs one after another with a single downloader
+
+    Yields:
+        One outcome dict per pack, shaped like parallel_batch.run_parallel's
+    """
+    total = sum(len(pack) for pack in packs)
+    done = 0
+    for n, pack in enumerate(packs, 1):
+        print(f"\n{'='*60}")
+        if len(pack) == 1:
+            print(f"Progress: [{done + 1}/{total}] - {pack[0]}")
+        else:
+            print(f"Progress: [{done + 1}-{done + len(pack)}/{total}] - "
+                  f"pack {n}/{len(packs)}")
+        print(f"{'='*60}\n")
+        
+        outcome = {'worker': 1, 'symbols': pack, 'results': [None] * len(pack),
+                   'errors': [None] * len(pack), 'error': None, 'rate_limited': False,
+                   'throttled': 0.0, 'elapsed': 0.0, 'pool': None, 'metrics': []}
+        start = time.monotonic()
+        try:
+            if limiter is not None:
+                outcome['throttled'] = limiter.acquire(hits_per_symbol * len(pack))
+        except RateLimitExceeded as e:
+            print(f"🛑 {e}; stopping")
+            for rest in packs[n - 1:]:
+                yield dict(outcome, symbols=rest, results=[None] * len(rest),
+                           errors=[str(e)] * len(rest), error=str(e), rate_limited=True)
+            return
+        
+        try:
+            if len(pack) == 1:
+                outcome['results'] = [downloader.download_data(pack[0], wait_seconds=wait_seconds)]
+            else:
+                outcome['results'] = downloader.download_pack(pack, wait_seconds=wait_seconds)
+        except Exception as e:
+            print(f"❌ Failed to download {', '.join(pack)}: {e}")
+            outcome['error'] = str(e)
+        outcome['errors'] = [
+            None if result else (downloader.errors.get(symbol) or outcome['error'] or "download failed")
+            for symbol, result in zip(pack, outcome['results'])
+        ]
+        outcome['elapsed'] = time.monotonic() - start
+        outcome['metrics'] = downloader.drain_metrics()
+        pool = downloader.backend.pool
+        outcome['pool'] = dict(pool.stats) if pool is not None else None
+        done += len(pack)
+        yield outcome
+        
+        # Wait before next download (except for last pack)
+        if n < len(packs):
+            print(f"\n⏳ Waiting {delay} seconds before next download...")
+            time.sleep(delay)
+
+
+def run_batch(args, resources: ExitStack) -> None:
+    """
+    Select, refresh and report the symbols of one batch run
+
+    Args:
+        args: Parsed command line
+        resources: Stack the journal, caches, stores and metrics are registered
+                   on as they are opened, so they are flushed and closed however
+                   the run ends
+    """
     # Get symbols list
     if args.symbols:
-        symbols = [s.strip().upper() for s in args.symbols.split(',')]
+        symbols = [bare_symbol(s) for s in args.symbols.split(',') if s.strip()]
     elif args.all:
         symbols = load_symbols_from_csv()
+    elif args.industry:
+        try:
+            symbols = ListingMap.load().select(args.industry.split(','))
+        except KeyError as e:
+            print(f"❌ {e.args[0]} (see: python browse_symbols.py sector)")
+            return
+    elif args.screen:
+        from screener import ScreenError, screen_symbols
+
+        try:
+            screened = screen_symbols(args.screen)
+        except ScreenError as e:
+            print(f"❌ {e} (see: python screener.py --columns)")
+            return
+        symbols = screened['symbols']
+        print(f"🔎 Screen matched {screened['listings']} listings in "
+              f"{screened['elapsed_ms']:.1f} ms → {len(symbols)} Bloomberg symbols")
     else:
         symbols = load_symbols_from_csv(count=args.count)
     
+    # Leave out typos and symbols Bloomberg already rejected before any Excel work
+    invalid_cache = None
+    checked = None
+    if not args.no_validate:
+        invalid_cache = InvalidSymbolCache(Path(args.invalid_cache) if args.invalid_cache
+                                           else Path(args.output_dir) / "invalid_symbols.sqlite")
+        resources.callback(invalid_cache.close)
+        universe = None
+        if Path(DEFAULT_CSV).exists():
+            universe = SymbolUniverse.load(DEFAULT_CSV)
+        else:
+            print(f"⚠️  {DEFAULT_CSV} not found; only checking the invalid symbols cache")
+        checked = preflight(symbols, universe, invalid_cache, args.invalid_ttl,
+                            args.allow_unknown, refresh_seconds=args.wait)
+        print_preflight(checked, args.invalid_ttl)
+        symbols = checked['ok']
+    
+    # Serve symbols whose fundamentals cannot have changed from their last refresh
+    try:
+        ttl = parse_ttl(args.ttl)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return
+    try:
+        result_dates = load_result_dates()
+    except (OSError, KeyError, ValueError) as e:
+        print(f"⚠️  No result dates from query-results.csv ({e}); using TTLs only")
+        result_dates = {}
+    # A field subset's results cannot stand in for the whole template's, and vice versa
+    from template_catalog import compile_template, fields_suffix
+
+    suffix = fields_suffix(args.fields)
+    cache_path = (Path(args.refresh_cache) if args.refresh_cache
+                  else Path(args.output_dir) / f"refresh_cache{suffix}.sqlite")
+    refresh_cache = RefreshCache(cache_path)
+    resources.callback(refresh_cache.close)
+    plan = refresh_cache.plan(symbols, result_dates, ttl, force=args.force)
+    served = {symbol: refresh_cache.get(symbol)['output'] for symbol in plan['skip']}
+    
+    if args.dry_run:
+        print_plan(plan, args.template, args.fields)
+        return
+    if served:
+        print(f"♻️  {len(served)} symbols unchanged since their last refresh, served from cache "
+              f"(saves ~{plan['saved_seconds']:.0f}s; --force to refresh)")
+    symbols = plan['refresh']
+    
     print(f"\n{'='*60}")
     print(f"📊 Batch Bloomberg Data Downloader")
     print(f"{'='*60}")
@@ -69,39 +238,193 @@ def main():
     print(f"Output directory: {args.output_dir}")
     print(f"{'='*60}\n")
     
+    backend_options = {'max_uses': args.recycle_after, 'max_memory_mb': args.max_excel_mb}
+    if args.backend == 'api':
+        # No Excel to recycle
+        backend_options = {'url': args.api_url}
+    elif args.backend == 'fake':
+        backend_options['latency'] = args.fake_latency
+        try:
+            backend_options.update(parse_fake_profile(args.fake_profile))
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return
+    limiter = RateLimiter(args.hits_per_minute, args.hits_per_day,
+                          state_path=Path(args.output_dir) / "data_hits.json")
+    resources.callback(limiter.close)
+    snapshots_path = None
+    if not args.no_snapshots:
+        snapshots_path = (Path(args.snapshots) if args.snapshots
+                          else Path(args.output_dir) / f"snapshots{suffix}.sqlite")
+    
     # Initialize downloader
     try:
-        downloader = BloombergDataDownloader(
-            template_path=args.template,
-            output_dir=args.output_dir
-        )
-    except FileNotFoundError as e:
+        hits_per_symbol = args.hits_per_symbol or 0
+        if limiter.enabled and args.hits_per_symbol is None:
+            hits_per_symbol = compile_template(args.template, args.fields).data_formulas
+        if args.workers > 1:
+            if not Path(args.template).exists():
+                raise FileNotFoundError(f"Template file not found: {args.template}")
+            if args.fields:
+                # Unknown fields fail here rather than in every worker
+                compile_template(args.template, args.fields)
+            from parallel_batch import worker_config
+
+            downloader = None
+            config = worker_config(args.template, args.output_dir, args.backend, backend_options,
+                                   parse_formats(args.formats), args.store, args.wait,
+                                   hits_per_symbol, snapshots_path, args.write_unchanged,
+                                   args.history, args.fields)
+        else:
+            store = snapshots = history = None
+            if args.store:
+                from parquet_store import ParquetStore
+                store = ParquetStore(args.store)
+            if snapshots_path:
+                from snapshot_store import SnapshotStore
+                snapshots = SnapshotStore(snapshots_path)
+            if args.history:
+                from history_store import HistoryStore
+                history = HistoryStore(args.history)
+            downloader = BloombergDataDownloader(
+                template_path=args.template,
+                output_dir=args.output_dir,
+                backend=make_backend(args.backend, **backend_options),
+                formats=parse_formats(args.formats),
+                store=store,
+                snapshots=snapshots,
+                write_unchanged=args.write_unchanged,
+                history=history,
+                fields=args.fields,
+            )
+            resources.callback(downloader.close)
+    except (FileNotFoundError, ImportError, ValueError, KeyError) as e:
         print(f"❌ Error: {e}")
         return
     
+    # Journal of every symbol's state, so an interrupted run can be resumed
+    journal_path = Path(args.journal) if args.journal else Path(args.output_dir) / "batch_journal.sqlite"
+    journal = JobJournal(journal_path)
+    resources.callback(journal.close)
+    todo = journal.start(symbols, resume=args.resume)
+    skipped = len(symbols) - len(todo)
+    if skipped:
+        print(f"⏭️  Resuming: {skipped} symbols already done, {len(todo)} to go\n")
+    
+    # Uploads run on their own threads, overlapping the refreshes
+    publisher = None
+    if args.dropbox:
+        from dropbox_publisher import DropboxClient, DropboxPublisher
+
+        try:
+            publisher = DropboxPublisher(DropboxClient.from_env(), args.dropbox,
+                                         workers=args.dropbox_workers)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return
+        resources.callback(publisher.close)
+    
+    # Per-stage timings and outcome codes of every symbol
+    metrics = MetricsSink(Path(args.metrics_dir) if args.metrics_dir
+                          else Path(args.output_dir) / "metrics")
+    resources.callback(metrics.close)
+    
     # Download data for each symbol
-    results = []
-    failed = []
+    results = {}
+    failed = {}
+    rejected = {}
     
-    for i, symbol in enumerate(symbols, 1):
-        print(f"\n{'='*60}")
-        print(f"Progress: [{i}/{len(symbols)}] - {symbol}")
-        print(f"{'='*60}\n")
+    pack_size = max(1, args.pack)
+    started = time.monotonic()
+    throttled = 0.0
+    worker_pools = {}
+    pipeline = None
+    stopped = None
+    
+    for attempt in range(args.retries + 1):
+        if attempt == 0:
+            batch = todo
+        else:
+            batch = [s for s, error in failed.items() if error != INVALID_SECURITY]
+            if not batch or stopped:
+                break
+            backoff = args.retry_backoff * 2 ** (attempt - 1)
+            print(f"\n🔁 Retrying {len(batch)} failed symbols in {backoff:g}s "
+                  f"(retry {attempt}/{args.retries})...")
+            time.sleep(backoff)
         
-        try:
-            result = downloader.download_data(symbol, wait_seconds=args.wait)
-            if result:
-                results.append(result)
-            else:
-                failed.append(symbol)
-        except Exception as e:
-            print(f"❌ Failed to download {symbol}: {e}")
-            failed.append(symbol)
+        if not batch:
+            break
+        packs = [batch[i:i + pack_size] for i in range(0, len(batch), pack_size)]
+        journal.mark_running(batch)
+        if downloader is None:
+            from parallel_batch import run_parallel
+
+            print(f"⚙️  {min(args.workers, len(packs))} workers, logs in "
+                  f"{Path(args.output_dir) / '.workers'}\n")
+            outcomes = run_parallel(packs, config, args.workers, limiter)
+        elif args.pipeline:
+            pipeline = Pipeline(downloader, args.wait, args.pipeline_depth,
+                                limiter, hits_per_symbol)
+            outcomes = pipeline.run(packs)
+        else:
+            outcomes = run_sequential(downloader, packs, args.wait, args.delay,
+                                      limiter, hits_per_symbol)
         
-        # Wait before next download (except for last symbol)
-        if i < len(symbols):
-            print(f"\n⏳ Waiting {args.delay} seconds before next download...")
-            time.sleep(args.delay)
+        done = 0
+        for outcome in outcomes:
+            done += len(outcome['symbols'])
+            throttled += outcome['throttled']
+            if outcome['pool'] is not None:
+                # Parallel rounds start fresh workers; the sequential pool lives on
+                worker_pools[attempt if downloader is None else 0, outcome['worker']] = outcome['pool']
+            metrics.add(outcome.get('metrics'))
+            if outcome['rate_limited']:
+                stopped = outcome['error']
+            for symbol, result, error in zip(outcome['symbols'], outcome['results'],
+                                             outcome['errors']):
+                if result:
+                    results[symbol] = result
+                    failed.pop(symbol, None)
+                    journal.mark_done(symbol, result)
+                    refresh_cache.record(symbol, result, outcome['elapsed'] / len(outcome['symbols']),
+                                         result_dates.get(bare_symbol(symbol)))
+                    if publisher is not None:
+                        publisher.publish_output(result)
+                else:
+                    failed[symbol] = error or "download failed"
+                    journal.mark_failed(symbol, failed[symbol])
+                    if error == INVALID_SECURITY and invalid_cache is not None:
+                        rejected[symbol] = outcome['elapsed'] / len(outcome['symbols'])
+                        invalid_cache.record(symbol, error, rejected[symbol])
+            if downloader is None or args.pipeline:
+                ok = sum(1 for r in outcome['results'] if r)
+                status = "✅" if ok == len(outcome['symbols']) else "❌"
+                where = f"worker {outcome['worker']}" if outcome['worker'] else "not started"
+                print(f"{status} [{done}/{len(batch)}] {', '.join(outcome['symbols'])} "
+                      f"({where}, {outcome['elapsed']:.1f}s)"
+                      + (f" - {outcome['error']}" if outcome['error'] else ""))
+        journal.flush()
+    
+    if invalid_cache is not None:
+        # Symbols that were rejected once but refreshed fine now
+        invalid_cache.clear(list(results))
+    if publisher is not None:
+        print("☁️  Waiting for Dropbox uploads to finish...")
+    # Close everything opened above now (an error would have closed them on the way out)
+    resources.close()
+    if publisher is not None:
+        uploads = publisher.stats
+    if args.history:
+        # Each run adds a file per mnemonic; merge them before queries slow down
+        from history_store import HistoryStore
+        HistoryStore(args.history).compact(min_files=16)
+    
+    pool_stats = None
+    if worker_pools:
+        pool_stats = {key: sum(stats[key] for stats in worker_pools.values())
+                      for key in ('started', 'recycled', 'unhealthy')}
+    elapsed = time.monotonic() - started
     
     # Summary
     print(f"\n{'='*60}")
@@ -109,20 +432,185 @@ def main():
     print(f"{'='*60}")
     print(f"✅ Successfully downloaded: {len(results)}")
     print(f"❌ Failed: {len(failed)}")
+    if skipped:
+        print(f"⏭️  Skipped (done in an earlier run): {skipped}")
+    if served:
+        print(f"♻️  Served from refresh cache: {len(served)} (~{plan['saved_seconds']:.0f}s saved)")
+    if checked and (checked['invalid'] or (checked['unknown'] and not checked['kept_unknown'])):
+        left_out = len(checked['invalid']) + (0 if checked['kept_unknown'] else len(checked['unknown']))
+        print(f"🚫 Left out before refreshing: {left_out} ({len(checked['unknown'])} unknown, "
+              f"{len(checked['invalid'])} rejected before; ~{checked['saved_seconds']:.0f}s of "
+              f"terminal time saved)")
+    if rejected:
+        print(f"📕 Rejected by Bloomberg: {len(rejected)}, skipped for the next "
+              f"{args.invalid_ttl:g} days ({sum(rejected.values()):.0f}s spent on them)")
+    if snapshots_path and results:
+        changed = sum(1 for result in results.values() if result.get('changed') is not False)
+        written = sum(sum(item['bytes'].values()) for item in metrics.records)
+        print(f"🔀 Changed: {changed} of {len(results)} refreshed symbols "
+              f"({len(results) - changed} unchanged wrote nothing), "
+              f"{written / 1024:.1f} KB written")
+    print(f"⏱️  Elapsed: {elapsed:.1f}s with {max(1, args.workers)} worker(s)")
+    if limiter.enabled:
+        hits = limiter.stats()
+        print(f"🚦 Data hits: {hits['spent']:,} spent ({hits['used_today']:,} today), "
+              f"{throttled:.1f}s throttled")
+    if pool_stats is not None:
+        print(f"🔁 Excel sessions: {pool_stats['started']} started, "
+              f"{pool_stats['recycled']} recycled, {pool_stats['unhealthy']} unhealthy")
+    
+    if pipeline is not None:
+        print(f"🧵 Pipeline stages (last round):")
+        for stage in pipeline.report():
+            print(f"   {stage['stage']:8s} {stage['utilisation']:6.1%} busy, "
+                  f"{stage['items']} jobs, queue avg {stage['queue_avg']:.1f} / max {stage['queue_max']}")
+    if stopped:
+        print(f"🛑 Stopped early: {stopped}")
+    if publisher is not None:
+        print(f"☁️  Dropbox {publisher.folder or '/'}: {uploads['uploaded']} uploaded "
+              f"({uploads['bytes'] / 1024 / 1024:.1f} MB), {uploads['skipped']} unchanged, "
+              f"{uploads['failed']} failed")
+    
+    if metrics.records:
+        counts = ", ".join(f"{outcome} {count}" for outcome, count in metrics.counts().items() if count)
+        print(f"\n⏱️  Stage timings per symbol ({counts}):")
+        print(f"   {'stage':12s} {'count':>6s} {'p50':>9s} {'p95':>9s} {'p99':>9s}")
+        for stage, stats in metrics.percentiles().items():
+            print(f"   {stage:12s} {stats['count']:6d} {stats['p50']:8.2f}s "
+                  f"{stats['p95']:8.2f}s {stats['p99']:8.2f}s")
     
     if results:
         print(f"\n✅ Successful downloads:")
-        for r in results:
-            print(f"   - {r['symbol']}")
+        for symbol in results:
+            print(f"   - {symbol}")
     
     if failed:
         print(f"\n❌ Failed downloads:")
-        for s in failed:
-            print(f"   - {s}")
+        for symbol, error in failed.items():
+            print(f"   - {symbol}: {error}")
     
     print(f"\n📁 All files saved in: {args.output_dir}")
+    print(f"📒 Job journal: {journal_path} (--resume to continue)")
+    print(f"📈 Metrics: {metrics.jsonl_path}, {metrics.prom_path}")
+    if args.store:
+        print(f"🗄️  Parquet store: {args.store}")
+    if args.history:
+        print(f"📚 History store: {args.history} (python history_store.py {args.history} stats)")
+    if snapshots_path:
+        print(f"📸 Snapshots: {snapshots_path} (python snapshot_store.py {snapshots_path})")
     print(f"{'='*60}\n")
 
 
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Batch download Bloomberg data for multiple symbols'
+    )
+    
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--count', '-c', type=int,
+                      help='Download first N symbols from BB_symbol.csv')
+    group.add_argument('--symbols', '-s',
+                      help='Comma-separated list of symbols (e.g., HDFCB,IOCL,RELIANCE)')
+    group.add_argument('--all', '-a', action='store_true',
+                      help='Download all symbols from BB_symbol.csv')
+    group.add_argument('--industry', '-i',
+                      help='Comma-separated industry groups/industries from query-results.csv '
+                           '(e.g. "Banks,IT - Software")')
+    group.add_argument('--screen',
+                      help='Screen over query-results.csv columns '
+                           '(e.g. "Market Capitalization > 5000 and Debt < 1000")')
+    
+    parser.add_argument('--output_dir', '-o', default='./output',
+                       help='Output directory (default: ./output)')
+    parser.add_argument('--template', '-t',
+                       default=r'C:\blp\data\FA1_vwijagme.xlsx',
+                       help='Bloomberg Excel template path')
+    parser.add_argument('--wait', '-w', type=int, default=15,
+                       help='Maximum seconds to wait for Bloomberg refresh (default: 15)')
+    parser.add_argument('--delay', '-d', type=int, default=5,
+                       help='Seconds to wait between downloads (default: 5; '
+                            'not used with --workers/--pipeline, see --hits-per-minute)')
+    parser.add_argument('--pack', '-p', type=int, default=1,
+                       help='Symbols refreshed together in one workbook (default: 1, no packing)')
+    parser.add_argument('--backend', '-b', choices=sorted(BACKENDS), default='excel',
+                       help='Refresh backend (default: excel; fake needs no terminal; api asks the '
+                            'Bloomberg API directly, one request per --pack of symbols)')
+    parser.add_argument('--api-url',
+                       help='Send the api backend\'s requests to this HTTP endpoint '
+                            '(e.g. python bloomberg_api.py serve) instead of a blpapi session')
+    parser.add_argument('--recycle-after', type=int, default=50,
+                       help='Restart Excel after this many refreshes (default: 50)')
+    parser.add_argument('--max-excel-mb', type=float, default=1500,
+                       help='Restart Excel when it uses more memory than this (default: 1500)')
+    parser.add_argument('--workers', '-j', type=int, default=1,
+                       help='Refresh workers running at once, each with its own Excel (default: 1)')
+    parser.add_argument('--hits-per-minute', type=float,
+                       help='Bloomberg data hits allowed per minute across all workers')
+    parser.add_argument('--hits-per-day', type=int,
+                       help='Bloomberg data hits allowed per day across all workers and runs '
+                            '(counted in <output_dir>/data_hits.json)')
+    parser.add_argument('--hits-per-symbol', type=int,
+                       help='Data hits one symbol costs (default: BDH/BDP/BDS formula cells in the template)')
+    parser.add_argument('--fake-latency', type=float, default=2.0,
+                       help='Seconds the fake backend takes to resolve (default: 2.0)')
+    parser.add_argument('--fake-profile', default='',
+                       help='More fake backend behaviour, e.g. "sigma=0.5,invalid=0.02,timeout=0.01,'
+                            'jitter=0.2,seed=1" (latency spread, failure rates)')
+    parser.add_argument('--pipeline', action='store_true',
+                       help='Prepare the next symbol and export the previous one while Excel refreshes')
+    parser.add_argument('--pipeline-depth', type=int, default=2,
+                       help='Workbooks allowed to wait between pipeline stages (default: 2)')
+    parser.add_argument('--journal',
+                       help='Job journal file (default: <output_dir>/batch_journal.sqlite)')
+    parser.add_argument('--resume', action='store_true',
+                       help='Skip symbols the journal already has as done')
+    parser.add_argument('--retries', type=int, default=2,
+                       help='Extra attempts for failed symbols at the end of the run (default: 2)')
+    parser.add_argument('--retry-backoff', type=float, default=30,
+                       help='Seconds before the first retry, doubling each time (default: 30)')
+    parser.add_argument('--force', action='store_true',
+                       help='Refresh every symbol, even those the refresh cache has as fresh')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Only report which symbols would be refreshed or served from the cache')
+    parser.add_argument('--no-validate', action='store_true',
+                       help='Skip the pre-flight check against BB_symbol.csv and the invalid symbols cache')
+    parser.add_argument('--allow-unknown', action='store_true',
+                       help='Refresh symbols BB_symbol.csv does not know instead of skipping them')
+    parser.add_argument('--invalid-cache',
+                       help='Symbols Bloomberg rejected (default: <output_dir>/invalid_symbols.sqlite)')
+    parser.add_argument('--invalid-ttl', type=float, default=DEFAULT_INVALID_TTL,
+                       help=f'Days a rejected symbol is skipped before it is tried again '
+                            f'(default: {DEFAULT_INVALID_TTL})')
+    parser.add_argument('--ttl', default='',
+                       help='Maximum age in days per field class (default: estimates=7,reported=90)')
+    parser.add_argument('--metrics-dir',
+                       help='Per-symbol timings (JSON lines) and Prometheus file '
+                            '(default: <output_dir>/metrics)')
+    parser.add_argument('--refresh-cache',
+                       help='Refresh cache file (default: <output_dir>/refresh_cache.sqlite)')
+    parser.add_argument('--snapshots',
+                       help='Snapshot store of every symbol\'s values '
+                            '(default: <output_dir>/snapshots.sqlite)')
+    parser.add_argument('--no-snapshots', action='store_true',
+                       help='Keep no snapshots; write every refresh\'s files even if unchanged')
+    parser.add_argument('--write-unchanged', action='store_true',
+                       help='Write the per-symbol files even when the values did not change')
+    parser.add_argument('--dropbox',
+                       help='Upload every downloaded file to this Dropbox folder while the batch '
+                            'runs (credentials from DROPBOX_* environment variables)')
+    parser.add_argument('--dropbox-workers', type=int, default=4,
+                       help='Files uploaded to Dropbox at once (default: 4)')
+    add_output_arguments(parser)
+    
+    args = parser.parse_args()
+    if args.pipeline and args.workers > 1:
+        parser.error("--pipeline runs in one process; use it without --workers")
+    
+    # The journal, caches, stores and metrics are flushed and closed however the run ends
+    with ExitStack() as resources:
+        run_batch(args, resources)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,75 @@
+"""
+Bloomberg Data CLI
+==================
+One entry point for the downloader scripts, one subcommand per script:
+
+    python bbg.py download --symbol HDFCB
+    python bbg.py batch --all --workers 4
+    python bbg.py browse search hdfc
+    python bbg.py screen "Market Capitalization > 5000 and Debt < 1000"
+    python bbg.py service serve --pack 5
+    python bbg.py export "output/*_Adj_Highlights_*.csv" -o highlights.csv
+    python bbg.py ratios --sort fcf_yield
+
+Each subcommand runs the existing script's main() with the remaining
+arguments, and its module is imported only then: `bbg.py --help` loads
+nothing beyond this file, `bbg.py browse` only the cached symbol index, and
+pandas / numpy / the Excel backend load for the subcommands that use them.
+`python bbg.py <command> --help` shows that command's options.
+"""
+
+import importlib
+import os
+import sys
+
+
+# Subcommand → (module whose main() runs it, one-line description)
+COMMANDS = {
+    'download': ('download_bloomberg_data', 'Download one symbol'),
+    'batch': ('batch_download', 'Download many symbols (lists, screens, packs, workers)'),
+    'browse': ('browse_symbols', 'Browse and search the Bloomberg symbols (top, search, sector, export)'),
+    'screen': ('screener', 'Screen query-results.csv and map the matches to Bloomberg symbols'),
+    'service': ('download_service', 'Download service: one Excel owner with a local API (serve, status, bench)'),
+    'export': ('highlights_parser', 'Parse saved Adj Highlights sheets into one long CSV'),
+    'ratios': ('fundamentals', 'Derived ratios (EV/EBITDA, FCF yield, ...) across every refreshed symbol'),
+}
+
+
+def print_usage() -> None:
+    prog = os.path.basename(sys.argv[0])
+    print(f"Usage: python {prog} <command> [options]\n")
+    print("Commands:")
+    for name, (_, description) in COMMANDS.items():
+        print(f"  {name:10s} {description}")
+    print(f"\nRun 'python {prog} <command> --help' for the options of a command.")
+
+
+def main(argv: list = None) -> int:
+    """
+    Run one subcommand
+
+    Args:
+        argv: Arguments after the program name (default: sys.argv[1:])
+
+    Returns:
+        Exit status
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ('-h', '--help', 'help'):
+        print_usage()
+        return 0 if argv else 2
+
+    name, rest = argv[0], argv[1:]
+    if name not in COMMANDS:
+        print(f"❌ Unknown command '{name}'\n")
+        print_usage()
+        return 2
+
+    # The scripts parse sys.argv themselves; their usage lines read "bbg.py batch ..."
+    sys.argv = [f"{os.path.basename(sys.argv[0])} {name}", *rest]
+    module = importlib.import_module(COMMANDS[name][0])
+    return module.main() or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+"""
+Synthetic Benchmark Suite
+=========================
+End-to-end performance numbers without a Bloomberg terminal: generates an
+FA1-shaped template of any size, runs the downloader and batch_download.py
+against the fake refresh backend with a latency / failure profile, and
+reports throughput, per-stage latency (from the download metrics) and peak
+RSS per scenario.
+
+Scenarios (each runs in a fresh process so its peak RSS is its own):
+
+    patch     compile the template and write one copy per symbol
+    download  BloombergDataDownloader.download_data per symbol (refresh,
+              values copy, CSV export, parsing)
+    batch     python batch_download.py ... end-to-end (journal, cache,
+              metrics), optionally with --workers / --pack
+    pipeline  the same with --pipeline
+
+Results can be saved as a JSON baseline and later runs compared against it;
+--compare exits with status 1 if throughput dropped or a stage got slower by
+more than --tolerance, so it can gate CI on Linux.
+
+Usage:
+    python benchmark_suite.py
+    python benchmark_suite.py --rows 200 --sheets 3 --symbols 50 --workers 4
+    python benchmark_suite.py --profile "sigma=0.5,invalid=0.05,timeout=0.02"
+    python benchmark_suite.py --save bench/baseline.json
+    python benchmark_suite.py --compare bench/baseline.json --tolerance 0.25
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from openpyxl import Workbook
+
+from template_patcher import SHEET_NAME
+
+
+BASELINE_VERSION = 2
+SCENARIOS = ("patch", "download", "batch", "pipeline")
+
+# Line items of the real FA1 sheet, cycled for larger templates
+MNEMONICS = [
+    ("Market Capitalization", "HISTORICAL_MARKET_CAP"),
+    ("- Cash & Equivalents", "CASH_AND_MARKETABLE_SECURITIES"),
+    ("+ Preferred & Other", "PFD_EQTY_MINORTY_INTEREST"),
+    ("+ Total Debt", "SHORT_AND_LONG_TERM_DEBT"),
+    ("Enterprise Value", "ENTERPRISE_VALUE"),
+    ("Revenue, Adj", "SALES_REV_TURN"),
+    ("  Growth %, YoY", "SALES_GROWTH"),
+    ("Gross Profit, Adj", "GROSS_PROFIT"),
+    ("EBITDA, Adj", "EBITDA"),
+    ("Net Income, Adj", "EARN_FOR_COMMON"),
+    ("EPS, Adj", "IS_DIL_EPS_CONT_OPS"),
+    ("Cash from Operations", "CF_CASH_FROM_OPER"),
+    ("Capital Expenditures", "CAPITAL_EXPEND"),
+    ("Free Cash Flow", "CF_FREE_CASH_FLOW"),
+]
+FORMULA_OPTIONS = ('"Currency=INR","Period=FY","BEST_FPERIOD_OVERRIDE=FY","FILING_STATUS=MR",'
+                   '"EQY_CONSOLIDATED=Y","SCALING_FORMAT=MLN","Sort=A","Dates=H",'
+                   '"DateFormat=P","Fill=—","Direction=H","UseDPDF=Y"')
+
+# Slower by more than this share of the baseline is only reported for stages
+# that take at least MIN_STAGE_SECONDS (anything faster is timer noise)
+MIN_STAGE_SECONDS = 0.002
+
+
+def generate_template(path, rows: int = 20, sheets: int = 1, occurrences: int = 1,
+                      years: int = 7, symbol: str = "IOCL") -> Path:
+    """
+    Write an FA1-shaped Bloomberg template
+
+    Args:
+        path: xlsx file to write
+        rows: Line items (formula rows) per sheet
+        sheets: Sheets in the workbook; the first is "BBG Adj Highlights",
+                the others are copies that only add refresh weight
+        occurrences: Times the symbol appears in each formula cell
+        years: Reported fiscal years (plus Current/LTM and two estimate years)
+        symbol: Symbol the template is written for
+
+    Returns:
+        The template path
+    """
+    first = 2025 - years + 1
+    periods = [f"FY {year}" for year in range(first, 2026)] + \
+              ["Current/LTM", "FY 2026 Est", "FY 2027 Est"]
+    ends = [f"03/31/{year}" for year in range(first, 2026)] + \
+           ["06/30/2025", "03/31/2026", "03/31/2027"]
+    security = f'"{symbol} IN Equity"'
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    for n in range(sheets):
+        ws = wb.create_sheet(SHEET_NAME if n == 0 else f"BBG Extra {n}")
+        ws.append([])
+        ws.append([f"Synthetic Company Ltd ({symbol} IN) - BBG Adj Highlights"])
+        ws.append([])
+        ws.append(["In Millions of INR", None] + periods)
+        ws.append(["12 Months Ending", None] + ends)
+        for r in range(rows):
+            label, mnemonic = MNEMONICS[r % len(MNEMONICS)]
+            if r >= len(MNEMONICS):
+                mnemonic = f"{mnemonic}_{r // len(MNEMONICS)}"
+            cells = []
+            for period in periods:
+                formula = f'=_xll.BDH({security},"{mnemonic}","{period}","{period}",{FORMULA_OPTIONS})'
+                formula += f'+0*_xll.BDP({security},"PX_LAST")' * (occurrences - 1)
+                cells.append(formula)
+            ws.append([label, mnemonic] + cells)
+        ws.append(["Source: Bloomberg"])
+    wb.save(path)
+    return Path(path)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its finished children, in MB"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2**20
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * scale / 2**20
+
+
+def _stage_report(records: list) -> dict:
+    from metrics import percentiles
+
+    return {stage: {key: round(stats[key], 6) for key in ('p50', 'p95', 'p99')}
+            for stage, stats in percentiles(records).items()}
+
+
+def _outcomes(records: list) -> dict:
+    counts = {}
+    for item in records:
+        counts[item['outcome']] = counts.get(item['outcome'], 0) + 1
+    return counts
+
+
+def _batch_argv(config: dict, template: Path, output_dir: Path, symbols: list,
+                pipeline: bool = False) -> list:
+    argv = ["batch_download.py", "--symbols", ",".join(symbols), "--backend", "fake",
+            "--fake-latency", str(config['latency']), "--fake-profile", config['profile'],
+            "--template", str(template), "--output_dir", str(output_dir),
+            "--formats", config['formats'], "--delay", "0", "--retries", "0",
+            "--wait", str(config['wait']), "--pack", str(config['pack']),
+            # The synthetic SYN symbols are not in BB_symbol.csv; the pre-flight
+            # check would leave them all out and the run would measure nothing
+            "--no-validate"]
+    if pipeline:
+        argv.append("--pipeline")
+    elif config['workers'] > 1:
+        argv += ["--workers", str(config['workers'])]
+    return argv
+
+
+def run_scenario(name: str, config: dict) -> dict:
+    """
+    Run one scenario in this process
+
+    Throughput counts only symbols the run downloaded (outcome ok in the
+    metrics records), so skipped, failed or cached symbols cannot inflate it.
+
+    Returns:
+        {'symbols', 'downloaded', 'seconds', 'throughput' (downloaded symbols/s), 'stages'
+         ({stage: p50/p95/p99 seconds}), 'outcomes', 'skipped' (symbols
+         that never reached a download, e.g. left out before refreshing),
+         'rss_mb'}
+    """
+    from download_bloomberg_data import BloombergDataDownloader
+    from refresh_backends import FakeBackend
+    from template_patcher import CompiledTemplate
+    from metrics import OK, load_records, timed, record
+
+    import batch_download
+
+    symbols = [f"SYN{i:04d}" for i in range(config['symbols'])]
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        template = generate_template(tmp / "template.xlsx", config['rows'], config['sheets'],
+                                     config['occurrences'], config['years'])
+        output_dir = tmp / "output"
+        records = []
+        start = time.perf_counter()
+
+        if name == "patch":
+            compiled = CompiledTemplate.compile(template, "IOCL")
+            for symbol in symbols:
+                stages = {}
+                with timed(stages, "patch"):
+                    compiled.write(symbol, tmp / f"{symbol}.xlsx")
+                records.append(record(symbol, None, stages))
+
+        elif name == "download":
+            profile = batch_download.parse_fake_profile(config['profile'])
+            backend = FakeBackend(latency=config['latency'], **profile)
+            downloader = BloombergDataDownloader(template, output_dir, backend=backend,
+                                                 formats=set(config['formats'].split(",")) - {"none"})
+            try:
+                for symbol in symbols:
+                    downloader.download_data(symbol, wait_seconds=config['wait'])
+                    records.extend(downloader.drain_metrics())
+            finally:
+                downloader.close()
+
+        elif name in ("batch", "pipeline"):
+            argv = _batch_argv(config, template, output_dir, symbols, name == "pipeline")
+            saved = sys.argv
+            sys.argv = argv
+            try:
+                batch_download.main()
+            finally:
+                sys.argv = saved
+            records = load_records(output_dir / "metrics" / "downloads.jsonl")
+
+        else:
+            raise ValueError(f"Unknown scenario: {name}")
+
+        seconds = time.perf_counter() - start
+
+    outcomes = _outcomes(records)
+    downloaded = len({item['symbol'] for item in records if item['outcome'] == OK})
+    if not downloaded:
+        raise RuntimeError(f"no symbol was downloaded ({len(symbols)} requested, "
+                           f"outcomes: {outcomes or 'none'})")
+    rss = peak_rss_mb()
+    return {
+        'symbols': len(symbols),
+        'downloaded': downloaded,
+        'seconds': round(seconds, 4),
+        'throughput': round(downloaded / seconds, 4) if seconds > 0 else 0.0,
+        'stages': _stage_report(records),
+        'outcomes': outcomes,
+        'skipped': len(symbols) - len({item['symbol'] for item in records}),
+        'rss_mb': round(rss, 1) if rss is not None else None,
+    }
+
+
+def _child(name: str, config: dict, conn) -> None:
+    """Scenario process: run quietly and send the result (or error) back"""
+    try:
+        with open(os.devnull, "w", encoding="utf-8") as devnull, \
+                contextlib.redirect_stdout(devnull):
+            conn.send(run_scenario(name, config))
+    except BaseException as e:
+        conn.send({'error': f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_isolated(name: str, config: dict) -> dict:
+    """Run a scenario in a fresh process (so peak RSS is the scenario's own)"""
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_child, args=(name, config, child))
+    process.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {'error': f"scenario process exited with code {process.exitcode}"}
+    process.join()
+    return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Regressions of results against a baseline
+
+    Returns:
+        Human-readable regression messages (empty: no regression)
+    """
+    problems = []
+    for name, current in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None or 'error' in before:
+            continue
+        if 'error' in current:
+            problems.append(f"{name}: failed ({current['error']})")
+            continue
+        if current.get('skipped', 0) > before.get('skipped', 0):
+            problems.append(f"{name}: {current['skipped']} symbols skipped before refreshing "
+                            f"vs {before.get('skipped', 0)}")
+        if current['throughput'] < before['throughput'] * (1 - tolerance):
+            problems.append(f"{name}: throughput {current['throughput']:.2f}/s "
+                            f"vs {before['throughput']:.2f}/s")
+        for stage, stats in current['stages'].items():
+            old = before['stages'].get(stage)
+            if old is None or old['p50'] < MIN_STAGE_SECONDS:
+                continue
+            if stats['p50'] > old['p50'] * (1 + tolerance):
+                problems.append(f"{name}: {stage} p50 {stats['p50'] * 1000:.1f} ms "
+                                f"vs {old['p50'] * 1000:.1f} ms")
+    return problems
+
+
+def print_results(results: dict) -> None:
+    for name, result in results['scenarios'].items():
+        if 'error' in result:
+            print(f"\n❌ {name}: {result['error']}")
+            continue
+        rss = f"{result['rss_mb']:.0f} MB" if result['rss_mb'] is not None else "n/a"
+        outcomes = ", ".join(f"{k} {v}" for k, v in result['outcomes'].items())
+        print(f"\n📊 {name}: {result['throughput']:.2f} symbols/s "
+              f"({result['downloaded']} of {result['symbols']} in {result['seconds']:.2f}s), "
+              f"peak RSS {rss}"
+              + (f" [{outcomes}]" if outcomes else ""))
+        if result.get('skipped'):
+            print(f"   ⚠️  {result['skipped']} of {result['symbols']} symbols were skipped "
+                  f"before refreshing (no download record)")
+        print(f"   {'stage':12s} {'p50':>10s} {'p95':>10s} {'p99':>10s}")
+        for stage, stats in result['stages'].items():
+            print(f"   {stage:12s} {stats['p50'] * 1000:8.1f}ms {stats['p95'] * 1000:8.1f}ms "
+                  f"{stats['p99'] * 1000:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Synthetic end-to-end benchmark with the fake Bloomberg backend'
+    )
+    parser.add_argument('--scenarios', default=",".join(SCENARIOS),
+                       help=f'Comma-separated scenarios (default: {",".join(SCENARIOS)})')
+    parser.add_argument('--symbols', '-c', type=int, default=20,
+                       help='Symbols per scenario (default: 20)')
+    parser.add_argument('--rows', type=int, default=20,
+                       help='Line items per template sheet (default: 20)')
+    parser.add_argument('--sheets', type=int, default=1,
+                       help='Sheets in the template (default: 1)')
+    parser.add_argument('--occurrences', type=int, default=1,
+                       help='Symbol occurrences per formula cell (default: 1)')
+    parser.add_argument('--years', type=int, default=7,
+                       help='Reported fiscal years per row (default: 7)')
+    parser.add_argument('--latency', type=float, default=0.05,
+                       help='Median fake Bloomberg latency in seconds (default: 0.05)')
+    parser.add_argument('--profile', default='',
+                       help='Fake latency spread / failure rates, e.g. "sigma=0.5,invalid=0.05,timeout=0.02"')
+    parser.add_argument('--wait', type=float, default=2,
+                       help='Seconds before a pending refresh times out (default: 2)')
+    parser.add_argument('--workers', '-j', type=int, default=1,
+                       help='Workers for the batch scenario (default: 1)')
+    parser.add_argument('--pack', '-p', type=int, default=1,
+                       help='Symbols per workbook in the batch scenarios (default: 1)')
+    parser.add_argument('--formats', default='csv',
+                       help='Output formats for the download/batch scenarios (default: csv)')
+    parser.add_argument('--save',
+                       help='Write the results to this JSON baseline file')
+    parser.add_argument('--compare',
+                       help='Compare against this JSON baseline; exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                       help='Allowed slowdown as a share of the baseline (default: 0.25)')
+    args = parser.parse_args()
+
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    config = {key: getattr(args, key) for key in
+              ('symbols', 'rows', 'sheets', 'occurrences', 'years', 'latency', 'profile',
+               'wait', 'workers', 'pack', 'formats')}
+
+    print(f"\n{'='*60}")
+    print(f"📊 Synthetic Benchmark Suite")
+    print(f"{'='*60}")
+    print(f"Template: {args.rows} rows x {args.years + 3} periods x {args.sheets} sheet(s), "
+          f"{args.occurrences} symbol occurrence(s) per cell")
+    print(f"Fake Bloomberg: {args.latency}s latency {args.profile or ''}".rstrip())
+    print(f"Symbols: {args.symbols} per scenario")
+    print(f"{'='*60}")
+
+    results = {
+        'version': BASELINE_VERSION,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': config,
+        'scenarios': {},
+    }
+    for name in names:
+        print(f"⏳ {name}...", flush=True)
+        results['scenarios'][name] = run_isolated(name, config)
+    print_results(results)
+
+    if args.save:
+        path = Path(args.save)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\n💾 Baseline saved: {path}")
+
+    status = 0
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline.get('version') != BASELINE_VERSION:
+            print(f"\n⚠️  Baseline format {baseline.get('version')} (now {BASELINE_VERSION}): "
+                  f"throughput used to count requested rather than downloaded symbols")
+        if baseline.get('config') != config:
+            print(f"\n⚠️  Baseline was recorded with different settings: {baseline.get('config')}")
+        problems = compare(results, baseline, args.tolerance)
+        if problems:
+            print(f"\n❌ Regressions against {args.compare} (tolerance {args.tolerance:.0%}):")
+            for problem in problems:
+                print(f"   - {problem}")
+            status = 1
+        else:
+            print(f"\n✅ No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    print()
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
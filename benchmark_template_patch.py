@@ -0,0 +1,94 @@
+"""
+Template Preparation Benchmark
+==============================
+Compare per-symbol template preparation time of the openpyxl load/save
+approach against the compiled template patcher.
+
+Usage:
+    python benchmark_template_patch.py
+    python benchmark_template_patch.py --template C:/blp/data/FA1_vwijagme.xlsx --count 50
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+from template_patcher import CompiledTemplate, SHEET_NAME
+
+
+def openpyxl_prepare(template_path: Path, default_symbol: str, symbol: str, out_path: Path) -> None:
+    """The original load → scan → save replacement, without console output"""
+    wb = load_workbook(template_path)
+    ws = wb[SHEET_NAME]
+    for row in ws.iter_rows(min_row=2, max_row=ws.max_row, max_col=ws.max_column):
+        for cell in row:
+            if isinstance(cell.value, str) and default_symbol in cell.value:
+                cell.value = cell.value.replace(default_symbol, symbol)
+    wb.save(out_path)
+
+
+def time_runs(func, symbols: list) -> list:
+    """Run func once per symbol and return the elapsed milliseconds of each call"""
+    timings = []
+    for symbol in symbols:
+        start = time.perf_counter()
+        func(symbol)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label: str, timings: list) -> None:
+    print(f"{label:28s} mean {statistics.mean(timings):8.2f} ms   "
+          f"median {statistics.median(timings):8.2f} ms   "
+          f"max {max(timings):8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark per-symbol template preparation'
+    )
+    parser.add_argument('--template', '-t', default='FA1_vwijagme_value_copy.xlsx',
+                       help='Bloomberg Excel template (default: FA1_vwijagme_value_copy.xlsx)')
+    parser.add_argument('--count', '-c', type=int, default=20,
+                       help='Number of symbols to prepare per approach (default: 20)')
+    parser.add_argument('--default_symbol', default='IOCL',
+                       help='Symbol used in the template (default: IOCL)')
+    args = parser.parse_args()
+
+    template = Path(args.template)
+    symbols = [f"SYM{i:04d}" for i in range(args.count)]
+
+    print(f"\n{'='*60}")
+    print(f"📊 Template Preparation Benchmark")
+    print(f"{'='*60}")
+    print(f"Template: {template}")
+    print(f"Symbols:  {len(symbols)}")
+    print(f"{'='*60}\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+
+        baseline = time_runs(
+            lambda s: openpyxl_prepare(template, args.default_symbol, s, tmp / f"{s}_a.xlsx"),
+            symbols,
+        )
+
+        start = time.perf_counter()
+        compiled = CompiledTemplate.compile(template, args.default_symbol)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        patched = time_runs(lambda s: compiled.write(s, tmp / f"{s}_b.xlsx"), symbols)
+
+    report("openpyxl load/save", baseline)
+    report("compiled patch", patched)
+    print(f"{'one-time compile':28s} {compile_ms:8.2f} ms "
+          f"({len(compiled.replacements)} placeholder cells)")
+    print(f"\n🚀 Speed-up: {statistics.mean(baseline) / statistics.mean(patched):.1f}x per symbol\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,682 @@
+"""
+Bloomberg API Requests
+======================
+Ask the Bloomberg API directly for the values the template's formulas want,
+instead of having Excel evaluate them one cell at a time.
+
+Every data cell of the FA1 template is a formula like
+
+    =_xll.BDH("IOCL IN Equity","SALES_REV_TURN","FY 2019","FY 2019","Currency=INR",
+              "Period=FY","FILING_STATUS=MR","SCALING_FORMAT=MLN",...)
+
+parse_formula() turns it into (function, security, field, start, end, group),
+where the group holds the request options (Currency, Period, ...) and field
+overrides (FILING_STATUS, ...). Each distinct formula shape is parsed once,
+so a pack of 50 sheets costs the parsing of one. RequestPlan then collects a
+whole workbook into the field/period matrix and sends one request per group
+covering every security, field and period of that group, split only at the
+service's per-request limits. For FA1 that is 4 requests per pack instead of
+105 formula evaluations per symbol.
+
+Two services answer the requests with the same normalised results:
+
+- BlpapiService: a blpapi session (Desktop API, localhost:8194 by default)
+- HttpService:   a JSON request/response endpoint such as StandInServer
+
+StandInServer is a local stand-in for the reference data service that
+behaves like it where the backend depends on it: a securities-per-request
+limit, partial responses that have to be followed, securityError for
+unknown securities, fieldExceptions for fields a security does not have, and
+transient failures that have to be retried.
+
+Usage:
+    plan = RequestPlan.build([(key, formula), ...])
+    values = plan.fetch(HttpService(server.url))     # {key: value or "#N/A ..."}
+
+    python bloomberg_api.py plan FA1_vwijagme.xlsx --symbols "HDFCB IN,BSE IN"
+    python bloomberg_api.py serve --port 8195 --invalid "XXXX IN Equity"
+    python batch_download.py --count 50 --pack 50 --backend api --api-url http://127.0.0.1:8195
+"""
+
+import argparse
+import http.client
+import json
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from refresh_backends import FIELD_NOT_APPLICABLE, INVALID_SECURITY, fake_value
+
+
+HISTORICAL = "HistoricalDataRequest"
+REFERENCE = "ReferenceDataRequest"
+
+# Limits of the reference data service, per request
+MAX_SECURITIES = 100
+MAX_FIELDS = 25
+
+# What Excel shows for a period without data when the formula sets no Fill=
+NO_DATA = "#N/A N/A"
+# Formula cells the API cannot answer (not a BDH/BDP with literal arguments)
+UNSUPPORTED = "#N/A Unsupported Formula"
+
+FORMULA_RE = re.compile(r'^=\s*(?:_xll\.)?(BDH|BDP)\((.*)\)\s*$', re.I | re.S)
+# One quoted argument and the comma after it
+ARG_RE = re.compile(r'\s*"((?:[^"]|"")*)"\s*(?:,|$)')
+# Override names are field mnemonics (FILING_STATUS); request options are not (Currency)
+OVERRIDE_RE = re.compile(r'^[A-Z][A-Z0-9_]*$')
+FISCAL_YEAR_RE = re.compile(r'^FY (\d{4})$')
+
+# Excel's Period= option → blpapi (periodicitySelection, periodicityAdjustment)
+PERIODICITY = {
+    'FY': ('YEARLY', 'FISCAL'), 'FS': ('SEMI_ANNUALLY', 'FISCAL'), 'FQ': ('QUARTERLY', 'FISCAL'),
+    'Y': ('YEARLY', 'CALENDAR'), 'S': ('SEMI_ANNUALLY', 'CALENDAR'), 'Q': ('QUARTERLY', 'CALENDAR'),
+    'M': ('MONTHLY', 'ACTUAL'), 'W': ('WEEKLY', 'ACTUAL'), 'D': ('DAILY', 'ACTUAL'),
+}
+
+
+class BloombergApiError(RuntimeError):
+    """A request the service rejected or that kept failing"""
+
+
+def _string_args(text: str) -> list:
+    """Quoted formula arguments, or None if any argument is not a string literal"""
+    args, pos = [], 0
+    while pos < len(text):
+        match = ARG_RE.match(text, pos)
+        if match is None or match.end() == pos:
+            return None
+        args.append(match.group(1).replace('""', '"'))
+        pos = match.end()
+    return args
+
+
+@lru_cache(maxsize=4096)
+def _parse_shape(function: str, rest: str) -> tuple:
+    """(field, start, end, group) from the arguments after the security, or None"""
+    args = _string_args(rest)
+    if not args:
+        return None
+    field, args = args[0].upper(), args[1:]
+    start = end = None
+    if function == "BDH":
+        if len(args) < 2:
+            return None
+        start, end, args = args[0], args[1], args[2:]
+
+    options, overrides = {}, {}
+    pending = None
+    for arg in args:
+        if "=" in arg:
+            name, value = arg.split("=", 1)
+        elif pending is None:
+            # BDP also takes overrides as separate name, value arguments
+            pending = arg
+            continue
+        else:
+            name, value, pending = pending, arg, None
+        (overrides if OVERRIDE_RE.match(name.strip()) else options)[name.strip()] = value.strip()
+    group = (function, tuple(sorted(options.items())), tuple(sorted(overrides.items())))
+    return field, start, end, group
+
+
+def parse_formula(formula) -> tuple:
+    """
+    Split a BDH/BDP formula into what a request needs
+
+    Args:
+        formula: Cell formula ("=_xll.BDH(...)" or "=BDP(...)")
+
+    Returns:
+        (function, security, field, start, end, group), start/end None for
+        BDP; or None if the formula is not a BDH/BDP with literal arguments.
+        Cells with the same group can share a request.
+    """
+    match = FORMULA_RE.match(formula) if isinstance(formula, str) else None
+    if match is None:
+        return None
+    security = ARG_RE.match(match.group(2))
+    if security is None:
+        return None
+    function = match.group(1).upper()
+    shape = _parse_shape(function, match.group(2)[security.end():])
+    if shape is None:
+        return None
+    field, start, end, group = shape
+    return function, security.group(1).replace('""', '"'), field, start, end, group
+
+
+def _period_key(period: str) -> tuple:
+    """Sort key putting "FY 2019" before "FY 2020" and 20190331 before 20200331"""
+    year = re.search(r'(?:19|20)\d\d', period)
+    return (int(year.group(0)) if year else 0, period)
+
+
+def _chunks(items: list, size: int) -> list:
+    return [items[i:i + size] for i in range(0, len(items), size)] or [[]]
+
+
+class RequestPlan:
+    """The field/period matrix of a workbook's formulas, grouped into requests"""
+
+    def __init__(self):
+        self.cells = []          # (key, security, field, period, group)
+        self.unsupported = []    # keys of formula cells the API cannot answer
+        self.groups = {}         # group → {'securities', 'fields', 'periods'}
+
+    @classmethod
+    def build(cls, cells) -> "RequestPlan":
+        """
+        Args:
+            cells: (key, formula) for every formula cell; keys are returned by fetch()
+
+        Returns:
+            RequestPlan
+        """
+        plan = cls()
+        for key, formula in cells:
+            parsed = parse_formula(formula)
+            if parsed is None:
+                plan.unsupported.append(key)
+                continue
+            function, security, field, start, end, group = parsed
+            entry = plan.groups.setdefault(group, {'securities': {}, 'fields': {}, 'periods': set()})
+            entry['securities'][security] = None
+            entry['fields'][field] = None
+            if function == "BDH":
+                entry['periods'].update((start, end))
+            # A BDH cell shows the first period of its range (one period per cell in FA1)
+            plan.cells.append((key, security, field, start, group))
+        return plan
+
+    def requests(self, max_securities: int = MAX_SECURITIES, max_fields: int = MAX_FIELDS) -> list:
+        """Request dicts covering every cell, within the per-request limits"""
+        return [request for _, request in self._requests(max_securities, max_fields)]
+
+    def _requests(self, max_securities: int, max_fields: int) -> list:
+        """(group, request dict) pairs"""
+        requests = []
+        for group, entry in self.groups.items():
+            function, options, overrides = group
+            periods = sorted(entry['periods'], key=_period_key)
+            for securities in _chunks(list(entry['securities']), max_securities):
+                for fields in _chunks(list(entry['fields']), max_fields):
+                    request = {
+                        'type': HISTORICAL if function == "BDH" else REFERENCE,
+                        'securities': securities,
+                        'fields': fields,
+                        'options': dict(options),
+                        'overrides': dict(overrides),
+                    }
+                    if function == "BDH":
+                        request['startDate'], request['endDate'] = periods[0], periods[-1]
+                    requests.append((group, request))
+        return requests
+
+    def fetch(self, service) -> dict:
+        """
+        Send the requests and map the answers back onto the cells
+
+        Args:
+            service: BlpapiService or HttpService
+
+        Returns:
+            {key: value} for every cell; invalid securities, fields a security
+            does not have and periods without data get the text Excel would show
+        """
+        answers = {}
+        for group, request in self._requests(service.max_securities, service.max_fields):
+            for security, result in service.request(request).items():
+                answer = answers.setdefault((group, security), {'error': None, 'values': {},
+                                                                'field_errors': set()})
+                answer['error'] = answer['error'] or result['error']
+                answer['values'].update(result['values'])
+                answer['field_errors'].update(result['field_errors'])
+
+        values = {key: UNSUPPORTED for key in self.unsupported}
+        for key, security, field, period, group in self.cells:
+            answer = answers.get((group, security))
+            if answer is None or answer['error']:
+                values[key] = INVALID_SECURITY
+            elif field in answer['field_errors']:
+                values[key] = FIELD_NOT_APPLICABLE
+            else:
+                fill = dict(group[1]).get('Fill', NO_DATA)
+                value = answer['values'].get((field, period))
+                values[key] = fill if value is None else value
+        return values
+
+
+def _normalise(security_data: list) -> dict:
+    """
+    Bloomberg's securityData elements → {security: {'error', 'values', 'field_errors'}}
+
+    values is {(field, period): value}; period is the row's "date" (the
+    fiscal period label with DateFormat=P) for historical data, None for
+    reference data.
+    """
+    results = {}
+    for item in security_data:
+        result = results.setdefault(item['security'], {'error': None, 'values': {},
+                                                       'field_errors': set()})
+        if item.get('securityError'):
+            result['error'] = item['securityError'].get('message', 'Invalid security')
+            continue
+        for exception in item.get('fieldExceptions') or ():
+            result['field_errors'].add(exception['fieldId'])
+        data = item.get('fieldData') or {}
+        rows = data if isinstance(data, list) else [data]
+        for row in rows:
+            period = row.get('date') if isinstance(data, list) else None
+            for field, value in row.items():
+                if field != 'date':
+                    result['values'][(field, period)] = value
+    return results
+
+
+class HttpService:
+    """Requests sent as JSON to an HTTP endpoint (see StandInServer)"""
+
+    def __init__(self, url: str, max_securities: int = MAX_SECURITIES,
+                 max_fields: int = MAX_FIELDS, timeout: float = 60, retries: int = 4):
+        """
+        Args:
+            url: Base URL of the endpoint (e.g. http://127.0.0.1:8195)
+            max_securities / max_fields: Per-request limits to split at
+            timeout: Socket timeout in seconds
+            retries: Extra attempts on HTTP 429 / 5xx and dropped connections
+        """
+        self.url = url.rstrip("/")
+        self.max_securities = max_securities
+        self.max_fields = max_fields
+        self.timeout = timeout
+        self.retries = retries
+        self.stats = {'requests': 0, 'pages': 0, 'retries': 0}
+        self._local = threading.local()
+
+    def request(self, request: dict) -> dict:
+        """Send one request, following partial responses; returns normalised results"""
+        self.stats['requests'] += 1
+        reply = self._post({'request': request})
+        security_data = list(reply.get('securityData', []))
+        while reply.get('partial'):
+            reply = self._post({'continue': reply['partial']})
+            security_data += reply.get('securityData', [])
+        return _normalise(security_data)
+
+    def close(self) -> None:
+        conn = self._local.__dict__.pop("conn", None)
+        if conn is not None:
+            conn.close()
+
+    def _post(self, body: dict) -> dict:
+        payload = json.dumps(body).encode("utf-8")
+        for attempt in range(self.retries + 1):
+            self.stats['pages'] += 1
+            try:
+                status, headers, reply = self._send(payload)
+            except (OSError, http.client.HTTPException):
+                self.close()
+                if attempt == self.retries:
+                    raise
+                self.stats['retries'] += 1
+                time.sleep(2 ** attempt * 0.1)
+                continue
+
+            if status == 200:
+                return json.loads(reply)
+            if (status == 429 or status >= 500) and attempt < self.retries:
+                self.stats['retries'] += 1
+                time.sleep(float(headers.get("Retry-After") or 2 ** attempt * 0.1))
+                continue
+            try:
+                error = json.loads(reply).get('responseError', {})
+            except ValueError:
+                error = {'message': reply.decode("utf-8", "replace")[:200]}
+            raise BloombergApiError(f"{error.get('category', status)}: {error.get('message', '')}")
+
+    def _send(self, payload: bytes) -> tuple:
+        """One POST on this thread's keep-alive connection"""
+        conn = self._local.__dict__.get("conn")
+        url = urllib.parse.urlsplit(self.url)
+        if conn is None:
+            kind = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+            conn = self._local.conn = kind(url.netloc, timeout=self.timeout)
+        conn.request("POST", url.path + "/request", body=payload,
+                     headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.status, response.headers, response.read()
+
+
+class BlpapiService:
+    """Requests sent over a blpapi session to //blp/refdata"""
+
+    def __init__(self, host: str = "localhost", port: int = 8194,
+                 max_securities: int = MAX_SECURITIES, max_fields: int = MAX_FIELDS,
+                 timeout: float = 60):
+        """
+        Args:
+            host / port: Bloomberg API endpoint (the terminal's Desktop API by default)
+            max_securities / max_fields: Per-request limits to split at
+            timeout: Seconds to wait for each response event
+        """
+        try:
+            import blpapi
+        except ImportError as e:
+            raise ImportError(f"{e}. The api backend needs the Bloomberg API: pip install "
+                              "--index-url=https://blpapi.bloomberg.com/repository/releases/python/simple/ "
+                              "blpapi (or an HTTP endpoint, see --api-url)") from e
+        self.blpapi = blpapi
+        self.max_securities = max_securities
+        self.max_fields = max_fields
+        self.timeout = timeout
+        self.stats = {'requests': 0, 'pages': 0, 'retries': 0}
+
+        options = blpapi.SessionOptions()
+        options.setServerHost(host)
+        options.setServerPort(port)
+        self.session = blpapi.Session(options)
+        if not self.session.start() or not self.session.openService("//blp/refdata"):
+            raise BloombergApiError(f"Cannot open //blp/refdata on {host}:{port}")
+        self.refdata = self.session.getService("//blp/refdata")
+        self._lock = threading.Lock()
+
+    def request(self, request: dict) -> dict:
+        """Send one request, collecting partial responses; returns normalised results"""
+        blp_request = self.refdata.createRequest(request['type'])
+        for security in request['securities']:
+            blp_request.getElement("securities").appendValue(security)
+        for field in request['fields']:
+            blp_request.getElement("fields").appendValue(field)
+        options = request['options']
+        fiscal = False
+        if request['type'] == HISTORICAL:
+            fiscal = bool(FISCAL_YEAR_RE.match(request['startDate']))
+            blp_request.set("startDate", _api_date(request['startDate'], end=False))
+            blp_request.set("endDate", _api_date(request['endDate'], end=True))
+            selection, adjustment = PERIODICITY.get(options.get('Period', 'D'), PERIODICITY['D'])
+            blp_request.set("periodicitySelection", selection)
+            blp_request.set("periodicityAdjustment", adjustment)
+            if options.get('Currency'):
+                blp_request.set("currency", options['Currency'])
+        for name, value in request['overrides'].items():
+            override = blp_request.getElement("overrides").appendElement()
+            override.setElement("fieldId", name)
+            override.setElement("value", value)
+
+        security_data = []
+        # One session serves every thread; responses are matched to requests in order
+        with self._lock:
+            self.stats['requests'] += 1
+            self.session.sendRequest(blp_request)
+            while True:
+                event = self.session.nextEvent(int(self.timeout * 1000))
+                if event.eventType() == self.blpapi.Event.TIMEOUT:
+                    raise BloombergApiError(f"No response within {self.timeout}s")
+                for message in event:
+                    data = message.toPy()
+                    if 'responseError' in data:
+                        error = data['responseError']
+                        raise BloombergApiError(f"{error.get('category')}: {error.get('message')}")
+                    items = data.get('securityData', [])
+                    security_data += items if isinstance(items, list) else [items]
+                if event.eventType() == self.blpapi.Event.PARTIAL_RESPONSE:
+                    self.stats['pages'] += 1
+                elif event.eventType() == self.blpapi.Event.RESPONSE:
+                    self.stats['pages'] += 1
+                    break
+
+        for item in security_data:
+            for row in item.get('fieldData') or ():
+                if isinstance(row, dict) and 'date' in row:
+                    row['date'] = (f"FY {row['date'].year}" if fiscal
+                                   else row['date'].strftime("%Y%m%d"))
+        return _normalise(security_data)
+
+    def close(self) -> None:
+        self.session.stop()
+
+
+def _api_date(period: str, end: bool) -> str:
+    """
+    Excel BDH start/end → the API's YYYYMMDD
+
+    "FY 2019" covers calendar 2019: the FA1 companies' fiscal years end in
+    March, so a fiscal year's row is dated inside the year it is named after.
+    """
+    fiscal = FISCAL_YEAR_RE.match(period)
+    if fiscal:
+        return f"{fiscal.group(1)}{'1231' if end else '0101'}"
+    if re.match(r'^\d{8}$', period):
+        return period
+    raise BloombergApiError(f"Cannot send period '{period}' over the API")
+
+
+def _periods_between(start: str, end: str) -> list:
+    """Fiscal years from start to end, or just the two dates"""
+    first, last = FISCAL_YEAR_RE.match(start), FISCAL_YEAR_RE.match(end)
+    if first and last:
+        return [f"FY {year}" for year in range(int(first.group(1)), int(last.group(1)) + 1)]
+    return [start] if start == end else [start, end]
+
+
+class StandInServer:
+    """
+    Local stand-in for the reference data service, answering HttpService
+
+    Values are deterministic per security, field, period and overrides.
+
+    Usage:
+        with StandInServer(invalid={"XXXX IN Equity"}) as server:
+            service = HttpService(server.url)
+            ...
+            server.stats        # requests, pages, securities, rejected, failed
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 max_securities: int = MAX_SECURITIES, page_size: int = 10,
+                 invalid=(), not_applicable=(), fail_every: int = 0, latency: float = 0.0):
+        """
+        Args:
+            host / port: Where to listen (port 0: any free port)
+            max_securities: Requests with more securities are rejected (BAD_ARGS)
+            page_size: Securities per partial response
+            invalid: Securities answered with a securityError; so is anything
+                     that is not an "... Equity" ticker
+            not_applicable: Fields answered with a fieldException
+            fail_every: Every n-th call fails with HTTP 503 (0: never)
+            latency: Seconds every call takes, to mimic the service
+        """
+        self.max_securities = max_securities
+        self.page_size = page_size
+        self.invalid = set(invalid)
+        self.not_applicable = {f.upper() for f in not_applicable}
+        self.fail_every = fail_every
+        self.latency = latency
+        self.stats = {'requests': 0, 'pages': 0, 'securities': 0, 'rejected': 0, 'failed': 0}
+        self._calls = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "StandInServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; don't let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if server.latency:
+                    time.sleep(server.latency)
+                with server._lock:
+                    status, reply = server.handle(json.loads(body or b"{}"))
+                payload = json.dumps(reply).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if status == 503:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def handle(self, body: dict) -> tuple:
+        """(status, JSON reply) for one call"""
+        self._calls += 1
+        if self.fail_every and self._calls % self.fail_every == 0:
+            self.stats['failed'] += 1
+            return 503, {'responseError': {'category': 'UNAVAILABLE', 'message': 'Service busy'}}
+
+        if 'continue' in body:
+            pages = self._pending.get(body['continue'])
+            if not pages:
+                return 400, {'responseError': {'category': 'BAD_ARGS', 'message': 'Unknown continuation'}}
+            return 200, self._page(body['continue'], pages)
+
+        request = body.get('request') or {}
+        if request.get('type') not in (HISTORICAL, REFERENCE):
+            return 400, {'responseError': {'category': 'BAD_ARGS',
+                                           'message': f"Unknown request type {request.get('type')}"}}
+        securities = request.get('securities') or []
+        if len(securities) > self.max_securities or len(request.get('fields') or ()) > MAX_FIELDS:
+            self.stats['rejected'] += 1
+            return 400, {'responseError': {'category': 'BAD_ARGS',
+                                           'message': 'Too many securities or fields in one request'}}
+        self.stats['requests'] += 1
+        self.stats['securities'] += len(securities)
+        data = [self._security_data(request, security) for security in securities]
+        token = uuid.uuid4().hex
+        self._pending[token] = [data[i:i + self.page_size]
+                                for i in range(0, len(data), self.page_size)] or [[]]
+        return 200, self._page(token, self._pending[token])
+
+    def _page(self, token: str, pages: list) -> dict:
+        self.stats['pages'] += 1
+        page = pages.pop(0)
+        if not pages:
+            del self._pending[token]
+            return {'securityData': page}
+        return {'securityData': page, 'partial': token}
+
+    def _security_data(self, request: dict, security: str) -> dict:
+        if security in self.invalid or not security.endswith(" Equity"):
+            return {'security': security,
+                    'securityError': {'category': 'BAD_SEC', 'message': 'Unknown/Invalid security'}}
+        overrides = json.dumps(request.get('overrides') or {}, sort_keys=True)
+        fields = [f for f in request['fields'] if f.upper() not in self.not_applicable]
+        exceptions = [{'fieldId': f, 'errorInfo': {'category': 'BAD_FLD',
+                                                   'message': 'Field not applicable to security'}}
+                      for f in request['fields'] if f.upper() in self.not_applicable]
+
+        def value(field, period):
+            return fake_value(f"{security}|{field}|{period}|{overrides}")
+
+        if request['type'] == HISTORICAL:
+            data = [dict({'date': period}, **{f: value(f, period) for f in fields})
+                    for period in _periods_between(request['startDate'], request['endDate'])]
+        else:
+            data = {f: value(f, None) for f in fields}
+        return {'security': security, 'fieldExceptions': exceptions, 'fieldData': data}
+
+
+def _template_cells(template_path: str, symbols: list, fields: str = None) -> list:
+    """(key, formula) of every formula cell in a pack of the template for symbols"""
+    import io
+    from openpyxl import load_workbook
+    from template_catalog import compile_template
+
+    contents, _ = compile_template(template_path, fields).render_pack(symbols)
+    wb = load_workbook(io.BytesIO(contents))
+    cells = [((ws.title, r, c), formula)
+             for ws in wb.worksheets
+             for r, row in enumerate(ws.iter_rows(values_only=True))
+             for c, formula in enumerate(row)
+             if isinstance(formula, str) and formula.startswith("=")]
+    wb.close()
+    return cells
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bloomberg API request plans and a local stand-in service')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    plan_parser = commands.add_parser('plan', help='Show the requests a pack of the template needs')
+    plan_parser.add_argument('template', help='Bloomberg Excel template')
+    plan_parser.add_argument('--symbols', '-s', default='IOCL',
+                             help='Comma-separated symbols packed into one workbook (default: IOCL)')
+    plan_parser.add_argument('--max-securities', type=int, default=MAX_SECURITIES,
+                             help=f'Securities per request (default: {MAX_SECURITIES})')
+    plan_parser.add_argument('--fields', help='Only the line items of these field sets / mnemonics')
+
+    serve_parser = commands.add_parser('serve', help='Run the stand-in service until interrupted')
+    serve_parser.add_argument('--port', type=int, default=8195, help='Port (default: 8195)')
+    serve_parser.add_argument('--page-size', type=int, default=10,
+                              help='Securities per partial response (default: 10)')
+    serve_parser.add_argument('--max-securities', type=int, default=MAX_SECURITIES,
+                              help=f'Securities accepted per request (default: {MAX_SECURITIES})')
+    serve_parser.add_argument('--invalid', default='',
+                              help='Comma-separated securities to report as invalid ("XXXX IN Equity")')
+    serve_parser.add_argument('--not-applicable', default='',
+                              help='Comma-separated fields to report as not applicable')
+    serve_parser.add_argument('--fail-every', type=int, default=0,
+                              help='Fail every n-th call with HTTP 503 (default: never)')
+    serve_parser.add_argument('--latency', type=float, default=0.0,
+                              help='Seconds every call takes (default: 0)')
+    args = parser.parse_args()
+
+    if args.command == 'plan':
+        symbols = [s.strip() for s in args.symbols.split(',') if s.strip()]
+        plan = RequestPlan.build(_template_cells(args.template, symbols, args.fields))
+        requests = plan.requests(args.max_securities)
+        print(f"📐 {len(plan.cells)} formula cells ({len(plan.unsupported)} unsupported), "
+              f"{len(symbols)} symbols → {len(requests)} requests")
+        for request in requests:
+            period = (f" {request['startDate']} → {request['endDate']}"
+                      if request['type'] == HISTORICAL else "")
+            overrides = ", ".join(f"{k}={v}" for k, v in request['overrides'].items())
+            print(f"   {request['type']}: {len(request['securities'])} securities × "
+                  f"{len(request['fields'])} fields{period} [{overrides}]")
+        return
+
+    server = StandInServer(port=args.port, max_securities=args.max_securities,
+                           page_size=args.page_size,
+                           invalid=[s.strip() for s in args.invalid.split(',') if s.strip()],
+                           not_applicable=[f.strip() for f in args.not_applicable.split(',') if f.strip()],
+                           fail_every=args.fail_every, latency=args.latency)
+    print(f"🛰️  Stand-in Bloomberg API on {server.url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📞 {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,31 +2,63 @@
 Bloomberg Symbol Browser
 ========================
 Browse and search the 3000+ available Bloomberg symbols
+
+The symbol list comes from the cached universe index (symbol_universe.py),
+loaded once per session; BB_symbol.csv is only parsed again when it changes.
+Sectors are the Industry Group / Industry of each symbol's NSE/BSE listing
+in query-results.csv (listing_map.py), loaded only when sectors are shown.
 """
 
-import pandas as pd
 import sys
 
+from symbol_universe import SymbolUniverse
+
+
+_universe = None
+_listings = None
+_frame = None
+
+
+def get_universe() -> SymbolUniverse:
+    """The symbol universe, loaded once per session"""
+    global _universe
+    if _universe is None:
+        _universe = SymbolUniverse.load('BB_symbol.csv')
+    return _universe
+
+
+def get_listing_map():
+    """Bloomberg → NSE/BSE listing map with industries, loaded once per session"""
+    global _listings
+    if _listings is None:
+        from listing_map import ListingMap
+        _listings = ListingMap.load('BB_symbol.csv', 'query-results.csv')
+    return _listings
+
 
 def load_symbols():
-    """Load symbols from CSV"""
-    df = pd.read_csv('BB_symbol.csv')
-    # Clean up ticker (remove ' Equity' suffix)
-    df['Symbol'] = df['Ticker'].str.replace(' Equity', '', regex=False)
-    return df
+    """Symbols as a DataFrame (Ticker, Symbol, Short Name, Market Cap, ...)"""
+    global _frame
+    if _frame is None:
+        _frame = get_universe().to_frame()
+    return _frame
+
+
+def _market_cap(universe: SymbolUniverse, row: int) -> float:
+    return universe.numeric['Market Cap'][row]
 
 
 def show_top_symbols(count=20):
     """Show top symbols by market cap"""
-    df = load_symbols()
+    universe = get_universe()
     print(f"\n{'='*80}")
     print(f"Top {count} Indian Stocks by Market Cap")
     print(f"{'='*80}\n")
     
-    for i, row in df.head(count).iterrows():
-        symbol = row['Symbol']
-        name = row['Short Name']
-        mcap = row['Market Cap']
+    for i in range(min(count, len(universe))):
+        symbol = universe.symbols[i]
+        name = universe.names[i]
+        mcap = _market_cap(universe, i)
         
         # Format market cap in trillions
         mcap_t = mcap / 1_000_000_000_000
@@ -37,15 +69,12 @@ def show_top_symbols(count=20):
 
 
 def search_symbols(query):
-    """Search for symbols by name or symbol"""
-    df = load_symbols()
+    """Search for symbols by name or symbol (best matches first, typos tolerated)"""
+    universe = get_universe()
     query = query.upper()
     
-    # Search in symbol or name
-    mask = (df['Symbol'].str.contains(query, case=False, na=False) | 
-            df['Short Name'].str.contains(query, case=False, na=False))
-    
-    results = df[mask]
+    # Ranked matches on symbol or name
+    results = universe.search(query, limit=None)
     
     if len(results) == 0:
         print(f"\n❌ No symbols found matching '{query}'\n")
@@ -55,10 +84,10 @@ def search_symbols(query):
     print(f"Search Results for '{query}' ({len(results)} found)")
     print(f"{'='*80}\n")
     
-    for i, row in results.head(20).iterrows():
-        symbol = row['Symbol']
-        name = row['Short Name']
-        mcap = row['Market Cap']
+    for row, _ in results[:20]:
+        symbol = universe.symbols[row]
+        name = universe.names[row]
+        mcap = _market_cap(universe, row)
         mcap_t = mcap / 1_000_000_000_000
         
         print(f"{symbol:12s} - {name:30s} - ₹{mcap_t:5.2f}T")
@@ -69,33 +98,43 @@ def search_symbols(query):
     print(f"\n{'='*80}\n")
 
 
-def show_sectors():
-    """Show symbols grouped by sector (approximate based on name)"""
-    df = load_symbols()
-    
-    sectors = {
-        'Banks': ['BANK', 'HDFC', 'ICICI', 'AXIS', 'KOTAK', 'SBI'],
-        'IT': ['TECH', 'INFO', 'TCS', 'WIPRO', 'HCL'],
-        'Energy': ['OIL', 'COAL', 'NTPC', 'POWER', 'RELIANCE'],
-        'Auto': ['MARUTI', 'MAHINDRA', 'TATA MOTORS', 'BAJAJ', 'HERO'],
-        'Pharma': ['PHARMA', 'SUN', 'CIPLA', 'REDDY'],
-        'Finance': ['FINANCE', 'BAJAJ FIN'],
-    }
+def show_sectors(sector=None, per_sector=10):
+    """Show symbols grouped by industry (query-results.csv, via the listing map)"""
+    listings = get_listing_map()
+    universe = get_universe()
+    
+    if sector:
+        try:
+            symbols = listings.select(sector)
+        except KeyError:
+            print(f"\n❌ Unknown sector '{sector}'. Industry groups:")
+            for group in listings.groups():
+                print(f"   - {group}")
+            print()
+            return
+        
+        print(f"\n{'='*80}")
+        print(f"{sector} ({len(symbols)} symbols)")
+        print(f"{'='*80}\n")
+        for symbol in symbols:
+            row = universe.lookup(symbol)
+            industry = listings.industry_of(symbol)[1]
+            print(f"  {symbol:12s} - {universe.names[row]:18s} - {industry}")
+        print(f"\n{'='*80}\n")
+        return
     
     print(f"\n{'='*80}")
-    print(f"Symbols by Sector (Sample)")
+    print(f"Symbols by Industry Group (largest groups, top {per_sector} by market cap)")
     print(f"{'='*80}\n")
     
-    for sector, keywords in sectors.items():
-        print(f"\n{sector}:")
+    for group, count in list(listings.groups().items())[:15]:
+        print(f"\n{group} ({count}):")
         print("-" * 40)
         
-        mask = df['Short Name'].str.contains('|'.join(keywords), case=False, na=False)
-        sector_df = df[mask].head(10)
-        
-        for _, row in sector_df.iterrows():
-            print(f"  {row['Symbol']:12s} - {row['Short Name']}")
+        for symbol in listings.by_group[group][:per_sector]:
+            print(f"  {symbol:12s} - {universe.names[universe.lookup(symbol)]}")
     
+    print(f"\nShow one group or industry: python browse_symbols.py sector \"Banks\"")
     print(f"\n{'='*80}\n")
 
 
@@ -125,7 +164,8 @@ def interactive_mode():
             if query:
                 search_symbols(query)
         elif choice == '4':
-            show_sectors()
+            sector = input("\nIndustry group or industry (blank for overview): ").strip()
+            show_sectors(sector or None)
         elif choice == '5':
             export_symbols()
         elif choice == '6':
@@ -137,25 +177,25 @@ def interactive_mode():
 
 def export_symbols():
     """Export all symbols to a text file"""
-    df = load_symbols()
+    universe = get_universe()
     
     filename = "bloomberg_symbols_list.txt"
     
     with open(filename, 'w', encoding='utf-8') as f:
         f.write("="*80 + "\n")
         f.write("Bloomberg Symbols - Complete List\n")
-        f.write(f"Total: {len(df)} symbols\n")
+        f.write(f"Total: {len(universe)} symbols\n")
         f.write("="*80 + "\n\n")
         
-        for i, row in df.iterrows():
-            symbol = row['Symbol']
-            name = row['Short Name']
-            mcap = row['Market Cap']
+        for i in range(len(universe)):
+            symbol = universe.symbols[i]
+            name = universe.names[i]
+            mcap = _market_cap(universe, i)
             mcap_t = mcap / 1_000_000_000_000
             
             f.write(f"{symbol:12s} - {name:30s} - ₹{mcap_t:5.2f}T\n")
     
-    print(f"\n✅ Exported {len(df)} symbols to: {filename}\n")
+    print(f"\n✅ Exported {len(universe)} symbols to: {filename}\n")
 
 
 def main():
@@ -172,14 +212,14 @@ def main():
             else:
                 search_symbols(sys.argv[2])
         elif command == 'sector':
-            show_sectors()
+            show_sectors(sys.argv[2] if len(sys.argv) > 2 else None)
         elif command == 'export':
             export_symbols()
         else:
             print("Usage:")
             print("  python browse_symbols.py top [count]")
             print("  python browse_symbols.py search <term>")
-            print("  python browse_symbols.py sector")
+            print("  python browse_symbols.py sector [industry]")
             print("  python browse_symbols.py export")
     else:
         # Interactive mode
@@ -5,50 +5,108 @@ This script downloads financial data from Bloomberg Terminal for Indian stocks.
 
 Requirements:
 - Bloomberg Terminal must be installed and running
-- Excel must be installed
+- Excel and xlwings (Windows) for the default excel backend; they are only
+  loaded when that backend is used, so the rest runs on any platform
 - Bloomberg Excel template file: FA1_vwijagme.xlsx
 
 Usage:
     python download_bloomberg_data.py --symbol HDFCB
     python download_bloomberg_data.py --symbol IOCL --output_dir ./output
+    python download_bloomberg_data.py --symbol HDFCB --service http://127.0.0.1:8765
 """
 
 import os
-import time
 import sys
+import time
 import argparse
-import subprocess
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
 
-try:
-    from openpyxl import load_workbook
-    import xlwings as xw
-except ImportError as e:
-    print(f"❌ Missing required package: {e}")
-    print("Please install requirements: pip install openpyxl xlwings pandas")
-    sys.exit(1)
+# pandas, numpy and pyarrow come in through the template catalog, the
+# refresh result and the stores; those are imported where they are used so
+# --help and the --service client start without them
+from template_patcher import CompiledTemplate, SHEET_NAME
+from metrics import file_sizes, format_stages, record, timed
+from symbol_universe import DEFAULT_CSV, SymbolUniverse, bare_symbol
+from symbol_validation import DEFAULT_INVALID_TTL, InvalidSymbolCache, preflight, print_preflight
+from refresh_backends import (BACKENDS, ExcelBackend, make_backend, wait_until_ready, INVALID, INVALID_SECURITY,
+                              NO_DATA, TIMEOUT)
+
+# Every formula cell came back blank: Excel errors such as #NAME? rather than data
+NO_DATA_ERROR = "No formula returned a value (#NAME? - is the Bloomberg add-in loaded?)"
 
 
 class BloombergDataDownloader:
-    def __init__(self, template_path: str, output_dir: str = "./output"):
+    def __init__(self, template_path: str, output_dir: str = "./output", backend=None,
+                 formats=("xlsx", "csv"), store: "ParquetStore" = None, temp_dir: str = None,
+                 snapshots: "SnapshotStore" = None, write_unchanged: bool = False,
+                 history: "HistoryStore" = None, fields: str = None):
         """
         Initialize the Bloomberg Data Downloader
         
         Args:
             template_path: Path to Bloomberg Excel template (FA1_vwijagme.xlsx)
             output_dir: Directory to save output files
+            backend: RefreshBackend that evaluates the formulas (default: Excel)
+            formats: Per-symbol files to write: any of "xlsx" (with formulas),
+                     "values" (values-only workbook), "csv"
+            store: Optional ParquetStore every refresh is appended to
+            temp_dir: Where per-symbol working copies go (default: output_dir)
+            snapshots: Optional SnapshotStore; refreshes returning the same
+                       values as the symbol's last snapshot write no files
+            write_unchanged: Write the per-symbol files even when nothing changed
+            history: Optional HistoryStore every refresh's revised values go to
+            fields: Refresh only these line items: field sets and/or mnemonics,
+                    comma-separated (see template_catalog; default: all)
         """
         self.template_path = Path(template_path)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True, parents=True)
+        self.temp_dir = Path(temp_dir) if temp_dir else self.output_dir
+        self.temp_dir.mkdir(exist_ok=True, parents=True)
         
         # Default symbol in template (the one to replace)
         self.default_symbol = "IOCL"
         
+        # Placeholder locations, compiled on first use and reused per symbol
+        self._compiled_template = None
+        
         if not self.template_path.exists():
             raise FileNotFoundError(f"Template file not found: {template_path}")
+        
+        self.backend = backend if backend is not None else ExcelBackend()
+        self.formats = set(formats)
+        self.store = store
+        self.snapshots = snapshots
+        self.write_unchanged = write_unchanged
+        self.history = history
+        self.fields = fields
+        if fields:
+            # Unknown fields should fail here, not on every symbol
+            self.compile_template()
+        
+        # Why the latest download of each symbol failed ({symbol: message})
+        self.errors = {}
+        self._refresh_error = None
+        
+        # Per-symbol stage timings not yet collected (see drain_metrics)
+        self.metrics = []
+    
+    def compile_template(self) -> CompiledTemplate:
+        """
+        Locate every placeholder cell in the template once (trimmed to
+        self.fields if set)
+
+        Returns:
+            The compiled template, cached for subsequent symbols
+        """
+        from template_catalog import compile_template
+
+        if self._compiled_template is None:
+            self._compiled_template = compile_template(
+                self.template_path, self.fields, self.default_symbol
+            )
+        return self._compiled_template
     
     def replace_symbol_in_template(self, new_symbol: str, temp_file_path: Path) -> None:
         """
@@ -60,6 +118,28 @@ class BloombergDataDownloader:
         """
         print(f"📝 Replacing {self.default_symbol} with {new_symbol} in template...")
         
+        try:
+            compiled = self.compile_template()
+        except Exception as e:
+            print(f"⚠️  Template compile failed ({e}), falling back to openpyxl")
+            self.replace_symbol_with_openpyxl(new_symbol, temp_file_path)
+            return
+        
+        replacements = compiled.write(new_symbol, temp_file_path)
+        print(f"✅ Made {replacements} replacements. Saved to: {temp_file_path}")
+    
+    def replace_symbol_with_openpyxl(self, new_symbol: str, temp_file_path: Path) -> None:
+        """
+        Replace the symbol by loading and re-saving the whole workbook
+        
+        Args:
+            new_symbol: Bloomberg symbol (e.g., HDFCB, IOCL)
+            temp_file_path: Path where modified template will be saved
+        """
+        try:
+            from openpyxl import load_workbook
+        except ImportError as e:
+            raise ImportError(f"{e}. The openpyxl fallback needs: pip install openpyxl") from e
         wb = load_workbook(self.template_path)
         ws = wb["BBG Adj Highlights"]
         
@@ -77,116 +157,176 @@ class BloombergDataDownloader:
         wb.save(temp_file_path)
         print(f"✅ Made {replacements} replacements. Saved to: {temp_file_path}")
     
-    def refresh_bloomberg_data(self, xlsx_path: Path, output_excel: Path, 
-                               output_values: Path, wait_seconds: int = 15) -> bool:
+    def refresh_bloomberg_data(self, xlsx_path: Path, output_excel: Path = None,
+                               wait_seconds: int = 15, stages: dict = None,
+                               symbol: str = None) -> "RefreshResult":
         """
-        Open Excel file to refresh Bloomberg formulas and save results
+        Open Excel file to refresh Bloomberg formulas and read back the values
         
         Args:
             xlsx_path: Path to Excel file with Bloomberg formulas
-            output_excel: Path to save Excel with formulas
-            output_values: Path to save values-only Excel
-            wait_seconds: Seconds to wait for Bloomberg data to refresh
+            output_excel: Path to save Excel with formulas (None: don't save it)
+            wait_seconds: Maximum seconds to wait for Bloomberg data to refresh
+            stages: Dict the stage timings are added to (see metrics.STAGES)
+            symbol: Symbol the workbook was written for
         
         Returns:
-            True if successful, False otherwise
+            RefreshResult holding every sheet's values, or None on failure
         """
+        from refresh_result import RefreshResult
+
         print(f"\n🔄 Opening Excel to refresh Bloomberg data...")
-        print(f"⏳ Will wait {wait_seconds} seconds for data refresh...")
+        print(f"⏳ Will wait up to {wait_seconds} seconds for data refresh...")
         
+        stages = stages if stages is not None else {}
+        self._refresh_error = None
         try:
-            # Open the file in Excel
-            os.startfile(str(xlsx_path))
-            time.sleep(wait_seconds)
-            
-            # Connect to the active Excel application
-            app = xw.apps.active
-            if app is None:
-                raise RuntimeError('❌ No Excel application found')
-            
-            # Find the workbook
-            book = None
-            for b in app.books:
-                try:
-                    if xlsx_path.name in b.name:
-                        book = b
-                        break
-                except:
-                    pass
-            
-            if book is None:
-                raise RuntimeError('❌ Workbook not found in Excel')
-            
-            print("📊 Creating values-only copy...")
-            
-            # Create a new workbook for values
-            vals_book = app.books.add()
-            
-            # Copy each sheet's data as values
-            for sh in book.sheets:
-                print(f"   Copying sheet: {sh.name}")
+            with timed(stages, "open"):
+                workbook = self.backend.open_workbook(xlsx_path)
+            try:
+                with timed(stages, "wait"):
+                    ready = wait_until_ready(workbook, timeout=wait_seconds,
+                                             clock=self.backend.clock)
+                if not self._report_readiness(ready):
+                    return None
                 
-                # Create or get target sheet
-                try:
-                    target = vals_book.sheets[sh.name]
-                except Exception:
-                    target = vals_book.sheets.add(sh.name)
+                print("📊 Reading values...")
                 
-                # Copy values
-                data = sh.used_range.value
-                target.range("A1").value = data
-            
-            # Remove default empty sheet if present
-            try:
-                vals_book.sheets["Sheet1"].delete()
-            except Exception:
-                pass
-            
-            # Save both files
-            print(f"💾 Saving values-only file: {output_values}")
-            vals_book.save(str(output_values))
-            vals_book.close()
-            
-            print(f"💾 Saving Excel file: {output_excel}")
-            book.save(str(output_excel))
-            book.close()
+                # Keep each sheet's values in memory for the exporters
+                grids = {}
+                with timed(stages, "copy"):
+                    for name in workbook.sheet_names():
+                        print(f"   Copying sheet: {name}")
+                        grids[name] = workbook.read_values(name)
+                
+                if output_excel is not None:
+                    print(f"💾 Saving Excel file: {output_excel}")
+                    with timed(stages, "save"):
+                        workbook.save(output_excel)
+            finally:
+                workbook.close()
             
-            print("✅ Files saved successfully!")
-            return True
+            print("✅ Values read successfully!")
+            return RefreshResult(symbol, grids)
             
         except Exception as e:
             print(f"❌ Error: {e}")
+            self._refresh_error = str(e)
+            return None
+    
+    def close(self) -> None:
+        """Flush the store and shut down the refresh backend (quits its Excel sessions)"""
+        if self.store is not None:
+            self.store.close()
+        if self.snapshots is not None:
+            self.snapshots.close()
+        if self.history is not None:
+            self.history.close()
+        self.backend.close()
+    
+    def _report_readiness(self, ready: dict) -> bool:
+        """Print the outcome of wait_until_ready; True if the data can be saved"""
+        if ready['status'] == TIMEOUT:
+            self._refresh_error = f"{ready['pending']} cells still requesting data"
+            print(f"❌ Timed out after {ready['elapsed']:.1f}s with "
+                  f"{ready['pending']} cells still requesting data (try a longer --wait)")
             return False
-            
-        finally:
-            # Clean up Excel
-            if 'app' in locals() and app is not None:
-                app.quit()
-            
-            # Force kill Excel if still running
-            try:
-                subprocess.run(["taskkill", "/IM", "EXCEL.EXE", "/F"], 
-                             capture_output=True, timeout=5)
-            except:
-                pass
+        if ready['status'] == INVALID:
+            self._refresh_error = INVALID_SECURITY
+            print(f"❌ Bloomberg reported an invalid security")
+            return False
+        if ready['status'] == NO_DATA:
+            self._refresh_error = NO_DATA_ERROR
+            print(f"❌ {NO_DATA_ERROR}")
+            return False
+        
+        not_applicable = sum(s['not_applicable'] for s in ready['sheets'].values())
+        print(f"✅ Bloomberg data ready after {ready['elapsed']:.1f}s")
+        if not_applicable:
+            print(f"   ⚠️  {not_applicable} cells are 'Field Not Applicable'")
+        if ready['blank']:
+            print(f"   ⚠️  {ready['blank']} formula cells are blank (Excel errors such as #DIV/0!)")
+        return True
     
-    def export_to_csv(self, excel_path: Path, csv_path: Path) -> None:
+    def refresh_pack(self, xlsx_path: Path, sheets: dict, outputs: dict,
+                     wait_seconds: int = 15, stages: dict = None,
+                     symbol_stages: dict = None, results: dict = None) -> dict:
         """
-        Export the main data sheet to CSV
+        Refresh a multi-symbol pack in one Excel session and split the results
+        
+        Each sheet is handled on its own, so a symbol that fails to resolve
+        (or fails to save) does not affect the rest of the pack.
         
         Args:
-            excel_path: Path to Excel file
-            csv_path: Path to save CSV file
+            xlsx_path: Path to the pack workbook
+            sheets: {sheet name: symbol} as returned by the template patcher
+            outputs: {symbol: {'excel': Path or None}} where to save each
+                     symbol's workbook with formulas
+            wait_seconds: Maximum seconds to wait for Bloomberg data to refresh
+            stages: Dict the shared stage timings (open, wait) are added to
+            symbol_stages: {symbol: dict} the per-symbol stage timings are added to
+            results: Dict filled with {symbol: RefreshResult} for every success
+        
+        Returns:
+            {symbol: error message or None if the symbol succeeded}
         """
-        print(f"\n📄 Exporting to CSV: {csv_path}")
+        from refresh_result import RefreshResult
+
+        print(f"\n🔄 Opening Excel to refresh {len(sheets)} symbols...")
+        print(f"⏳ Will wait up to {wait_seconds} seconds for data refresh...")
         
+        stages = stages if stages is not None else {}
+        symbol_stages = symbol_stages if symbol_stages is not None else {}
+        results = results if results is not None else {}
+        errors = {symbol: "Excel refresh failed" for symbol in sheets.values()}
         try:
-            # Read the main data sheet
-            df = pd.read_excel(excel_path, sheet_name="BBG Adj Highlights")
-            df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-            print(f"✅ CSV exported successfully!")
+            with timed(stages, "open"):
+                workbook = self.backend.open_workbook(xlsx_path)
+            try:
+                with timed(stages, "wait"):
+                    ready = wait_until_ready(workbook, timeout=wait_seconds,
+                                             clock=self.backend.clock, sheets=list(sheets))
+                print(f"   Settled after {ready['elapsed']:.1f}s")
+                
+                for sheet_name, symbol in sheets.items():
+                    try:
+                        status = ready['sheets'][sheet_name]
+                        if status['status'] == TIMEOUT:
+                            errors[symbol] = f"{status['pending']} cells still requesting data"
+                            print(f"   ❌ {symbol}: {errors[symbol]}")
+                            continue
+                        if status['status'] == INVALID:
+                            errors[symbol] = INVALID_SECURITY
+                            print(f"   ❌ {symbol}: {INVALID_SECURITY}")
+                            continue
+                        if status['status'] == NO_DATA:
+                            errors[symbol] = NO_DATA_ERROR
+                            print(f"   ❌ {symbol}: {NO_DATA_ERROR}")
+                            continue
+                        
+                        # Values under the usual sheet name, kept in memory
+                        own = symbol_stages.setdefault(symbol, {})
+                        with timed(own, "copy"):
+                            data = workbook.read_values(sheet_name)
+                        
+                        # Workbook with formulas for this symbol only
+                        if outputs[symbol]['excel'] is not None:
+                            with timed(own, "save"):
+                                workbook.save_sheet(sheet_name, outputs[symbol]['excel'], SHEET_NAME)
+                        
+                        results[symbol] = RefreshResult(symbol, {SHEET_NAME: data})
+                        errors[symbol] = None
+                        print(f"   ✓ {symbol}")
+                    except Exception as e:
+                        errors[symbol] = str(e)
+                        print(f"   ❌ {symbol}: {e}")
+            finally:
+                workbook.close()
+            
         except Exception as e:
-            print(f"⚠️  CSV export failed: {e}")
+            print(f"❌ Error: {e}")
+        
+        return errors
     
     def download_data(self, symbol: str, wait_seconds: int = 15) -> dict:
         """
@@ -194,19 +334,11 @@ class BloombergDataDownloader:
         
         Args:
             symbol: Bloomberg symbol (e.g., HDFCB, IOCL)
-            wait_seconds: Seconds to wait for Bloomberg refresh
+            wait_seconds: Maximum seconds to wait for Bloomberg refresh
         
         Returns:
             Dictionary with paths to output files
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # File paths
-        temp_file = self.output_dir / f"temp_{symbol}_{timestamp}.xlsx"
-        output_excel = self.output_dir / f"{symbol}_bloomberg_data_{timestamp}.xlsx"
-        output_values = self.output_dir / f"{symbol}_bloomberg_values_{timestamp}.xlsx"
-        output_csv = self.output_dir / f"{symbol}_bloomberg_data_{timestamp}.csv"
-        
         print(f"\n{'='*60}")
         print(f"📊 Bloomberg Data Downloader")
         print(f"{'='*60}")
@@ -215,41 +347,311 @@ class BloombergDataDownloader:
         print(f"{'='*60}\n")
         
         # Step 1: Replace symbol in template
-        self.replace_symbol_in_template(symbol, temp_file)
+        job = self.prepare_job([symbol])
         
         # Step 2: Refresh Bloomberg data
-        success = self.refresh_bloomberg_data(
-            temp_file, output_excel, output_values, wait_seconds
-        )
+        self.refresh_job(job, wait_seconds)
         
-        if not success:
+        # Step 3: Export to CSV / Parquet store and clean up
+        result = self.finish_job(job)[0]
+        if result is None:
             print("\n❌ Failed to download Bloomberg data")
             return None
         
-        # Step 3: Export to CSV
-        self.export_to_csv(output_values, output_csv)
+        print(f"\n{'='*60}")
+        print(f"✅ SUCCESS! Bloomberg data downloaded for {symbol}")
+        print(f"{'='*60}")
+        print(f"📁 Output files:")
+        if result['excel']:
+            print(f"   Excel (with formulas): {result['excel']}")
+        if result['values']:
+            print(f"   Excel (values only):   {result['values']}")
+        if result['csv']:
+            print(f"   CSV:                   {result['csv']}")
+        if self.store is not None:
+            print(f"   Parquet store:         {self.store.root}")
+        if self.history is not None:
+            print(f"   History store:         {self.history.root}")
+        if job['metrics']:
+            print(f"⏱️  {format_stages(job['metrics'][0]['stages'])}")
+        print(f"{'='*60}\n")
+        
+        return result
+    
+    def prepare_job(self, symbols: list) -> dict:
+        """
+        Write the workbook to refresh for one symbol or a pack of symbols
+        
+        Args:
+            symbols: One symbol, or several to refresh in one pack workbook
+        
+        Returns:
+            Job dict with 'symbols', 'file' (workbook to refresh), 'sheets'
+            ({sheet name: symbol} for packs, else None), 'outputs' (paths
+            dict per symbol, None for formats not written), 'as_of',
+            'errors' and 'results' (RefreshResult per symbol, filled by
+            refresh_job), 'stages' / 'symbol_stages' (timings shared by the
+            job / per symbol) and 'metrics' (filled by finish_job)
+        """
+        as_of = datetime.now()
+        timestamp = as_of.strftime("%Y%m%d_%H%M%S")
+        job = {
+            'symbols': list(symbols),
+            'as_of': as_of,
+            'sheets': None,
+            'errors': {},
+            'results': {},
+            'stages': {},
+            'symbol_stages': {symbol: {} for symbol in symbols},
+            'metrics': [],
+            'outputs': {
+                symbol: {
+                    'symbol': symbol,
+                    'excel': self._output_path(symbol, "data", timestamp, ".xlsx", "xlsx"),
+                    'values': self._output_path(symbol, "values", timestamp, ".xlsx", "values"),
+                    'csv': self._output_path(symbol, "data", timestamp, ".csv", "csv"),
+                }
+                for symbol in symbols
+            },
+        }
+        
+        with timed(job['stages'], "patch"):
+            if len(symbols) == 1:
+                job['file'] = self.temp_dir / f"temp_{symbols[0]}_{timestamp}.xlsx"
+                self.replace_symbol_in_template(symbols[0], job['file'])
+            else:
+                # One workbook with a sheet per symbol
+                job['file'] = self.temp_dir / f"temp_pack_{symbols[0]}_{timestamp}.xlsx"
+                print(f"📝 Building pack workbook: {job['file']}")
+                job['sheets'] = self.compile_template().write_pack(symbols, job['file'])
+        return job
+    
+    def _output_path(self, symbol: str, kind: str, timestamp: str, suffix: str, fmt: str):
+        """Output file for one format, or None if that format is not written"""
+        if fmt not in self.formats:
+            return None
+        return self.output_dir / f"{symbol}_bloomberg_{kind}_{timestamp}{suffix}"
+    
+    def refresh_job(self, job: dict, wait_seconds: int = 15) -> dict:
+        """
+        Refresh a prepared job's workbook and save the raw results
+        
+        Args:
+            job: From prepare_job()
+            wait_seconds: Maximum seconds to wait for Bloomberg refresh
+        
+        Returns:
+            {symbol: error message or None if the symbol succeeded}
+        """
+        if job['sheets'] is None:
+            symbol = job['symbols'][0]
+            output = job['outputs'][symbol]
+            result = self.refresh_bloomberg_data(
+                job['file'], output['excel'], wait_seconds, job['stages'], symbol
+            )
+            if result is not None:
+                job['results'][symbol] = result
+            errors = {symbol: None if result else (self._refresh_error or "Excel refresh failed")}
+        else:
+            errors = self.refresh_pack(job['file'], job['sheets'], job['outputs'], wait_seconds,
+                                       job['stages'], job['symbol_stages'], job['results'])
+        
+        for symbol in job['symbols']:
+            if errors.get(symbol):
+                self.errors[symbol] = errors[symbol]
+            else:
+                self.errors.pop(symbol, None)
+        job['errors'] = errors
+        return errors
+    
+    def finish_job(self, job: dict) -> list:
+        """
+        Export every symbol that refreshed and delete the job's workbook
+        
+        Args:
+            job: From prepare_job(), after refresh_job()
+        
+        Returns:
+            One entry per symbol, in order: the output paths dict or None
+        """
+        results = []
+        for symbol in job['symbols']:
+            error = job['errors'].get(symbol, "not refreshed")
+            stages = {**job['stages'], **job['symbol_stages'].get(symbol, {})}
+            sizes = {}
+            refreshed = job['results'].pop(symbol, None)
+            if error or refreshed is None:
+                results.append(None)
+            else:
+                refreshed.as_of = job['as_of']
+                results.append(self.publish_outputs(job['outputs'][symbol], refreshed,
+                                                    stages, sizes))
+            job['metrics'].append(record(symbol, error, stages, sizes))
+        self.metrics.extend(job['metrics'])
         
         # Clean up temp file
         try:
-            temp_file.unlink()
+            job['file'].unlink()
         except:
             pass
+        return results
+    
+    def drain_metrics(self) -> list:
+        """Metrics records of every job finished since the last call (see metrics.record)"""
+        drained, self.metrics = self.metrics, []
+        return drained
+    
+    def publish_outputs(self, output: dict, result: "RefreshResult", stages: dict = None,
+                        sizes: dict = None) -> dict:
+        """
+        Write the requested formats for one refreshed symbol from its in-memory values
         
+        With a snapshot store, a refresh that returned exactly the values of
+        the symbol's last snapshot writes nothing: no CSV, values workbook or
+        store rows, and the workbook with formulas is removed again.
+        
+        Args:
+            output: Paths dict with 'symbol', 'excel', 'values' and 'csv'
+                    (None for formats not written)
+            result: RefreshResult of the symbol (as_of set to the refresh time)
+            stages: Dict the parse/snapshot/history/csv/save_values/store timings are added to
+            sizes: Dict the bytes of every file written are added to
+        
+        Returns:
+            The paths dict plus 'periods' (fiscal period columns returned),
+            'store', 'changed' (False if the values matched the last snapshot,
+            None without a snapshot store), 'snapshot' (snapshot store file)
+            and 'snapshot_seq'
+        """
+        stages = stages if stages is not None else {}
+        output['periods'] = None
+        output['store'] = None
+        output['changed'] = None
+        output['snapshot'] = None
+        output['snapshot_seq'] = None
+        try:
+            with timed(stages, "parse"):
+                table = result.table()
+            output['periods'] = result.periods()
+        except Exception as e:
+            table = None
+            print(f"⚠️  Could not parse refreshed values: {e}")
+        
+        if self.snapshots is not None and table is not None:
+            from snapshot_store import UNCHANGED
+
+            try:
+                with timed(stages, "snapshot"):
+                    saved = self.snapshots.save(output['symbol'], table, result.as_of)
+                output['changed'] = saved['kind'] != UNCHANGED
+                output['snapshot'] = str(self.snapshots.path)
+                output['snapshot_seq'] = saved['seq']
+                if sizes is not None:
+                    sizes['snapshot'] = saved['bytes']
+                if saved['seq'] == 1:
+                    print(f"📸 First snapshot ({saved['bytes']} bytes)")
+                elif output['changed']:
+                    print(f"🔀 {saved['changed']} values changed, {saved['kind']} snapshot "
+                          f"#{saved['seq']} ({saved['bytes']} bytes)")
+            except Exception as e:
+                print(f"⚠️  Snapshot failed: {e}")
+        
+        if self.history is not None and table is not None:
+            try:
+                with timed(stages, "history"):
+                    revised = self.history.append(table, result.as_of)
+                if revised:
+                    print(f"📚 {revised} revised values added to the history store")
+            except Exception as e:
+                print(f"⚠️  History store failed: {e}")
+        
+        if output['changed'] is False and not self.write_unchanged:
+            print(f"💤 Same values as snapshot #{output['snapshot_seq']}, nothing written")
+            if output['excel'] is not None:
+                try:
+                    output['excel'].unlink()
+                except OSError:
+                    pass
+            output['excel'] = output['values'] = output['csv'] = None
+            return output
+        
+        if output['csv'] is not None:
+            with timed(stages, "csv"):
+                result.to_csv(output['csv'])
+            print(f"💾 Saved CSV: {output['csv']}")
+        if output['values'] is not None:
+            print(f"💾 Saving values-only file: {output['values']}")
+            with timed(stages, "save_values"):
+                result.to_xlsx(output['values'])
+        if sizes is not None:
+            sizes.update(file_sizes({key: output[key] for key in ('excel', 'values', 'csv')}))
+        
+        if self.store is not None and table is not None:
+            try:
+                with timed(stages, "store"):
+                    self.store.append(table, result.as_of)
+                output['store'] = str(self.store.root)
+                print(f"🗄️  Stored {len(table)} values in {self.store.root}")
+            except Exception as e:
+                print(f"⚠️  Parquet store failed: {e}")
+        
+        return output
+    
+    def download_pack(self, symbols: list, wait_seconds: int = 15) -> list:
+        """
+        Download Bloomberg data for several symbols with one Excel refresh
+        
+        Args:
+            symbols: Bloomberg symbols to refresh together
+            wait_seconds: Maximum seconds to wait for Bloomberg refresh
+        
+        Returns:
+            One entry per symbol, in order: the output paths dict (as returned
+            by download_data) or None if that symbol failed
+        """
         print(f"\n{'='*60}")
-        print(f"✅ SUCCESS! Bloomberg data downloaded for {symbol}")
+        print(f"📊 Bloomberg Data Downloader (pack of {len(symbols)})")
         print(f"{'='*60}")
-        print(f"📁 Output files:")
-        print(f"   Excel (with formulas): {output_excel}")
-        print(f"   Excel (values only):   {output_values}")
-        print(f"   CSV:                   {output_csv}")
+        print(f"Symbols: {', '.join(symbols)}")
+        print(f"Output Directory: {self.output_dir}")
         print(f"{'='*60}\n")
         
-        return {
-            'symbol': symbol,
-            'excel': output_excel,
-            'values': output_values,
-            'csv': output_csv
-        }
+        # Step 1: One workbook with a sheet per symbol
+        job = self.prepare_job(symbols)
+        
+        # Step 2: Refresh the whole pack at once
+        self.refresh_job(job, wait_seconds)
+        
+        # Step 3: Export each symbol that resolved
+        results = self.finish_job(job)
+        
+        ok = sum(r is not None for r in results)
+        print(f"\n✅ Pack complete: {ok}/{len(symbols)} symbols downloaded\n")
+        return results
+
+
+def add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the --formats/--store/--history/--fields options shared by the command line scripts"""
+    parser.add_argument('--formats', '-f', default='xlsx,csv',
+                       help='Per-symbol files to write: xlsx (with formulas), values (values-only xlsx), '
+                            'csv, any combination or "none" (default: xlsx,csv)')
+    parser.add_argument('--store',
+                       help='Append every refresh to a partitioned Parquet dataset in this directory')
+    parser.add_argument('--history',
+                       help='Keep every revised value in a point-in-time history store in this directory')
+    parser.add_argument('--fields',
+                       help='Refresh only these line items: field sets (valuation, income, cashflow, '
+                            'ratios) and/or mnemonics, comma-separated (default: the whole template; '
+                            'see template_catalog.py)')
+
+
+def parse_formats(value: str) -> set:
+    """Turn a --formats value into a set of format names"""
+    formats = {f.strip().lower() for f in value.split(',') if f.strip()} - {'none'}
+    unknown = formats - {'xlsx', 'values', 'csv'}
+    if unknown:
+        raise ValueError(f"Unknown output format(s): {', '.join(sorted(unknown))}")
+    return formats
 
 
 def main():
@@ -278,20 +680,90 @@ Examples:
                        default='./output',
                        help='Output directory (default: ./output)')
     parser.add_argument('--wait', '-w', type=int, default=15,
-                       help='Seconds to wait for Bloomberg refresh (default: 15)')
+                       help='Maximum seconds to wait for Bloomberg refresh (default: 15)')
+    parser.add_argument('--backend', '-b', choices=sorted(BACKENDS), default='excel',
+                       help='Refresh backend (default: excel; fake needs no terminal; '
+                            'api asks the Bloomberg API directly)')
+    parser.add_argument('--api-url',
+                       help='Send the api backend\'s requests to this HTTP endpoint '
+                            'instead of a blpapi session')
+    parser.add_argument('--no-validate', action='store_true',
+                       help='Skip the pre-flight check against BB_symbol.csv and the invalid symbols cache')
+    parser.add_argument('--allow-unknown', action='store_true',
+                       help='Refresh the symbol even if BB_symbol.csv does not know it')
+    parser.add_argument('--invalid-ttl', type=float, default=DEFAULT_INVALID_TTL,
+                       help=f'Days a symbol Bloomberg rejected is skipped (default: {DEFAULT_INVALID_TTL})')
+    parser.add_argument('--service', default=os.environ.get('BBG_SERVICE'),
+                       help='Ask the download service at this URL (python download_service.py serve) '
+                            'instead of refreshing in this process (default: $BBG_SERVICE)')
+    parser.add_argument('--max-age', type=float, default=300,
+                       help='With --service: accept a result refreshed up to this many seconds ago '
+                            '(default: 300)')
+    parser.add_argument('--priority', type=int, default=10,
+                       help='With --service: queue priority, higher first (default: 10)')
+    add_output_arguments(parser)
     
     args = parser.parse_args()
+    symbol = bare_symbol(args.symbol)
+    
+    if args.service:
+        # Thin client: the service owns Excel, coalesces and remembers refreshes
+        from download_service import ServiceClient, ServiceError, print_result
+        
+        if args.fields:
+            print("⚠️  --fields is ignored with --service (set it on download_service.py serve)")
+        try:
+            results = ServiceClient(args.service).download(
+                [symbol], max_age=args.max_age, priority=args.priority)
+        except ServiceError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print_result(symbol, results[symbol])
+        sys.exit(0 if results[symbol]['status'] == "ok" else 1)
+    
+    invalid = None
+    if not args.no_validate:
+        # A typo or a symbol Bloomberg already rejected costs no template rewrite or refresh
+        invalid = InvalidSymbolCache(Path(args.output_dir) / "invalid_symbols.sqlite")
+        universe = SymbolUniverse.load(DEFAULT_CSV) if Path(DEFAULT_CSV).exists() else None
+        checked = preflight([symbol], universe, invalid, args.invalid_ttl, args.allow_unknown,
+                            refresh_seconds=args.wait)
+        print_preflight(checked, args.invalid_ttl)
+        if not checked['ok']:
+            invalid.close()
+            sys.exit(1)
     
+    downloader = None
     try:
+        store = history = None
+        if args.store:
+            from parquet_store import ParquetStore
+            store = ParquetStore(args.store)
+        if args.history:
+            from history_store import HistoryStore
+            history = HistoryStore(args.history)
         downloader = BloombergDataDownloader(
             template_path=args.template,
-            output_dir=args.output_dir
+            output_dir=args.output_dir,
+            backend=make_backend(args.backend, **({'url': args.api_url} if args.backend == 'api' else {})),
+            formats=parse_formats(args.formats),
+            store=store,
+            history=history,
+            fields=args.fields,
         )
         
+        started = time.monotonic()
         result = downloader.download_data(
-            symbol=args.symbol.upper(),
+            symbol=symbol,
             wait_seconds=args.wait
         )
+        if invalid is not None:
+            if result:
+                invalid.clear([symbol])
+            elif downloader.errors.get(symbol) == INVALID_SECURITY:
+                invalid.record(symbol, INVALID_SECURITY, time.monotonic() - started)
+                print(f"📕 {symbol} will be skipped for {args.invalid_ttl:g} days "
+                      f"(--invalid-ttl 0 to try anyway)")
         
         if result:
             sys.exit(0)
@@ -303,6 +775,12 @@ Examples:
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    
+    finally:
+        if downloader is not None:
+            downloader.close()
+        if invalid is not None:
+            invalid.close()
 
 
 if __name__ == "__main__":
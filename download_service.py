@@ -0,0 +1,656 @@
+"""
+Download Service
+================
+One long-running process owns the refresh backend (Excel, fake or api) and
+answers "give me these symbols, at most N seconds old" over a local HTTP
+API, so analysts and notebooks stop starting their own Excel refreshes (and
+`taskkill`-ing each other's Excel).
+
+- Memory: every result the service refreshed is kept, and a request whose
+  max age it satisfies is answered from memory without a refresh.
+- Coalescing: a symbol that is already queued or refreshing is not queued
+  again; every request for it waits for the same refresh.
+- Priorities: queued symbols refresh highest priority first (interactive
+  requests default to 10, batch work to 0); a higher-priority request for a
+  queued symbol moves it up. With --pack the worker takes up to that many
+  queued symbols into one pack workbook.
+
+The backend is created and used on one worker thread (Excel COM objects
+must stay on the thread that created them); HTTP requests are handled on
+their own threads and only wait for results.
+
+API (JSON, localhost):
+
+    POST /download  {"symbols": ["HDFCB"], "max_age": 300, "priority": 10, "timeout": 120}
+    GET  /download?symbols=HDFCB,IOCL&max_age=300
+    GET  /status
+
+Usage:
+    python download_service.py serve --pack 5
+    python download_bloomberg_data.py --symbol HDFCB --service http://127.0.0.1:8765
+    python download_service.py status
+    python download_service.py bench --clients 8 --requests 40 --latency 0.5
+"""
+
+import argparse
+import contextlib
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from job_journal import encode_output
+
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+DEFAULT_MAX_AGE = 300
+
+# Where a result came from
+MEMORY = "memory"
+COALESCED = "coalesced"
+REFRESHED = "refreshed"
+SOURCES = {MEMORY: "served from memory", COALESCED: "joined a refresh already under way",
+           REFRESHED: "refreshed for this request"}
+
+# Symbol entry states
+QUEUED = "queued"
+RUNNING = "running"
+
+
+class ServiceError(Exception):
+    """The download service could not be reached or rejected a request"""
+
+
+class _Entry:
+    """One queued or refreshing symbol and everything waiting for it"""
+
+    def __init__(self, symbol: str, priority: int):
+        self.symbol = symbol
+        self.priority = priority
+        self.state = QUEUED
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class DownloadService:
+    """
+    Refresh queue with coalescing, priorities and an in-memory result cache
+
+    Usage:
+        service = DownloadService(lambda: BloombergDataDownloader(...), pack=5)
+        service.start()
+        results = service.download(["HDFCB IN"], max_age=300)
+        service.close()
+    """
+
+    def __init__(self, downloader_factory, pack: int = 1, wait_seconds: int = 15,
+                 memory: int = 5000):
+        """
+        Args:
+            downloader_factory: Callable returning a BloombergDataDownloader;
+                                called on the worker thread
+            pack: Most queued symbols refreshed together in one pack workbook
+            wait_seconds: Maximum seconds to wait for each refresh
+            memory: Most symbols whose last result is kept in memory
+        """
+        self.downloader_factory = downloader_factory
+        self.pack = max(1, pack)
+        self.wait_seconds = wait_seconds
+        self.memory = memory
+        self.stats = {'requests': 0, 'symbols': 0, MEMORY: 0, COALESCED: 0, REFRESHED: 0,
+                      'failed': 0, 'jobs': 0, 'refresh_seconds': 0.0}
+        self._results = OrderedDict()      # symbol -> {'output', 'refreshed_at'}
+        self._pending = {}                 # symbol -> _Entry (queued or running)
+        self._heap = []                    # (-priority, seq, symbol)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closing = False
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._thread = threading.Thread(target=self._work, name="refresh-worker", daemon=True)
+
+    def start(self) -> "DownloadService":
+        """
+        Start the worker thread and create the downloader on it
+
+        Raises:
+            Whatever the downloader factory raised (missing template, ...)
+        """
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error is not None:
+            raise self._startup_error
+        return self
+
+    def close(self) -> None:
+        """Stop after the job being refreshed; requests still queued fail"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            for entry in self._pending.values():
+                entry.error = "service stopped"
+                entry.done.set()
+            self._pending.clear()
+
+    def submit(self, symbols: list, max_age: float = DEFAULT_MAX_AGE, priority: int = 0) -> dict:
+        """
+        Answer symbols from memory or attach them to a queued / running refresh
+
+        Args:
+            symbols: Bloomberg symbols
+            max_age: Seconds a remembered result may be old to be served
+            priority: Higher refreshes first
+
+        Returns:
+            {symbol: (source, result dict or _Entry to wait for)}
+        """
+        now = time.time()
+        answers = {}
+        with self._cond:
+            self.stats['requests'] += 1
+            for symbol in dict.fromkeys(s.strip().upper() for s in symbols if s.strip()):
+                self.stats['symbols'] += 1
+                remembered = self._results.get(symbol)
+                if remembered is not None and now - remembered['refreshed_at'] <= max_age:
+                    self._results.move_to_end(symbol)
+                    self.stats[MEMORY] += 1
+                    answers[symbol] = (MEMORY, remembered)
+                    continue
+
+                entry = self._pending.get(symbol)
+                if entry is not None:
+                    self.stats[COALESCED] += 1
+                    if entry.state == QUEUED and priority > entry.priority:
+                        entry.priority = priority
+                        self._push(entry)
+                    answers[symbol] = (COALESCED, entry)
+                    continue
+
+                entry = self._pending[symbol] = _Entry(symbol, priority)
+                self._push(entry)
+                answers[symbol] = (REFRESHED, entry)
+            self._cond.notify()
+        return answers
+
+    def download(self, symbols: list, max_age: float = DEFAULT_MAX_AGE, priority: int = 0,
+                 timeout: float = None) -> dict:
+        """
+        Get symbols no older than max_age, waiting for their refreshes
+
+        Args:
+            symbols: Bloomberg symbols
+            max_age: Seconds a remembered result may be old to be served
+            priority: Higher refreshes first
+            timeout: Most seconds to wait (None: until every refresh finished);
+                     symbols still queued are answered as pending and keep
+                     their place in the queue
+
+        Returns:
+            {symbol: {'status' ("ok", "failed" or "pending"), 'source',
+                      'output' (paths dict), 'refreshed_at', 'age', 'error'}}
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        answers = self.submit(symbols, max_age, priority)
+        results = {}
+        for symbol, (source, found) in answers.items():
+            if isinstance(found, _Entry):
+                left = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not found.done.wait(left):
+                    results[symbol] = {'status': "pending", 'source': source, 'output': None,
+                                       'refreshed_at': None, 'age': None, 'error': None}
+                    continue
+                if found.error is not None:
+                    results[symbol] = {'status': "failed", 'source': source, 'output': None,
+                                       'refreshed_at': None, 'age': None, 'error': found.error}
+                    continue
+                found = found.result
+            results[symbol] = {'status': "ok", 'source': source, 'output': found['output'],
+                               'refreshed_at': datetime.fromtimestamp(found['refreshed_at']).isoformat(),
+                               'age': round(time.time() - found['refreshed_at'], 1), 'error': None}
+        return results
+
+    def status(self) -> dict:
+        """Counters plus the current queue"""
+        with self._cond:
+            states = [entry.state for entry in self._pending.values()]
+            return {**self.stats,
+                    'refresh_seconds': round(self.stats['refresh_seconds'], 1),
+                    'queued': states.count(QUEUED),
+                    'running': states.count(RUNNING),
+                    'remembered': len(self._results)}
+
+    def _push(self, entry: _Entry) -> None:
+        """Queue (or re-queue at a new priority); outdated heap items are skipped on pop"""
+        self._seq += 1
+        heapq.heappush(self._heap, (-entry.priority, self._seq, entry.symbol))
+
+    def _next_batch(self) -> list:
+        """Up to `pack` queued entries, highest priority first; None once closing"""
+        with self._cond:
+            while not self._closing:
+                batch = []
+                while self._heap and len(batch) < self.pack:
+                    priority, _, symbol = heapq.heappop(self._heap)
+                    entry = self._pending.get(symbol)
+                    if entry is None or entry.state != QUEUED or entry.priority != -priority:
+                        continue
+                    entry.state = RUNNING
+                    batch.append(entry)
+                if batch:
+                    return batch
+                self._cond.wait()
+            return None
+
+    def _work(self) -> None:
+        try:
+            downloader = self.downloader_factory()
+        except Exception as e:
+            self._startup_error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                self._refresh(downloader, batch)
+        finally:
+            downloader.close()
+
+    def _refresh(self, downloader, batch: list) -> None:
+        symbols = [entry.symbol for entry in batch]
+        started = time.monotonic()
+        try:
+            job = downloader.prepare_job(symbols)
+            downloader.refresh_job(job, self.wait_seconds)
+            outputs = downloader.finish_job(job)
+            errors = job['errors']
+        except Exception as e:
+            print(f"❌ Refresh of {', '.join(symbols)} failed: {e}")
+            outputs, errors = [None] * len(batch), {symbol: str(e) for symbol in symbols}
+
+        with self._cond:
+            self.stats['jobs'] += 1
+            self.stats['refresh_seconds'] += time.monotonic() - started
+            refreshed_at = time.time()
+            for entry, output in zip(batch, outputs):
+                del self._pending[entry.symbol]
+                if output is None:
+                    self.stats['failed'] += 1
+                    entry.error = errors.get(entry.symbol) or "refresh failed"
+                else:
+                    self.stats[REFRESHED] += 1
+                    entry.result = self._remember(entry.symbol, output, refreshed_at)
+                entry.done.set()
+
+    def _remember(self, symbol: str, output: dict, refreshed_at: float) -> dict:
+        output = json.loads(encode_output(output))
+        previous = self._results.pop(symbol, None)
+        if output.get('changed') is False and previous is not None:
+            # Unchanged values wrote no files; the last ones still hold them
+            for key in ('excel', 'values', 'csv'):
+                output[key] = output[key] or previous['output'].get(key)
+        result = self._results[symbol] = {'output': output, 'refreshed_at': refreshed_at}
+        while len(self._results) > self.memory:
+            self._results.popitem(last=False)
+        return result
+
+
+class ServiceServer:
+    """
+    HTTP front end of a DownloadService (see the module docstring for the API)
+
+    Usage:
+        with ServiceServer(service, port=0) as server:
+            ServiceClient(server.url).download(["HDFCB"])
+    """
+
+    def __init__(self, service: DownloadService, host: str = "127.0.0.1", port: int = 8765):
+        """
+        Args:
+            service: Started DownloadService
+            host / port: Where to listen (port 0: any free port)
+        """
+        self.service = service
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "ServiceServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def handle(self, path: str, params: dict) -> tuple:
+        """(HTTP status, reply) for one request"""
+        if path == "/status":
+            return 200, self.service.status()
+        if path != "/download":
+            return 404, {'error': f"Unknown path {path} (use /download or /status)"}
+
+        symbols = params.get('symbols') or []
+        if isinstance(symbols, str):
+            symbols = symbols.split(",")
+        try:
+            max_age = float(params.get('max_age', DEFAULT_MAX_AGE))
+            priority = int(params.get('priority', 0))
+            timeout = params.get('timeout')
+            timeout = None if timeout is None else float(timeout)
+        except (TypeError, ValueError) as e:
+            return 400, {'error': f"Bad parameter: {e}"}
+        if not symbols:
+            return 400, {'error': "No symbols given"}
+
+        started = time.monotonic()
+        results = self.service.download(symbols, max_age, priority, timeout)
+        return 200, {'results': results, 'seconds': round(time.monotonic() - started, 3)}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                params = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+                self._reply(*server.handle(url.path, params))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                try:
+                    params = json.loads(body or b"{}")
+                except ValueError as e:
+                    self._reply(400, {'error': f"Bad JSON: {e}"})
+                    return
+                self._reply(*server.handle(urllib.parse.urlsplit(self.path).path, params))
+
+            def _reply(self, status, reply):
+                payload = json.dumps(reply).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+class ServiceClient:
+    """Thin client of a running download service"""
+
+    def __init__(self, url: str = None):
+        """
+        Args:
+            url: Service URL (default: $BBG_SERVICE or http://127.0.0.1:8765)
+        """
+        self.url = (url or os.environ.get("BBG_SERVICE") or DEFAULT_URL).rstrip("/")
+
+    def download(self, symbols: list, max_age: float = DEFAULT_MAX_AGE, priority: int = 0,
+                 timeout: float = None) -> dict:
+        """
+        Get symbols no older than max_age (see DownloadService.download)
+
+        Raises:
+            ServiceError: No service at the URL, or it rejected the request
+        """
+        body = {'symbols': list(symbols), 'max_age': max_age, 'priority': priority}
+        if timeout is not None:
+            body['timeout'] = timeout
+        return self._call("/download", body)['results']
+
+    def status(self) -> dict:
+        """The service's counters and queue"""
+        return self._call("/status")
+
+    def _call(self, path: str, body: dict = None) -> dict:
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        request = urllib.request.Request(self.url + path, data=data,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error')
+            except ValueError:
+                message = e.reason
+            raise ServiceError(f"HTTP {e.code}: {message}")
+        except OSError as e:
+            raise ServiceError(f"No download service at {self.url} ({e}); "
+                               f"start one with: python download_service.py serve")
+
+
+def _percentile(values: list, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))] if values else 0.0
+
+
+def run_benchmark(clients: int = 8, requests: int = 40, universe: int = 20, per_request: int = 1,
+                  max_age: float = 60, latency: float = 0.5, pack: int = 1, seed: int = 0) -> dict:
+    """
+    Concurrent clients against a service with the fake backend, over HTTP
+
+    Symbols are drawn with a Zipf-like skew from a universe of SYN0000...,
+    so popular ones are asked for by several clients at about the same time.
+
+    Returns:
+        {'requests', 'seconds', 'throughput' (requests/s), 'latency'
+         ({p50, p95, max} seconds), 'asked' (symbols requested; what
+         separate CLI runs would refresh), 'status' (service counters)}
+    """
+    from benchmark_suite import generate_template
+    from download_bloomberg_data import BloombergDataDownloader
+    from refresh_backends import make_backend
+
+    names = [f"SYN{i:04d}" for i in range(universe)]
+    weights = [1 / (i + 1) for i in range(universe)]
+    with tempfile.TemporaryDirectory() as tmp:
+        template = generate_template(Path(tmp) / "template.xlsx")
+        service = DownloadService(
+            lambda: BloombergDataDownloader(str(template), Path(tmp) / "output",
+                                            backend=make_backend("fake", latency=latency),
+                                            formats={"csv"}),
+            pack=pack, wait_seconds=max(15, int(latency * 10))).start()
+        latencies = []
+        lock = threading.Lock()
+
+        def client(n: int) -> None:
+            rng = random.Random(seed * 1000 + n)
+            api = ServiceClient(server.url)
+            for _ in range(requests):
+                symbols = rng.choices(names, weights, k=per_request)
+                started = time.perf_counter()
+                api.download(symbols, max_age=max_age)
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+        try:
+            with ServiceServer(service, port=0) as server, \
+                    open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+                started = time.perf_counter()
+                threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+        finally:
+            service.close()
+
+    return {'requests': len(latencies), 'seconds': elapsed,
+            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+            'latency': {'p50': statistics.median(latencies) if latencies else 0.0,
+                        'p95': _percentile(latencies, 0.95), 'max': max(latencies, default=0.0)},
+            'asked': len(latencies) * per_request,
+            'status': service.status()}
+
+
+def print_result(symbol: str, result: dict) -> None:
+    """One symbol's answer from the service"""
+    if result['status'] == "ok":
+        print(f"✅ {symbol}: {SOURCES[result['source']]} (refreshed {result['age']:.0f}s ago)")
+        output = result['output']
+        for key, label in (('excel', "Excel (with formulas)"), ('values', "Excel (values only)"),
+                           ('csv', "CSV")):
+            if output.get(key):
+                print(f"   {label + ':':22s} {output[key]}")
+        if output.get('changed') is False and not any(output.get(k) for k in ('excel', 'values', 'csv')):
+            print(f"   Same values as snapshot #{output['snapshot_seq']}, nothing written")
+    elif result['status'] == "pending":
+        print(f"⏳ {symbol}: still queued ({result['source']})")
+    else:
+        print(f"❌ {symbol}: {result['error']}")
+
+
+def _downloader_factory(args):
+    """Build the service's downloader from the serve options (run on the worker thread)"""
+    from download_bloomberg_data import BloombergDataDownloader, parse_formats
+    from history_store import HistoryStore
+    from parquet_store import ParquetStore
+    from refresh_backends import make_backend
+    from snapshot_store import SnapshotStore
+
+    if args.backend == 'api':
+        options = {'url': args.api_url}
+    elif args.backend == 'fake':
+        options = {'latency': args.fake_latency}
+    else:
+        options = {}
+    snapshots = None
+    if args.snapshots:
+        snapshots = SnapshotStore(args.snapshots)
+    return BloombergDataDownloader(
+        template_path=args.template,
+        output_dir=args.output_dir,
+        backend=make_backend(args.backend, **options),
+        formats=parse_formats(args.formats),
+        store=ParquetStore(args.store) if args.store else None,
+        snapshots=snapshots,
+        history=HistoryStore(args.history) if args.history else None,
+        fields=args.fields,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Long-running download service with a local HTTP API')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='Own the refresh backend and serve requests until interrupted')
+    serve_parser.add_argument('--template', '-t', default=r'C:\blp\data\FA1_vwijagme.xlsx',
+                              help='Path to Bloomberg Excel template (default: C:/blp/data/FA1_vwijagme.xlsx)')
+    serve_parser.add_argument('--output_dir', '-o', default='./output',
+                              help='Output directory (default: ./output)')
+    serve_parser.add_argument('--wait', '-w', type=int, default=15,
+                              help='Maximum seconds to wait for each refresh (default: 15)')
+    serve_parser.add_argument('--backend', '-b', choices=('excel', 'fake', 'api'), default='excel',
+                              help='Refresh backend (default: excel)')
+    serve_parser.add_argument('--api-url', help='HTTP endpoint for the api backend')
+    serve_parser.add_argument('--fake-latency', type=float, default=2.0,
+                              help='Seconds the fake backend takes to resolve (default: 2.0)')
+    serve_parser.add_argument('--pack', type=int, default=1,
+                              help='Most queued symbols refreshed together in one workbook (default: 1)')
+    serve_parser.add_argument('--memory', type=int, default=5000,
+                              help='Most symbols whose last result is kept in memory (default: 5000)')
+    serve_parser.add_argument('--snapshots',
+                              help='Snapshot store; refreshes with unchanged values write no files')
+    serve_parser.add_argument('--port', type=int, default=8765, help='Port (default: 8765)')
+    serve_parser.add_argument('--formats', '-f', default='xlsx,csv',
+                              help='Per-symbol files to write (default: xlsx,csv)')
+    serve_parser.add_argument('--store', help='Append every refresh to this Parquet dataset')
+    serve_parser.add_argument('--history', help='Keep revised values in this history store')
+    serve_parser.add_argument('--fields',
+                              help='Refresh only these line items (field sets and/or mnemonics)')
+
+    status_parser = commands.add_parser('status', help='Show a running service\'s counters and queue')
+    status_parser.add_argument('--url', help=f'Service URL (default: $BBG_SERVICE or {DEFAULT_URL})')
+
+    bench_parser = commands.add_parser('bench', help='Concurrent clients against the fake backend')
+    bench_parser.add_argument('--clients', type=int, default=8, help='Client threads (default: 8)')
+    bench_parser.add_argument('--requests', type=int, default=40,
+                              help='Requests per client (default: 40)')
+    bench_parser.add_argument('--universe', type=int, default=20,
+                              help='Distinct symbols asked for (default: 20)')
+    bench_parser.add_argument('--per-request', type=int, default=1,
+                              help='Symbols per request (default: 1)')
+    bench_parser.add_argument('--max-age', type=float, default=60,
+                              help='Max age of every request in seconds (default: 60)')
+    bench_parser.add_argument('--latency', type=float, default=0.5,
+                              help='Fake refresh latency in seconds (default: 0.5)')
+    bench_parser.add_argument('--pack', type=int, default=1, help='Service --pack (default: 1)')
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        try:
+            status = ServiceClient(args.url).status()
+        except ServiceError as e:
+            print(f"❌ {e}")
+            return 1
+        for key, value in status.items():
+            print(f"   {key:16s} {value}")
+        return 0
+
+    if args.command == 'bench':
+        result = run_benchmark(args.clients, args.requests, args.universe, args.per_request,
+                               args.max_age, args.latency, args.pack)
+        status = result['status']
+        print(f"⚡ {result['requests']} requests from {args.clients} clients in {result['seconds']:.1f}s "
+              f"({result['throughput']:.1f}/s)")
+        print(f"⏱️  Latency p50 {result['latency']['p50']:.3f}s, p95 {result['latency']['p95']:.3f}s, "
+              f"max {result['latency']['max']:.3f}s")
+        print(f"🔁 {result['asked']} symbols asked for, {status[REFRESHED] + status['failed']} refreshed "
+              f"in {status['jobs']} jobs ({status[MEMORY]} from memory, {status[COALESCED]} coalesced); "
+              f"separate CLI runs would refresh all {result['asked']}")
+        return 0
+
+    service = DownloadService(lambda: _downloader_factory(args), pack=args.pack,
+                              wait_seconds=args.wait, memory=args.memory)
+    try:
+        service.start()
+    except (FileNotFoundError, ImportError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        return 1
+    server = ServiceServer(service, port=args.port)
+    print(f"🛎️  Download service ({args.backend} backend) on {server.url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    print(f"\n📞 {service.status()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,638 @@
+"""
+Dropbox Publisher
+=================
+Upload refreshed output files to Dropbox while the batch keeps refreshing.
+
+Built from the upload code in BloomBerg_Refresh.ipynb, which uploaded one
+file at a time, called files_get_metadata for every path segment of every
+upload and sent 80 MB chunks. Here:
+
+- uploads run on a bounded thread pool (`workers` files at once)
+- folders known to exist are cached; the publish folder is listed once
+  (recursively) and nothing is looked up per upload. Parent folders of
+  uploaded files are created by Dropbox when the upload is committed
+- every file goes through an upload session (8 MB chunks, closed on the
+  last one) and the sessions are committed together with
+  upload_session/finish_batch_v2, so Dropbox takes its namespace lock once
+  per batch instead of once per file
+- files whose Dropbox content hash matches the copy already in Dropbox are
+  skipped without sending any data
+
+Talks to the Dropbox HTTP API directly (api_url / content_url can point at
+a local stand-in, see StandInServer) and keeps one keep-alive connection per
+thread and host. Credentials come from the environment, never from code:
+
+    DROPBOX_ACCESS_TOKEN                                   short-lived token, or
+    DROPBOX_APP_KEY, DROPBOX_APP_SECRET, DROPBOX_REFRESH_TOKEN   (refreshed as needed)
+
+Usage:
+    publisher = DropboxPublisher(DropboxClient.from_env(), "/Bloomberg")
+    publisher.publish_output(result)          # returns at once
+    stats = publisher.close()                 # waits for uploads and commits
+
+    python dropbox_publisher.py output/*.csv --folder /Bloomberg
+    python dropbox_publisher.py output/*.csv --stand-in      # no Dropbox account needed
+"""
+
+import argparse
+import glob
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+API_URL = "https://api.dropboxapi.com"
+CONTENT_URL = "https://content.dropboxapi.com"
+
+# Dropbox content hashes are computed over 4 MB blocks
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+# Upload session chunk; a multiple of the 4 MB block as Dropbox recommends
+CHUNK_SIZE = 8 * 1024 * 1024
+# finish_batch_v2 accepts at most this many entries
+MAX_BATCH = 1000
+
+
+class DropboxError(RuntimeError):
+    """Dropbox API call that failed (after retries)"""
+
+    def __init__(self, endpoint: str, status: int, summary: str):
+        super().__init__(f"{endpoint}: HTTP {status} {summary}")
+        self.endpoint = endpoint
+        self.status = status
+        self.summary = summary
+
+
+def content_hash(path) -> str:
+    """
+    Dropbox content hash of a local file
+
+    SHA-256 of the concatenated SHA-256 digests of every 4 MB block, as
+    returned in the content_hash of Dropbox file metadata.
+    """
+    overall = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            overall.update(hashlib.sha256(block).digest())
+    return overall.hexdigest()
+
+
+def normalize_path(path: str) -> str:
+    """Dropbox path: forward slashes, leading slash, no trailing slash ("" is the root)"""
+    path = "/" + str(path).replace("\\", "/").strip("/")
+    return "" if path == "/" else path
+
+
+class DropboxClient:
+    """Minimal thread-safe client for the Dropbox HTTP API v2 endpoints the publisher uses"""
+
+    def __init__(self, access_token: str = None, app_key: str = None, app_secret: str = None,
+                 refresh_token: str = None, api_url: str = API_URL,
+                 content_url: str = CONTENT_URL, timeout: float = 120, retries: int = 4):
+        """
+        Args:
+            access_token: Short-lived access token
+            app_key / app_secret / refresh_token: Used to get (and renew) the
+                access token instead
+            api_url: Base URL of the RPC endpoints
+            content_url: Base URL of the content (upload) endpoints
+            timeout: Socket timeout in seconds
+            retries: Extra attempts on HTTP 429 / 5xx and dropped connections
+        """
+        if not access_token and not refresh_token:
+            raise ValueError("Dropbox credentials missing: set DROPBOX_ACCESS_TOKEN or "
+                             "DROPBOX_APP_KEY / DROPBOX_APP_SECRET / DROPBOX_REFRESH_TOKEN")
+        self.app_key = app_key
+        self.app_secret = app_secret
+        self.refresh_token = refresh_token
+        self.api_url = api_url.rstrip("/")
+        self.content_url = content_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self._token = access_token
+        self._token_expires = float("inf") if access_token else 0.0
+        self._token_lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "DropboxClient":
+        """Client with credentials from the DROPBOX_* environment variables"""
+        return cls(access_token=os.environ.get("DROPBOX_ACCESS_TOKEN"),
+                   app_key=os.environ.get("DROPBOX_APP_KEY"),
+                   app_secret=os.environ.get("DROPBOX_APP_SECRET"),
+                   refresh_token=os.environ.get("DROPBOX_REFRESH_TOKEN"),
+                   **kwargs)
+
+    # --- Endpoints ---
+
+    def create_folder(self, path: str) -> bool:
+        """
+        Create a folder (and its parents)
+
+        Returns:
+            True if created, False if it already existed
+        """
+        try:
+            self.rpc("files/create_folder_v2", {"path": path, "autorename": False})
+            return True
+        except DropboxError as e:
+            if e.status == 409 and e.summary.startswith("path/conflict"):
+                return False
+            raise
+
+    def list_folder(self, path: str, recursive: bool = True):
+        """Yield the metadata of every entry below path (nothing if it doesn't exist)"""
+        try:
+            page = self.rpc("files/list_folder", {"path": path, "recursive": recursive})
+        except DropboxError as e:
+            if e.status == 409 and e.summary.startswith("path/not_found"):
+                return
+            raise
+        while True:
+            yield from page["entries"]
+            if not page.get("has_more"):
+                return
+            page = self.rpc("files/list_folder/continue", {"cursor": page["cursor"]})
+
+    def upload_session_start(self, data: bytes, close: bool = False) -> str:
+        """Start an upload session with its first chunk; returns the session id"""
+        return self.content("files/upload_session/start", {"close": close}, data)["session_id"]
+
+    def upload_session_append(self, session_id: str, offset: int, data: bytes,
+                              close: bool = False) -> None:
+        """Append a chunk at offset (bytes sent so far)"""
+        self.content("files/upload_session/append_v2",
+                     {"cursor": {"session_id": session_id, "offset": offset}, "close": close},
+                     data)
+
+    def upload_session_finish_batch(self, entries: list) -> list:
+        """
+        Commit closed upload sessions
+
+        Args:
+            entries: [{'cursor': {'session_id', 'offset'}, 'commit': {'path', 'mode', ...}}]
+
+        Returns:
+            One result per entry: file metadata with '.tag' "success", or
+            {'.tag': 'failure', 'failure': {...}}
+        """
+        return self.rpc("files/upload_session/finish_batch_v2", {"entries": entries})["entries"]
+
+    # --- Transport ---
+
+    def rpc(self, endpoint: str, args: dict) -> dict:
+        """Call an RPC endpoint (JSON in, JSON out)"""
+        body = json.dumps(args).encode("utf-8")
+        return self._call(self.api_url, endpoint, body, {"Content-Type": "application/json"})
+
+    def content(self, endpoint: str, args: dict, data: bytes) -> dict:
+        """Call a content-upload endpoint (arguments in the Dropbox-API-Arg header)"""
+        return self._call(self.content_url, endpoint, data, {
+            "Content-Type": "application/octet-stream",
+            # ensure_ascii: HTTP headers must be ASCII
+            "Dropbox-API-Arg": json.dumps(args),
+        })
+
+    def _call(self, base: str, endpoint: str, body: bytes, headers: dict) -> dict:
+        for attempt in range(self.retries + 1):
+            headers["Authorization"] = f"Bearer {self._access_token()}"
+            try:
+                status, reply_headers, payload = self._send(base, "/2/" + endpoint, body, headers)
+            except (OSError, http.client.HTTPException):
+                self._drop_connection(base)
+                if attempt == self.retries:
+                    raise
+                time.sleep(2 ** attempt)
+                continue
+
+            if status == 200:
+                return json.loads(payload) if payload else {}
+            if status == 401 and self.refresh_token and attempt < self.retries:
+                self._token_expires = 0.0
+                continue
+            if (status == 429 or status >= 500) and attempt < self.retries:
+                time.sleep(float(reply_headers.get("Retry-After") or 2 ** attempt))
+                continue
+            try:
+                summary = json.loads(payload).get("error_summary", "")
+            except ValueError:
+                summary = payload.decode("utf-8", "replace")[:200]
+            raise DropboxError(endpoint, status, summary)
+
+    def _send(self, base: str, path: str, body: bytes, headers: dict) -> tuple:
+        """One request on this thread's keep-alive connection to base"""
+        connections = self._local.__dict__.setdefault("connections", {})
+        conn = connections.get(base)
+        if conn is None:
+            url = urllib.parse.urlsplit(base)
+            kind = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+            conn = connections[base] = kind(url.netloc, timeout=self.timeout)
+        prefix = urllib.parse.urlsplit(base).path
+        conn.request("POST", prefix + path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.headers, response.read()
+
+    def _drop_connection(self, base: str) -> None:
+        conn = self._local.__dict__.get("connections", {}).pop(base, None)
+        if conn is not None:
+            conn.close()
+
+    def _access_token(self) -> str:
+        """Current access token, renewed from the refresh token when it (nearly) expired"""
+        with self._token_lock:
+            if time.time() < self._token_expires - 60:
+                return self._token
+            form = urllib.parse.urlencode({
+                "grant_type": "refresh_token",
+                "refresh_token": self.refresh_token,
+                "client_id": self.app_key or "",
+                "client_secret": self.app_secret or "",
+            }).encode("ascii")
+            status, _, payload = self._send(self.api_url, "/oauth2/token", form,
+                                            {"Content-Type": "application/x-www-form-urlencoded"})
+            if status != 200:
+                raise DropboxError("oauth2/token", status, payload.decode("utf-8", "replace")[:200])
+            reply = json.loads(payload)
+            self._token = reply["access_token"]
+            self._token_expires = time.time() + float(reply.get("expires_in", 14400))
+            return self._token
+
+
+class DropboxPublisher:
+    """Concurrent uploads into one Dropbox folder with batched commits"""
+
+    def __init__(self, client: DropboxClient, folder: str, workers: int = 4,
+                 chunk_size: int = CHUNK_SIZE, commit_every: int = 50, overwrite: bool = True):
+        """
+        Args:
+            client: DropboxClient (or anything with the same methods)
+            folder: Dropbox folder files are published into
+            workers: Files uploaded at once
+            chunk_size: Upload session chunk size in bytes
+            commit_every: Commit the finished upload sessions once this many wait
+            overwrite: Replace files that changed (otherwise Dropbox renames the new copy)
+        """
+        self.client = client
+        self.folder = normalize_path(folder)
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.commit_every = max(1, min(commit_every, MAX_BATCH))
+        self.mode = "overwrite" if overwrite else "add"
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="dropbox")
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._pending = []
+        self._known_folders = {""}
+        self._remote_hashes = None
+        self._futures = []
+        self.stats = {'uploaded': 0, 'skipped': 0, 'failed': 0, 'bytes': 0,
+                      'commits': 0, 'errors': {}}
+
+    def publish(self, local_path, remote_name: str = None, subfolder: str = None):
+        """
+        Queue one file for upload; returns at once
+
+        Args:
+            local_path: File to upload
+            remote_name: Name in Dropbox (default: the local file name)
+            subfolder: Folder below the publish folder
+
+        Returns:
+            concurrent.futures.Future resolving to "uploaded" (session
+            finished, commit pending), "skipped" or "failed"
+        """
+        local_path = Path(local_path)
+        folder = self.folder + normalize_path(subfolder or "")
+        dest = f"{folder}/{remote_name or local_path.name}"
+        future = self._executor.submit(self._upload, local_path, dest)
+        self._futures.append(future)
+        return future
+
+    def publish_output(self, output: dict, subfolder: str = None) -> list:
+        """Queue every file of a downloader paths dict (excel / values / csv)"""
+        return [self.publish(output[key], subfolder=subfolder)
+                for key in ('excel', 'values', 'csv') if output.get(key)]
+
+    def ensure_folder(self, path: str) -> None:
+        """Create a Dropbox folder unless it is already known to exist"""
+        path = normalize_path(path)
+        if path in self._known_folders:
+            return
+        self.client.create_folder(path)
+        self._mark_folder(path)
+
+    def flush(self) -> int:
+        """
+        Commit every finished upload session
+
+        Returns:
+            Number of files committed
+        """
+        committed = 0
+        while True:
+            with self._lock:
+                batch, self._pending = self._pending[:MAX_BATCH], self._pending[MAX_BATCH:]
+            if not batch:
+                return committed
+            self._commit(batch)
+            committed += len(batch)
+
+    def close(self) -> dict:
+        """
+        Wait for every queued upload, commit what is left and stop the threads
+
+        Returns:
+            Counts: 'uploaded', 'skipped', 'failed', 'bytes', 'commits' and
+            'errors' ({dropbox path: message})
+        """
+        self._executor.shutdown(wait=True)
+        self.flush()
+        return self.stats
+
+    def _prime(self) -> None:
+        """List the publish folder once: folders that exist and hashes of the files in it"""
+        with self._lock:
+            if self._remote_hashes is not None:
+                return
+            hashes = {}
+            if self.folder:
+                self.ensure_folder(self.folder)
+            for entry in self.client.list_folder(self.folder, recursive=True):
+                if entry[".tag"] == "folder":
+                    self._known_folders.add(entry["path_lower"])
+                elif entry[".tag"] == "file":
+                    hashes[entry["path_lower"]] = entry.get("content_hash")
+            self._remote_hashes = hashes
+
+    def _upload(self, local_path: Path, dest: str) -> str:
+        try:
+            self._prime()
+            local_hash = content_hash(local_path)
+            if self._remote_hashes.get(dest.lower()) == local_hash:
+                with self._lock:
+                    self.stats['skipped'] += 1
+                return "skipped"
+
+            size = local_path.stat().st_size
+            with open(local_path, "rb") as f:
+                chunk = f.read(self.chunk_size)
+                offset = len(chunk)
+                session_id = self.client.upload_session_start(chunk, close=offset >= size)
+                while offset < size:
+                    chunk = f.read(self.chunk_size)
+                    self.client.upload_session_append(session_id, offset, chunk,
+                                                      close=offset + len(chunk) >= size)
+                    offset += len(chunk)
+
+            entry = {'cursor': {'session_id': session_id, 'offset': offset},
+                     'commit': {'path': dest, 'mode': self.mode, 'mute': True}}
+            with self._lock:
+                self._pending.append((entry, local_hash, size))
+                ready = len(self._pending) >= self.commit_every
+            if ready:
+                self.flush()
+            return "uploaded"
+        except Exception as e:
+            self._failed(dest, str(e))
+            return "failed"
+
+    def _commit(self, batch: list) -> None:
+        """finish_batch_v2 for a list of (entry, hash, size)"""
+        # One commit at a time: concurrent batches would only contend for the namespace lock
+        with self._commit_lock:
+            try:
+                replies = self.client.upload_session_finish_batch([entry for entry, _, _ in batch])
+            except Exception as e:
+                for entry, _, _ in batch:
+                    self._failed(entry['commit']['path'], str(e))
+                return
+        with self._lock:
+            self.stats['commits'] += 1
+        for (entry, local_hash, size), reply in zip(batch, replies):
+            dest = entry['commit']['path']
+            if reply.get(".tag") != "success":
+                self._failed(dest, json.dumps(reply.get("failure", reply)))
+                continue
+            with self._lock:
+                self.stats['uploaded'] += 1
+                self.stats['bytes'] += size
+                self._remote_hashes[dest.lower()] = reply.get("content_hash", local_hash)
+            self._mark_folder(dest.rsplit("/", 1)[0])
+
+    def _mark_folder(self, path: str) -> None:
+        """Remember a folder and all its parents as existing"""
+        path = path.lower()
+        while path and path not in self._known_folders:
+            self._known_folders.add(path)
+            path = path.rsplit("/", 1)[0]
+
+    def _failed(self, dest: str, message: str) -> None:
+        print(f"⚠️  Dropbox upload failed: {dest}: {message}")
+        with self._lock:
+            self.stats['failed'] += 1
+            self.stats['errors'][dest] = message
+
+
+class StandInServer:
+    """
+    Local stand-in for the Dropbox endpoints DropboxClient uses, kept in memory
+
+    Usage:
+        with StandInServer() as server:
+            client = DropboxClient("token", api_url=server.url, content_url=server.url)
+            ...
+            server.files        # {path_lower: bytes}
+            server.calls        # {endpoint: count}
+
+    Faults for exercising retries and failed commits:
+
+        StandInServer(errors={"files/upload_session/finish_batch_v2": [429, 503]},
+                      reject={"/bloomberg/hdfcb.csv"})
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 errors: dict = None, reject=()):
+        """
+        Args:
+            host / port: Where to listen (port 0: any free port)
+            latency: Seconds every request takes, to mimic the network
+            errors: {endpoint: [HTTP status, ...]} answered, in order, before
+                    the endpoint works normally
+            reject: Dropbox paths whose finish_batch_v2 entry comes back as a failure
+        """
+        self.files = {}
+        self.folders = {""}
+        self.sessions = {}
+        self.calls = {}
+        self.latency = latency
+        self.errors = {endpoint: list(statuses) for endpoint, statuses in (errors or {}).items()}
+        self.reject = {path.lower() for path in reject}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "StandInServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                endpoint = self.path.split("/2/", 1)[-1].lstrip("/")
+                if server.latency:
+                    time.sleep(server.latency)
+                with server._lock:
+                    server.calls[endpoint] = server.calls.get(endpoint, 0) + 1
+                    status, reply = server.handle(endpoint, body, self.headers)
+                payload = json.dumps(reply).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def handle(self, endpoint: str, body: bytes, headers) -> tuple:
+        """(status, JSON reply) for one request"""
+        if self.errors.get(endpoint):
+            status = self.errors[endpoint].pop(0)
+            return status, {"error_summary": "too_many_requests/" if status == 429 else "internal_error/"}
+        if endpoint == "oauth2/token":
+            return 200, {"access_token": "stand-in", "expires_in": 14400}
+        if headers.get("Authorization", "") in ("", "Bearer "):
+            return 401, {"error_summary": "invalid_access_token/"}
+        args = json.loads(headers.get("Dropbox-API-Arg") or body or b"{}")
+
+        if endpoint == "files/create_folder_v2":
+            path = args["path"].lower()
+            if path in self.folders:
+                return 409, {"error_summary": "path/conflict/folder/"}
+            self._add_folder(path)
+            return 200, {"metadata": {"path_lower": path, "path_display": args["path"]}}
+        if endpoint == "files/list_folder":
+            root = args["path"].lower()
+            if root not in self.folders:
+                return 409, {"error_summary": "path/not_found/"}
+            entries = [{".tag": "folder", "path_lower": f} for f in sorted(self.folders)
+                       if f.startswith(root + "/")]
+            entries += [{".tag": "file", "path_lower": p, "content_hash": self._hash(data)}
+                        for p, data in sorted(self.files.items()) if p.startswith(root + "/")]
+            return 200, {"entries": entries, "cursor": "", "has_more": False}
+        if endpoint == "files/upload_session/start":
+            session_id = f"session-{len(self.sessions) + 1}"
+            self.sessions[session_id] = {'data': body, 'closed': args.get("close", False)}
+            return 200, {"session_id": session_id}
+        if endpoint == "files/upload_session/append_v2":
+            session = self.sessions[args["cursor"]["session_id"]]
+            if session['closed'] or len(session['data']) != args["cursor"]["offset"]:
+                return 409, {"error_summary": "incorrect_offset/"}
+            session['data'] += body
+            session['closed'] = args.get("close", False)
+            return 200, {}
+        if endpoint == "files/upload_session/finish_batch_v2":
+            results = []
+            for entry in args["entries"]:
+                session = self.sessions.pop(entry["cursor"]["session_id"], None)
+                if (session is None or not session['closed']
+                        or len(session['data']) != entry["cursor"]["offset"]):
+                    results.append({".tag": "failure", "failure": {".tag": "lookup_failed"}})
+                    continue
+                path = entry["commit"]["path"].lower()
+                if path in self.reject:
+                    results.append({".tag": "failure",
+                                    "failure": {".tag": "path", "path": {".tag": "insufficient_space"}}})
+                    continue
+                self.files[path] = session['data']
+                self._add_folder(path.rsplit("/", 1)[0])
+                results.append({".tag": "success", "path_lower": path,
+                                "size": len(session['data']),
+                                "content_hash": self._hash(session['data'])})
+            return 200, {"entries": results}
+        return 400, {"error_summary": f"unknown endpoint {endpoint}"}
+
+    def _add_folder(self, path: str) -> None:
+        while path and path not in self.folders:
+            self.folders.add(path)
+            path = path.rsplit("/", 1)[0]
+
+    @staticmethod
+    def _hash(data: bytes) -> str:
+        overall = hashlib.sha256()
+        for i in range(0, len(data), HASH_BLOCK_SIZE):
+            overall.update(hashlib.sha256(data[i:i + HASH_BLOCK_SIZE]).digest())
+        return overall.hexdigest()
+
+
+def publish_files(client: DropboxClient, paths: list, folder: str, workers: int) -> dict:
+    """Publish files and print what happened; returns the publisher stats"""
+    started = time.monotonic()
+    publisher = DropboxPublisher(client, folder, workers=workers)
+    for path in paths:
+        publisher.publish(path)
+    stats = publisher.close()
+    print(f"☁️  {stats['uploaded']} uploaded ({stats['bytes'] / 1024:.1f} KB), "
+          f"{stats['skipped']} unchanged, {stats['failed']} failed "
+          f"in {time.monotonic() - started:.2f}s → {publisher.folder or '/'}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upload files to Dropbox')
+    parser.add_argument('files', nargs='+', help='Files or glob patterns to upload')
+    parser.add_argument('--folder', default='/Bloomberg',
+                       help='Dropbox folder to upload into (default: /Bloomberg)')
+    parser.add_argument('--workers', type=int, default=4,
+                       help='Files uploaded at once (default: 4)')
+    parser.add_argument('--stand-in', action='store_true',
+                       help='Upload to a local in-memory stand-in server instead of Dropbox '
+                            '(twice, to show unchanged files being skipped)')
+    args = parser.parse_args()
+
+    paths = [p for pattern in args.files for p in (sorted(glob.glob(pattern)) or [pattern])]
+    missing = [p for p in paths if not Path(p).is_file()]
+    if missing:
+        print(f"❌ Not found: {', '.join(missing)}")
+        return
+
+    if args.stand_in:
+        with StandInServer() as server:
+            client = DropboxClient("stand-in", api_url=server.url, content_url=server.url)
+            publish_files(client, paths, args.folder, args.workers)
+            publish_files(client, paths, args.folder, args.workers)
+            print(f"📞 Calls: {', '.join(f'{k} {v}' for k, v in sorted(server.calls.items()))}")
+        return
+
+    try:
+        client = DropboxClient.from_env()
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    publish_files(client, paths, args.folder, args.workers)
+
+
+if __name__ == "__main__":
+    main()
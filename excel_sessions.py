@@ -0,0 +1,265 @@
+"""
+Excel Session Pool
+==================
+Long-lived Excel instances shared across refreshes.
+
+Starting Excel and completing the Bloomberg add-in handshake is the most
+expensive part of a refresh, so sessions are kept alive between symbols and
+only recycled after a configurable number of workbooks, when their memory
+grows past a limit, or when a health check fails. Only the Excel processes
+owned by the pool are ever quit or killed.
+
+- XlwingsSession: a private, hidden xw.App with the Bloomberg add-in loaded
+- FakeSession:    in-process stand-in used by the fake backend
+"""
+
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# Bloomberg's Excel add-in; automation-started Excel does not load it by itself
+BLOOMBERG_ADDIN_PATHS = (
+    r"C:\blp\API\Office Tools\BloombergUI.xla",
+)
+
+
+class XlwingsSession:
+    """One hidden Excel instance driven through xlwings"""
+
+    # memory_bytes() needs psutil; without it a memory limit never triggers
+    measures_memory = psutil is not None
+
+    def __init__(self, xw, visible: bool = False, addin_paths=BLOOMBERG_ADDIN_PATHS):
+        """
+        Args:
+            xw: The imported xlwings module
+            visible: Show the Excel window (handy when debugging)
+            addin_paths: Add-in workbooks to open when the session starts
+        """
+        self.app = xw.App(visible=visible, add_book=False)
+        self.app.display_alerts = False
+        self.uses = 0
+        self._load_bloomberg_addin(addin_paths)
+
+    def _load_bloomberg_addin(self, addin_paths) -> None:
+        """Connect the Bloomberg COM add-in and open its XLA helpers"""
+        try:
+            for addin in self.app.api.COMAddIns:
+                if "bloomberg" in str(addin.ProgId).lower():
+                    addin.Connect = True
+        except Exception:
+            pass
+        for path in addin_paths:
+            if Path(path).exists():
+                try:
+                    self.app.books.open(path)
+                except Exception:
+                    pass
+
+    def open_book(self, xlsx_path: Path):
+        """Open a workbook in this session"""
+        book = self.app.books.open(str(xlsx_path), update_links=False)
+        # Evaluate the Bloomberg formulas even if the load-time recalc was skipped
+        self.app.calculate()
+        return book
+
+    def healthy(self) -> bool:
+        """True if Excel still answers COM calls"""
+        try:
+            return self.app.api.Ready is not None and self.app.books is not None
+        except Exception:
+            return False
+
+    def memory_bytes(self):
+        """Resident memory of the Excel process, or None if unknown"""
+        if psutil is None:
+            return None
+        try:
+            return psutil.Process(self.app.pid).memory_info().rss
+        except Exception:
+            return None
+
+    def quit(self) -> None:
+        """Quit Excel, killing only this session's process if it hangs"""
+        try:
+            self.app.quit()
+        except Exception:
+            try:
+                self.app.kill()
+            except Exception:
+                pass
+
+
+class FakeSession:
+    """In-process session with simulated memory growth and failures"""
+
+    _next_id = 0
+
+    def __init__(self, memory_per_book: int = 20 * 1024 * 1024,
+                 base_memory: int = 150 * 1024 * 1024, fail_after: int = None):
+        """
+        Args:
+            memory_per_book: Bytes the session grows by per opened workbook
+            base_memory: Bytes used right after start
+            fail_after: Become unhealthy after this many workbooks (None: never)
+        """
+        FakeSession._next_id += 1
+        self.id = FakeSession._next_id
+        self.uses = 0
+        self.opened = 0
+        self.memory = base_memory
+        self.memory_per_book = memory_per_book
+        self.fail_after = fail_after
+        self.alive = True
+
+    def open_book(self, xlsx_path: Path):
+        if not self.alive:
+            raise RuntimeError("Excel session is not responding")
+        self.opened += 1
+        self.memory += self.memory_per_book
+        return Path(xlsx_path)
+
+    def healthy(self) -> bool:
+        if self.fail_after is not None and self.opened >= self.fail_after:
+            self.alive = False
+        return self.alive
+
+    def memory_bytes(self):
+        return self.memory
+
+    def quit(self) -> None:
+        self.alive = False
+
+
+class SessionPool:
+    """
+    Bounded pool of reusable sessions
+
+    Sessions are created lazily up to `size`, handed out one workbook at a
+    time and recycled when used `max_uses` times, when they exceed
+    `max_memory_mb`, when they are released with failed=True, or when they
+    fail the health check on checkout. The backends release with failed=True
+    when a refresh timed out or returned no data (see
+    refresh_backends.wait_until_ready) or when closing the workbook raised;
+    an invalid security keeps the session.
+    """
+
+    def __init__(self, factory, size: int = 1, max_uses: int = 50,
+                 max_memory_mb: float = None):
+        """
+        Args:
+            factory: Callable returning a new session
+            size: Maximum number of concurrent sessions
+            max_uses: Workbooks per session before it is restarted (0: never)
+            max_memory_mb: Restart a session whose memory exceeds this (None: never)
+        """
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self._idle = []
+        self._live = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.stats = {'started': 0, 'recycled': 0, 'unhealthy': 0, 'checkouts': 0}
+
+    def acquire(self):
+        """Check out a healthy session, starting one if the pool has room"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Session pool is closed")
+                if self._idle:
+                    session = self._idle.pop()
+                    break
+                if self._live < self.size:
+                    self._live += 1
+                    session = None
+                    break
+                self._cond.wait()
+
+        if session is not None and not session.healthy():
+            self._count('unhealthy')
+            self._discard(session, replace=True)
+            session = None
+
+        if session is None:
+            try:
+                session = self.factory()
+            except Exception:
+                with self._cond:
+                    self._live -= 1
+                    self._cond.notify()
+                raise
+            self._count('started')
+
+        self._count('checkouts')
+        return session
+
+    def release(self, session, failed: bool = False) -> None:
+        """Return a session, recycling it if it is worn out or broken"""
+        session.uses += 1
+        if failed or self._worn_out(session):
+            self._count('recycled')
+            self._discard(session)
+            return
+
+        with self._cond:
+            if self._closed:
+                closing = True
+            else:
+                closing = False
+                self._idle.append(session)
+                self._cond.notify()
+        if closing:
+            self._discard(session)
+
+    @contextmanager
+    def session(self):
+        """Context manager around acquire()/release()"""
+        session = self.acquire()
+        failed = False
+        try:
+            yield session
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release(session, failed=failed)
+
+    def _count(self, key: str) -> None:
+        with self._cond:
+            self.stats[key] += 1
+
+    def _worn_out(self, session) -> bool:
+        if self.max_uses and session.uses >= self.max_uses:
+            return True
+        if self.max_memory_mb is not None:
+            memory = session.memory_bytes()
+            if memory is not None and memory > self.max_memory_mb * 1024 * 1024:
+                return True
+        return False
+
+    def _discard(self, session, replace: bool = False) -> None:
+        """Quit a session; unless replace, free its slot for a new one"""
+        try:
+            session.quit()
+        finally:
+            if not replace:
+                with self._cond:
+                    self._live -= 1
+                    self._cond.notify()
+
+    def close(self) -> None:
+        """Quit every idle session; busy ones are quit when released"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for session in idle:
+            self._discard(session)
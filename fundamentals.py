@@ -0,0 +1,447 @@
+"""
+Fundamentals Engine
+===================
+Derived ratios for every refreshed symbol at once.
+
+Each symbol's long table (highlights_parser) goes into one float64 cube
+
+    values[symbol, mnemonic, period]
+
+with NaN wherever Bloomberg had no number ("—", "�", "#N/A ..."), and every
+metric is a few array operations over the whole cube instead of a loop over
+per-symbol CSVs. Per period:
+
+    ev_ebitda         ENTERPRISE_VALUE / EBITDA (market cap + debt + preferred
+                      - cash when EV is missing)
+    fcf_yield         free cash flow / market cap, % (cash from operations +
+                      capital expenditures when FCF is missing)
+    net_debt_ebitda   (debt - cash) / EBITDA
+    ebitda_margin, gross_margin, net_margin    % of revenue
+
+Per symbol:
+
+    ebitda_margin_trend   least-squares slope of the EBITDA margin over the
+                          reported years, percentage points per year
+    sales_cagr            revenue CAGR between the first and last reported year, %
+    sales_est_growth, ebitda_est_growth, eps_est_growth
+                          first estimate year against Current/LTM, %
+
+Ratios with a zero or negative denominator (EBITDA, revenue, market cap) are
+NaN rather than misleading numbers, and gaps never stop the rest of a
+symbol's metrics. Every metric only looks at its own symbol's data.
+
+The cube is cached together with each symbol's snapshot fingerprint
+(snapshot_store.py). update_from_snapshots() reloads and recomputes only the
+symbols whose newest snapshot changed since, so after a batch run only what
+that run changed costs anything.
+
+Usage:
+    engine = FundamentalsEngine.load("output/fundamentals.pkl")
+    changed = engine.update_from_snapshots(SnapshotStore("output/snapshots.sqlite"))
+    engine.save()
+    engine.summary()                      # one row per symbol, latest value of every metric
+    engine.period_frame("ev_ebitda")      # symbols × periods
+
+    python fundamentals.py output/snapshots.sqlite --sort ev_ebitda --top 20
+    python fundamentals.py --csv "output/*_bloomberg_data_*.csv" --output ratios.csv
+"""
+
+import argparse
+import glob
+import os
+import pickle
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from snapshot_store import SnapshotStore, fingerprint
+
+
+CACHE_VERSION = 1
+
+MARKET_CAP = "HISTORICAL_MARKET_CAP"
+CASH = "CASH_AND_MARKETABLE_SECURITIES"
+PREFERRED = "PFD_EQTY_MINORTY_INTEREST"
+DEBT = "SHORT_AND_LONG_TERM_DEBT"
+EV = "ENTERPRISE_VALUE"
+SALES = "SALES_REV_TURN"
+GROSS_PROFIT = "GROSS_PROFIT"
+EBITDA = "EBITDA"
+NET_INCOME = "EARN_FOR_COMMON"
+EPS = "IS_DIL_EPS_CONT_OPS"
+CFO = "CF_CASH_FROM_OPER"
+CAPEX = "CAPITAL_EXPEND"
+FCF = "CF_FREE_CASH_FLOW"
+
+# Period kinds, in axis order: reported years, then Current/LTM, then estimates
+REPORTED, LTM, ESTIMATE = 0, 1, 2
+
+
+def period_order(label: str) -> tuple:
+    """Sort key: reported periods by year, then Current/LTM, then estimates by year"""
+    year = re.search(r"\d{4}", label)
+    year = int(year.group(0)) if year else 0
+    upper = label.upper()
+    if upper.endswith("EST"):
+        return (ESTIMATE, year, label)
+    if "LTM" in upper:
+        return (LTM, year, label)
+    return (REPORTED, year, label)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, positive: bool = True) -> np.ndarray:
+    """numerator / denominator, NaN where either is missing or the denominator is not positive"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = numerator / denominator
+    bad = ~np.isfinite(out)
+    if positive:
+        bad |= ~(denominator > 0)
+    out[bad] = np.nan
+    return out
+
+
+def _zero_if_missing(values: np.ndarray) -> np.ndarray:
+    return np.where(np.isnan(values), 0.0, values)
+
+
+def _enterprise_value(get) -> np.ndarray:
+    ev = get(EV)
+    built = get(MARKET_CAP) + get(DEBT) + _zero_if_missing(get(PREFERRED)) - _zero_if_missing(get(CASH))
+    return np.where(np.isnan(ev), built, ev)
+
+
+def _free_cash_flow(get) -> np.ndarray:
+    fcf = get(FCF)
+    # Capital expenditures are reported negative
+    return np.where(np.isnan(fcf), get(CFO) + get(CAPEX), fcf)
+
+
+# Metric name → function(get) returning a (symbols × periods) array;
+# get(mnemonic) gives that line item's (symbols × periods) values
+PERIOD_METRICS = {
+    'ev_ebitda': lambda get: _ratio(_enterprise_value(get), get(EBITDA)),
+    'fcf_yield': lambda get: _ratio(_free_cash_flow(get), get(MARKET_CAP)) * 100,
+    'net_debt_ebitda': lambda get: _ratio(get(DEBT) - _zero_if_missing(get(CASH)), get(EBITDA)),
+    'ebitda_margin': lambda get: _ratio(get(EBITDA), get(SALES)) * 100,
+    'gross_margin': lambda get: _ratio(get(GROSS_PROFIT), get(SALES)) * 100,
+    'net_margin': lambda get: _ratio(get(NET_INCOME), get(SALES)) * 100,
+}
+
+
+def _trend(values: np.ndarray, years: np.ndarray, min_points: int = 3) -> np.ndarray:
+    """Least-squares slope per row over the non-NaN points (NaN with fewer than min_points)"""
+    mask = ~np.isnan(values)
+    count = mask.sum(axis=1)
+    x = np.broadcast_to(years, values.shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_mean = np.where(mask, x, 0).sum(axis=1) / count
+        y_mean = np.where(mask, values, 0).sum(axis=1) / count
+        dx = np.where(mask, x - x_mean[:, None], 0)
+        dy = np.where(mask, values - y_mean[:, None], 0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+    slope[(count < min_points) | ~np.isfinite(slope)] = np.nan
+    return slope
+
+
+def _first_valid(values: np.ndarray, reverse: bool = False) -> tuple:
+    """(column index, value) of each row's first (or last) non-NaN value; index -1 if none"""
+    if not values.shape[1]:
+        return np.full(len(values), -1), np.full(len(values), np.nan)
+    mask = ~np.isnan(values)
+    if reverse:
+        mask = mask[:, ::-1]
+    index = mask.argmax(axis=1)
+    found = mask[np.arange(len(mask)), index]
+    if reverse:
+        index = values.shape[1] - 1 - index
+    index = np.where(found, index, -1)
+    picked = np.where(found, values[np.arange(len(values)), np.maximum(index, 0)], np.nan)
+    return index, picked
+
+
+def _cagr(values: np.ndarray, years: np.ndarray) -> np.ndarray:
+    """Growth per year between each row's first and last reported value, %"""
+    first_at, first = _first_valid(values)
+    last_at, last = _first_valid(values, reverse=True)
+    span = years[np.maximum(last_at, 0)] - years[np.maximum(first_at, 0)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = (np.power(last / first, 1.0 / span) - 1) * 100
+    out[(first_at < 0) | (span <= 0) | ~(first > 0) | ~(last > 0) | ~np.isfinite(out)] = np.nan
+    return out
+
+
+def _latest(values: np.ndarray, kinds: np.ndarray) -> np.ndarray:
+    """Current/LTM value per row, else the last reported one"""
+    _, reported = _first_valid(values[:, kinds == REPORTED], reverse=True)
+    _, ltm = _first_valid(values[:, kinds == LTM])
+    return np.where(np.isnan(ltm), reported, ltm)
+
+
+def _est_growth(values: np.ndarray, kinds: np.ndarray) -> np.ndarray:
+    """First estimate against Current/LTM (or the last reported year), %"""
+    _, estimate = _first_valid(values[:, kinds == ESTIMATE])
+    return (_ratio(estimate, _latest(values, kinds)) - 1) * 100
+
+
+# Metric name → function(get, period_metrics, years, kinds) returning one value per symbol
+SYMBOL_METRICS = {
+    'ebitda_margin_trend': lambda get, pm, years, kinds: _trend(
+        pm['ebitda_margin'][:, kinds == REPORTED], years[kinds == REPORTED]),
+    'sales_cagr': lambda get, pm, years, kinds: _cagr(
+        get(SALES)[:, kinds == REPORTED], years[kinds == REPORTED]),
+    'sales_est_growth': lambda get, pm, years, kinds: _est_growth(get(SALES), kinds),
+    'ebitda_est_growth': lambda get, pm, years, kinds: _est_growth(get(EBITDA), kinds),
+    'eps_est_growth': lambda get, pm, years, kinds: _est_growth(get(EPS), kinds),
+}
+
+
+class FundamentalsEngine:
+    """The (symbol × mnemonic × period) cube and the metrics computed from it"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: Cache file for save() (None: not cached)
+        """
+        self.path = Path(path) if path else None
+        self.symbols = []
+        self.mnemonics = []
+        self.periods = []
+        self.values = np.full((0, 0, 0), np.nan)
+        self.fingerprints = {}
+        self.period_metrics = {}
+        self.symbol_metrics = {}
+        self._index()
+
+    @classmethod
+    def load(cls, path) -> "FundamentalsEngine":
+        """Engine with the cached cube from path, or an empty one if there is none yet"""
+        engine = cls(path)
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return engine
+        if state.get('version') != CACHE_VERSION:
+            return engine
+        engine.symbols = state['symbols']
+        engine.mnemonics = state['mnemonics']
+        engine.periods = state['periods']
+        engine.values = state['values']
+        engine.fingerprints = state['fingerprints']
+        engine._index()
+        engine._compute(np.arange(len(engine.symbols)))
+        return engine
+
+    def save(self) -> None:
+        """Write the cube atomically to the cache file"""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump({'version': CACHE_VERSION, 'symbols': self.symbols,
+                         'mnemonics': self.mnemonics, 'periods': self.periods,
+                         'values': self.values, 'fingerprints': self.fingerprints},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def update_from_snapshots(self, store: SnapshotStore) -> list:
+        """
+        Bring every symbol up to its newest snapshot, reloading only changed ones
+
+        Args:
+            store: Snapshot store the batch runs write to
+
+        Returns:
+            Symbols that were (re)loaded and recomputed
+        """
+        current = store.fingerprints()
+        changed = [symbol for symbol, digest in current.items()
+                   if self.fingerprints.get(symbol) != digest]
+        items = {}
+        for symbol in changed:
+            rows = store.rows(symbol)
+            items[symbol] = ([row[0] for row in rows], [row[2] for row in rows],
+                             [row[5] for row in rows])
+        self._replace(items, {symbol: current[symbol] for symbol in changed})
+        return changed
+
+    def update_from_table(self, table: pd.DataFrame) -> list:
+        """
+        Bring symbols up to a long table (e.g. highlights_parser.read_many)
+
+        Args:
+            table: Long table with the highlights_parser columns
+
+        Returns:
+            Symbols whose values differed from the cube and were recomputed
+        """
+        items, digests = {}, {}
+        for symbol, rows in table.groupby("symbol", observed=True, sort=False):
+            digest = fingerprint(rows)
+            if self.fingerprints.get(symbol) == digest:
+                continue
+            digests[symbol] = digest
+            items[symbol] = (rows["mnemonic"].astype(str).tolist(),
+                             rows["fiscal_period"].astype(str).tolist(),
+                             rows["value"].to_numpy(dtype="float64"))
+        self._replace(items, digests)
+        return list(items)
+
+    def summary(self) -> pd.DataFrame:
+        """One row per symbol: latest value of every period metric plus the per-symbol metrics"""
+        kinds = self._kinds()
+        columns = {name: _latest(values, kinds) for name, values in self.period_metrics.items()}
+        columns.update(self.symbol_metrics)
+        return pd.DataFrame(columns, index=pd.Index(self.symbols, name="symbol"))
+
+    def period_frame(self, name: str) -> pd.DataFrame:
+        """A metric (or a mnemonic) as a symbols × periods frame"""
+        if name in self.period_metrics:
+            values = self.period_metrics[name]
+        elif name in self._mnemonic_at:
+            values = self.values[:, self._mnemonic_at[name], :]
+        else:
+            raise KeyError(f"Unknown metric or mnemonic: {name}")
+        return pd.DataFrame(values, index=pd.Index(self.symbols, name="symbol"), columns=self.periods)
+
+    # --- Cube maintenance ---
+
+    def _index(self) -> None:
+        self._symbol_at = {s: i for i, s in enumerate(self.symbols)}
+        self._mnemonic_at = {m: i for i, m in enumerate(self.mnemonics)}
+        self._period_at = {p: i for i, p in enumerate(self.periods)}
+
+    def _kinds(self) -> np.ndarray:
+        return np.array([period_order(p)[0] for p in self.periods], dtype=int)
+
+    def _replace(self, items: dict, digests: dict) -> None:
+        """Overwrite the cube slices of some symbols; items: {symbol: (mnemonics, periods, values)}"""
+        if not items:
+            return
+        new_symbols = [s for s in items if s not in self._symbol_at]
+        new_mnemonics = sorted({m for mnemonics, _, _ in items.values() for m in mnemonics}
+                               - set(self._mnemonic_at))
+        new_periods = {p for _, periods, _ in items.values() for p in periods} - set(self._period_at)
+        if new_symbols or new_mnemonics or new_periods:
+            self._grow(new_symbols, new_mnemonics, new_periods)
+
+        rows = np.array([self._symbol_at[s] for s in items])
+        self.values[rows] = np.nan
+        # The first row of a mnemonic wins ("Margin %" rows reuse their line item's mnemonic)
+        for row, (mnemonics, periods, values) in zip(rows, items.values()):
+            m = np.fromiter((self._mnemonic_at[x] for x in mnemonics), dtype=np.intp, count=len(mnemonics))
+            p = np.fromiter((self._period_at[x] for x in periods), dtype=np.intp, count=len(periods))
+            flat = m * len(self.periods) + p
+            _, first = np.unique(flat, return_index=True)
+            slab = self.values[row]
+            slab[m[first], p[first]] = np.asarray(values, dtype="float64")[first]
+        self.fingerprints.update(digests)
+        if new_mnemonics or new_periods:
+            # A new axis entry can change every symbol's view of the axis; metrics are cheap
+            self._compute(np.arange(len(self.symbols)))
+        else:
+            self._compute(rows)
+
+    def _grow(self, new_symbols: list, new_mnemonics: list, new_periods: set) -> None:
+        """Extend the axes (periods kept in period_order) and move the cube over"""
+        symbols = self.symbols + new_symbols
+        mnemonics = self.mnemonics + new_mnemonics
+        periods = sorted(set(self.periods) | new_periods, key=period_order)
+        values = np.full((len(symbols), len(mnemonics), len(periods)), np.nan)
+        if self.values.size:
+            at = [periods.index(p) for p in self.periods]
+            values[:len(self.symbols), :len(self.mnemonics)][:, :, at] = self.values
+        for name, metric in self.period_metrics.items():
+            grown = np.full((len(symbols), len(periods)), np.nan)
+            if metric.size:
+                grown[:len(self.symbols)][:, [periods.index(p) for p in self.periods]] = metric
+            self.period_metrics[name] = grown
+        for name, metric in self.symbol_metrics.items():
+            self.symbol_metrics[name] = np.concatenate([metric, np.full(len(new_symbols), np.nan)])
+        self.symbols, self.mnemonics, self.periods, self.values = symbols, mnemonics, periods, values
+        self._index()
+
+    def _compute(self, rows: np.ndarray) -> None:
+        """Recompute every metric for the given cube rows"""
+        if not len(rows) or not self.periods:
+            return
+        cube = self.values[rows]
+        missing = np.full((len(rows), len(self.periods)), np.nan)
+
+        def get(mnemonic):
+            at = self._mnemonic_at.get(mnemonic)
+            return cube[:, at, :] if at is not None else missing
+
+        kinds = self._kinds()
+        years = np.array([period_order(p)[1] for p in self.periods], dtype="float64")
+        computed = {name: metric(get) for name, metric in PERIOD_METRICS.items()}
+        for name, values in computed.items():
+            target = self.period_metrics.setdefault(
+                name, np.full((len(self.symbols), len(self.periods)), np.nan))
+            target[rows] = values
+        for name, metric in SYMBOL_METRICS.items():
+            target = self.symbol_metrics.setdefault(name, np.full(len(self.symbols), np.nan))
+            target[rows] = metric(get, computed, years, kinds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute derived ratios for every refreshed symbol')
+    parser.add_argument('snapshots', nargs='?', default='output/snapshots.sqlite',
+                       help='Snapshot store of the batch runs (default: output/snapshots.sqlite)')
+    parser.add_argument('--csv',
+                       help='Read saved sheets matching this glob instead of the snapshot store')
+    parser.add_argument('--cache',
+                       help='Cube cache (default: fundamentals.pkl next to the snapshot store)')
+    parser.add_argument('--full', action='store_true',
+                       help='Ignore the cache and recompute every symbol')
+    parser.add_argument('--sort', default='ev_ebitda',
+                       help='Metric to sort the table by (default: ev_ebitda)')
+    parser.add_argument('--ascending', action='store_true', help='Sort lowest first')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print (default: 20)')
+    parser.add_argument('--metric',
+                       help='Print one metric (or mnemonic) per period instead of the summary')
+    parser.add_argument('--output', '-o', help='Write the summary (or --metric) table to this CSV')
+    args = parser.parse_args()
+
+    cache = Path(args.cache) if args.cache else Path(args.snapshots).parent / "fundamentals.pkl"
+    engine = FundamentalsEngine(cache) if args.full else FundamentalsEngine.load(cache)
+
+    started = time.perf_counter()
+    if args.csv:
+        from highlights_parser import read_many
+
+        changed = engine.update_from_table(read_many(sorted(glob.glob(args.csv))))
+    else:
+        if not Path(args.snapshots).exists():
+            print(f"❌ Snapshot store not found: {args.snapshots}")
+            return
+        store = SnapshotStore(args.snapshots)
+        try:
+            changed = engine.update_from_snapshots(store)
+        finally:
+            store.close()
+    elapsed = time.perf_counter() - started
+    engine.save()
+    print(f"📐 {len(changed)} of {len(engine.symbols)} symbols recomputed in {elapsed:.2f}s "
+          f"({len(engine.mnemonics)} mnemonics × {len(engine.periods)} periods)")
+
+    table = engine.period_frame(args.metric) if args.metric else engine.summary()
+    if not args.metric:
+        if args.sort not in table.columns:
+            print(f"❌ Unknown metric '{args.sort}'. Metrics: {', '.join(table.columns)}")
+            return
+        table = table.sort_values(args.sort, ascending=args.ascending, na_position="last")
+    if args.output:
+        table.to_csv(args.output, encoding="utf-8-sig")
+        print(f"💾 Saved: {args.output}")
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(table.head(args.top).round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+BBG Adj Highlights Parser
+=========================
+Turn the "BBG Adj Highlights" sheet (as saved by download_bloomberg_data.py)
+into a typed long table:
+
+    symbol | mnemonic | label | fiscal_period | period_end | is_estimate | value
+
+Numbers are decoded in one vectorized pass: Indian lakh/crore grouping
+("15,33,095.8"), parenthesised negatives and the missing-value markers
+("—", "�", "#N/A ...") all become float64 / NaN.
+
+Usage:
+    python highlights_parser.py output/HDFCB_bloomberg_data_20250101_120000.csv
+    python highlights_parser.py "output/*_bloomberg_data_*.csv" --output tidy.csv
+"""
+
+import re
+import csv
+import glob
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from template_patcher import SHEET_NAME
+
+
+COLUMNS = ["symbol", "mnemonic", "label", "fiscal_period", "period_end", "is_estimate", "value"]
+
+# "FY 2019", "FY 2026 Est", "Current/LTM", "Q1 2025", "H2 2024 Est" ...
+PERIOD_RE = re.compile(r"^(?:(?:FY|CY|Q[1-4]|H[12])\s*\d{4}(?:\s+Est)?|Current/LTM|LTM)$", re.I)
+MNEMONIC_RE = re.compile(r"^[A-Z][A-Z0-9_]+$")
+# "Indian Oil Corp Ltd (IOCL IN) - BBG Adj Highlights"
+TITLE_SYMBOL_RE = re.compile(r"\(([A-Z0-9&.\-]+) [A-Z]{2}\)")
+FILE_SYMBOL_RE = re.compile(r"^(.+?)_bloomberg_(?:data|values)_")
+
+# Characters stripped before numeric conversion: grouping, spaces, currency
+_NOISE_RE = r"[,\s₹%()]"
+# Display values that are never numbers: Excel/Bloomberg errors and empty-cell dashes
+_SENTINELS = ("#", "—")
+
+
+def decode_numbers(values) -> np.ndarray:
+    """
+    Vectorized conversion of Bloomberg display values to float64
+
+    Args:
+        values: Sequence of numbers and/or strings ("15,33,095.8", "(2,188.2)",
+                "—", "#N/A Field Not Applicable", None ...)
+
+    Returns:
+        float64 array, NaN wherever the value is missing or not a number
+    """
+    series = pd.Series(values, dtype=object)
+    numbers = pd.to_numeric(series, errors="coerce")
+
+    # Only cells that failed the fast path need cleaning, as one string column
+    todo = numbers.isna() & series.notna()
+    if todo.any():
+        text = series[todo].astype(str).str.strip()
+        # Error values ("#N/A ...", "#NAME?") and dashes stay NaN without parsing
+        text = text[~text.str.startswith(_SENTINELS)]
+        negative = text.str.startswith("(") & text.str.endswith(")")
+        parsed = pd.to_numeric(text.str.replace(_NOISE_RE, "", regex=True), errors="coerce")
+        parsed[negative] = -parsed[negative].abs()
+        numbers[parsed.index] = parsed
+
+    return numbers.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _text(value) -> str:
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _find_header(grid: list):
+    """Index of the fiscal-period header row and the columns holding periods"""
+    for r, row in enumerate(grid):
+        cols = [c for c, v in enumerate(row) if PERIOD_RE.match(_text(v))]
+        if len(cols) >= 2:
+            return r, cols
+    raise ValueError("No fiscal-period header row found (is this a BBG Adj Highlights sheet?)")
+
+
+def symbol_from_grid(grid: list):
+    """Bloomberg symbol from the sheet title, e.g. "... (IOCL IN) - BBG Adj Highlights" """
+    for row in grid[:10]:
+        for value in row:
+            match = TITLE_SYMBOL_RE.search(_text(value))
+            if match:
+                return match.group(1)
+    return None
+
+
+def _extract(grid: list, symbol: str = None) -> tuple:
+    """
+    Pull the raw pieces of the long table out of one grid
+
+    Returns:
+        (symbol, labels, mnemonics, periods, period ends, cells row-major)
+    """
+    header, cols = _find_header(grid)
+    periods = [_text(grid[header][c]) for c in cols]
+
+    # The "12 Months Ending" row right below the header carries period ends
+    ends = [None] * len(cols)
+    if header + 1 < len(grid):
+        below = grid[header + 1]
+        ends = [below[c] if c < len(below) else None for c in cols]
+
+    labels, mnemonics, cells = [], [], []
+    for row in grid[header + 1:]:
+        mnemonic = _text(row[1]) if len(row) > 1 else ""
+        if not MNEMONIC_RE.match(mnemonic):
+            continue
+        labels.append(_text(row[0]))
+        mnemonics.append(mnemonic)
+        cells.extend(row[c] if c < len(row) else None for c in cols)
+
+    return symbol or symbol_from_grid(grid) or "", labels, mnemonics, periods, ends, cells
+
+
+def _period_ends(ends: list) -> np.ndarray:
+    """Parse "03/31/2019" strings (or dates Excel already converted)"""
+    parsed = pd.to_datetime(pd.Series(ends, dtype=object).map(
+        lambda v: v if isinstance(v, str) else None), format="%m/%d/%Y", errors="coerce")
+    for i, end in enumerate(ends):
+        if hasattr(end, "year") and pd.isna(parsed[i]):
+            parsed[i] = pd.Timestamp(end)
+    return parsed.to_numpy(dtype="datetime64[ns]")
+
+
+def _build(extracts: list) -> pd.DataFrame:
+    """Assemble extracted grids into one long table with a single decode pass"""
+    symbols, mnemonics, labels, periods, ends, estimates, cells = [], [], [], [], [], [], []
+    for symbol, row_labels, row_mnemonics, row_periods, row_ends, row_cells in extracts:
+        n_rows, n_periods = len(row_labels), len(row_periods)
+        symbols.extend([symbol] * (n_rows * n_periods))
+        mnemonics.extend(np.repeat(row_mnemonics, n_periods).tolist())
+        labels.extend(np.repeat(row_labels, n_periods).tolist())
+        periods.extend(row_periods * n_rows)
+        ends.extend(row_ends * n_rows)
+        estimates.extend([p.upper().endswith("EST") for p in row_periods] * n_rows)
+        cells.extend(row_cells)
+
+    if not cells:
+        return empty_table()
+
+    frame = pd.DataFrame({
+        "symbol": pd.Categorical(symbols),
+        "mnemonic": pd.Categorical(mnemonics),
+        "label": pd.Categorical(labels),
+        "fiscal_period": pd.Categorical(periods),
+        "period_end": _period_ends(ends),
+        "is_estimate": np.array(estimates, dtype=bool),
+        "value": decode_numbers(cells),
+    })
+    return frame[COLUMNS]
+
+
+def parse_grid(grid, symbol: str = None) -> pd.DataFrame:
+    """
+    Parse a BBG Adj Highlights value grid into the long table
+
+    Args:
+        grid: 2D list (or DataFrame read with header=None) of sheet values
+        symbol: Bloomberg symbol; taken from the sheet title if omitted
+
+    Returns:
+        DataFrame with COLUMNS, one row per (line item, fiscal period)
+    """
+    if isinstance(grid, pd.DataFrame):
+        grid = grid.astype(object).where(grid.notna(), None).values.tolist()
+    grid = [list(row) if row is not None else [] for row in grid]
+    return _build([_extract(grid, symbol)])
+
+
+def symbol_from_path(path) -> str:
+    """Symbol from an output filename like HDFCB_bloomberg_data_<timestamp>.csv"""
+    match = FILE_SYMBOL_RE.match(Path(path).name)
+    return match.group(1) if match else None
+
+
+def read_grid(path) -> list:
+    """
+    Read the raw value grid of a saved sheet
+
+    Args:
+        path: CSV from RefreshResult.to_csv or a values/data .xlsx
+
+    Returns:
+        2D list of cell values
+    """
+    path = Path(path)
+    if path.suffix.lower() in (".xlsx", ".xlsm", ".xls"):
+        df = pd.read_excel(path, sheet_name=SHEET_NAME, header=None, dtype=object)
+        return df.astype(object).where(df.notna(), None).values.tolist()
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        return list(csv.reader(f))
+
+
+def read_highlights(path, symbol: str = None) -> pd.DataFrame:
+    """
+    Parse one saved sheet into the long table
+
+    Args:
+        path: CSV from RefreshResult.to_csv or a values/data .xlsx
+        symbol: Bloomberg symbol (default: from the title, then the filename)
+
+    Returns:
+        DataFrame with COLUMNS
+    """
+    grid = read_grid(path)
+    return _build([_extract(grid, symbol or symbol_from_grid(grid) or symbol_from_path(path))])
+
+
+def read_many(paths) -> pd.DataFrame:
+    """
+    Parse many saved sheets into one long table; unreadable files are skipped
+
+    Args:
+        paths: Iterable of file paths
+
+    Returns:
+        DataFrame with COLUMNS for every file that parsed
+    """
+    extracts = []
+    for path in paths:
+        try:
+            grid = read_grid(path)
+            extracts.append(_extract(grid, symbol_from_grid(grid) or symbol_from_path(path)))
+        except Exception as e:
+            print(f"⚠️  Skipping {path}: {e}")
+    return _build(extracts)
+
+
+def empty_table() -> pd.DataFrame:
+    """A long table with no rows but the usual columns and dtypes"""
+    return pd.DataFrame({
+        "symbol": pd.Categorical([]),
+        "mnemonic": pd.Categorical([]),
+        "label": pd.Categorical([]),
+        "fiscal_period": pd.Categorical([]),
+        "period_end": pd.Series([], dtype="datetime64[ns]"),
+        "is_estimate": pd.Series([], dtype=bool),
+        "value": pd.Series([], dtype="float64"),
+    })[COLUMNS]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Parse saved BBG Adj Highlights sheets into a long table'
+    )
+    parser.add_argument('paths', nargs='+',
+                       help='CSV/xlsx files or glob patterns')
+    parser.add_argument('--output', '-o',
+                       help='Write the long table to this CSV (default: print a preview)')
+    args = parser.parse_args()
+
+    paths = [p for pattern in args.paths for p in (sorted(glob.glob(pattern)) or [pattern])]
+
+    start = time.perf_counter()
+    table = read_many(paths)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Parsed {len(paths)} files → {len(table)} rows in {elapsed:.2f}s")
+    if args.output:
+        table.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"💾 Saved: {args.output}")
+    else:
+        print(table.head(20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+"""
+Point-in-Time History Store
+===========================
+Answers "what did Bloomberg show for HDFCB's FY 2026 EBITDA estimate on
+1 March?" without digging through timestamped output files.
+
+Bitemporal: every value has its fiscal period / period_end (valid time) and
+the as_of time the refresh saw it (transaction time). Only revisions are
+stored: a row is written the first time a cell is seen and whenever its
+value differs from the last stored one, so daily runs over unchanged annual
+data add almost nothing. The value shown at time T is the newest revision
+with as_of <= T.
+
+Layout (hive partitioning, one directory per mnemonic):
+
+    history/mnemonic=EBITDA/part-<uuid>.parquet
+
+    symbol | label | fiscal_period | period_end | is_estimate | value | as_of
+
+Symbols are stored by their bare code ("HDFCB"); queries also accept
+"HDFCB IN" / "HDFCB IN Equity".
+
+Files are sorted by (symbol, label, fiscal_period, as_of) with bounded row
+groups, so a symbol filter reads a few row groups and a mnemonic filter one
+directory. compact() merges each directory's small per-run files into one.
+
+Requires pyarrow (pip install pyarrow).
+
+Usage:
+    history = HistoryStore("./history")
+    history.append(long_table, as_of=datetime.now())
+    history.close()
+
+    history.as_of("2026-03-01", symbols=["HDFCB"])
+    history.revisions("HDFCB", "EBITDA", "FY 2026 Est")
+    history.cross_section("EBITDA", "FY2026", "2026-03-01")
+
+    python history_store.py ./history as-of 2026-03-01 --symbols HDFCB
+    python history_store.py ./history revisions HDFCB EBITDA "FY 2026 Est"
+    python history_store.py ./history cross-section EBITDA FY2026 2026-03-01
+"""
+
+import argparse
+import re
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from symbol_universe import bare_symbol
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = ds = pq = None
+
+
+# A cell's identity; label separates e.g. "EBITDA, Adj" from its "Margin %" row
+KEY_COLUMNS = ["symbol", "mnemonic", "label", "fiscal_period"]
+COLUMNS = ["symbol", "mnemonic", "label", "fiscal_period", "period_end", "is_estimate",
+           "value", "as_of"]
+SORT_COLUMNS = ["symbol", "label", "fiscal_period", "as_of"]
+DICTIONARY_COLUMNS = ["symbol", "label", "fiscal_period"]
+
+
+def _when(value) -> pd.Timestamp:
+    """Query time: a date means the end of that day"""
+    if isinstance(value, str) and re.fullmatch(r"\d{4}-\d{2}-\d{2}", value.strip()):
+        return pd.Timestamp(value) + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    return pd.Timestamp(value)
+
+
+def _period_key(period: str) -> str:
+    return re.sub(r"\s+", "", str(period)).upper()
+
+
+class HistoryStore:
+    """Revision-only, mnemonic-partitioned Parquet history of refreshed values"""
+
+    def __init__(self, root, flush_rows: int = 50_000, row_group_rows: int = 16_384):
+        """
+        Args:
+            root: Directory holding the dataset
+            flush_rows: Buffered revisions that trigger a write
+            row_group_rows: Rows per Parquet row group (smaller: finer pruning)
+        """
+        if pa is None:
+            raise ImportError("The history store needs pyarrow: pip install pyarrow")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.flush_rows = flush_rows
+        self.row_group_rows = row_group_rows
+        self._pending = []
+        self._pending_rows = 0
+        # {symbol: _Cells} last stored values of the symbols appended so far
+        self._latest = {}
+        self._dataset = None
+        self._stored_periods = {}
+
+    # --- Writing ---
+
+    def append(self, table: pd.DataFrame, as_of: datetime = None) -> int:
+        """
+        Record one refresh's long table, keeping only revised cells
+
+        Args:
+            table: Long table from highlights_parser (one or more symbols)
+            as_of: When the refresh ran (default: now)
+
+        Returns:
+            Number of revisions (new or changed cells) recorded
+        """
+        if table is None or table.empty:
+            return 0
+        as_of = pd.Timestamp(as_of or datetime.now())
+        codes, symbols = pd.factorize(table["symbol"].astype(str))
+        self._load_latest([s for s in symbols if s not in self._latest])
+
+        # Walk the table symbol by symbol without building per-symbol frames
+        order = np.argsort(codes, kind="stable")
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(symbols)))))
+        keys = list(zip(*(np.asarray(table[c], dtype=object)[order].tolist()
+                          for c in ("mnemonic", "label", "fiscal_period"))))
+        values = table["value"].to_numpy(dtype="float64")[order]
+        keep = np.zeros(len(table), dtype=bool)
+        for i, symbol in enumerate(symbols):
+            a, b = bounds[i], bounds[i + 1]
+            keep[order[a:b]] = self._latest[symbol].revise(tuple(keys[a:b]), values[a:b])
+        if not keep.any():
+            return 0
+
+        frame = table.iloc[np.flatnonzero(keep)][COLUMNS[:-1]].copy()
+        frame["symbol"] = frame["symbol"].astype(str)
+        frame["as_of"] = as_of
+        self._pending.append(frame)
+        self._pending_rows += len(frame)
+        if self._pending_rows >= self.flush_rows:
+            self.flush()
+        return len(frame)
+
+    def flush(self) -> list:
+        """
+        Write buffered revisions, one file per mnemonic
+
+        Returns:
+            Paths of the files written
+        """
+        if not self._pending:
+            return []
+        frame = pd.concat(self._pending, ignore_index=True)
+        self._pending, self._pending_rows = [], 0
+        frame["mnemonic"] = frame["mnemonic"].astype(str)
+
+        written = []
+        for mnemonic, part in frame.groupby("mnemonic", sort=True):
+            directory = self.root / f"mnemonic={mnemonic}"
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"part-{uuid.uuid4().hex}.parquet"
+            self._write(part.drop(columns=["mnemonic"]), path)
+            written.append(path)
+        self._dataset = None
+        self._stored_periods = {}
+        return written
+
+    def close(self) -> None:
+        """Write anything still buffered"""
+        self.flush()
+
+    def compact(self, mnemonic: str = None, min_files: int = 2) -> int:
+        """
+        Merge each mnemonic's files into one sorted file
+
+        Args:
+            mnemonic: Only compact this mnemonic (default: all)
+            min_files: Leave directories with fewer files alone
+
+        Returns:
+            Number of mnemonic directories rewritten
+        """
+        self.flush()
+        rewritten = 0
+        for directory in sorted(self.root.glob(f"mnemonic={mnemonic or '*'}")):
+            files = sorted(directory.glob("*.parquet"))
+            if len(files) < max(2, min_files):
+                continue
+            frame = pd.concat([pq.read_table(f).to_pandas() for f in files], ignore_index=True)
+            frame = frame.drop_duplicates(subset=SORT_COLUMNS, keep="last")
+            self._write(frame, directory / f"part-{uuid.uuid4().hex}.parquet")
+            for f in files:
+                f.unlink()
+            rewritten += 1
+        self._dataset = None
+        self._stored_periods = {}
+        return rewritten
+
+    def _write(self, frame: pd.DataFrame, path: Path) -> None:
+        frame = frame.sort_values(SORT_COLUMNS, kind="stable")
+        for column in DICTIONARY_COLUMNS:
+            frame[column] = frame[column].astype(str)
+        table = pa.Table.from_pandas(frame[[c for c in COLUMNS if c != "mnemonic"]],
+                                     preserve_index=False)
+        table = table.cast(self._file_schema())
+        # Write to a temp name first: readers never see half a file
+        tmp = path.with_suffix(".tmp")
+        pq.write_table(table, tmp, row_group_size=self.row_group_rows,
+                       use_dictionary=DICTIONARY_COLUMNS, compression="zstd")
+        tmp.replace(path)
+
+    @staticmethod
+    def _file_schema():
+        return pa.schema([
+            ("symbol", pa.string()), ("label", pa.string()), ("fiscal_period", pa.string()),
+            ("period_end", pa.timestamp("us")), ("is_estimate", pa.bool_()),
+            ("value", pa.float64()), ("as_of", pa.timestamp("us")),
+        ])
+
+    def _load_latest(self, symbols: list) -> None:
+        """Last stored value of every cell of symbols not seen yet (one read for all)"""
+        if not symbols:
+            return
+        for symbol in symbols:
+            self._latest[symbol] = _Cells()
+        frame = self._read(ds.field("symbol").isin(list(symbols)),
+                           ["symbol", "mnemonic", "label", "fiscal_period", "value", "as_of"])
+        if frame.empty:
+            return
+        frame = frame.sort_values("as_of", kind="stable").drop_duplicates(KEY_COLUMNS, keep="last")
+        for symbol, rows in frame.groupby("symbol", sort=False):
+            keys = tuple(zip(*(np.asarray(rows[c], dtype=object).tolist()
+                               for c in ("mnemonic", "label", "fiscal_period"))))
+            self._latest[str(symbol)].revise(keys, rows["value"].to_numpy(dtype="float64"))
+
+    # --- Reading ---
+
+    def dataset(self):
+        """The pyarrow dataset over every mnemonic directory"""
+        if self._dataset is None:
+            partitioning = ds.partitioning(pa.schema([("mnemonic", pa.string())]), flavor="hive")
+            self._dataset = ds.dataset(self.root, format="parquet", partitioning=partitioning,
+                                       schema=self._file_schema().append(
+                                           pa.field("mnemonic", pa.string())))
+        return self._dataset
+
+    def _read(self, expr, columns: list = None) -> pd.DataFrame:
+        if not any(self.root.glob("mnemonic=*/*.parquet")):
+            return pd.DataFrame(columns=columns or COLUMNS)
+        table = self.dataset().to_table(columns=columns or COLUMNS, filter=expr)
+        return table.to_pandas()
+
+    def _periods(self, mnemonics: list, periods: list) -> list:
+        """
+        Stored fiscal period names matching loosely written ones
+        ("FY2026" matches "FY 2026" and "FY 2026 Est")
+        """
+        wanted = {_period_key(p) for p in periods}
+        cache_key = tuple(sorted(mnemonics or ()))
+        if cache_key not in self._stored_periods:
+            expr = ds.field("mnemonic").isin(list(mnemonics)) if mnemonics else None
+            self._stored_periods[cache_key] = pc.unique(
+                self.dataset().to_table(columns=["fiscal_period"], filter=expr)
+                .column("fiscal_period")).to_pylist()
+        stored = self._stored_periods[cache_key]
+        return [p for p in stored
+                if _period_key(p) in wanted or re.sub(r"EST$", "", _period_key(p)) in wanted]
+
+    def as_of(self, when, symbols: list = None, mnemonics: list = None, periods: list = None,
+              estimates: bool = None) -> pd.DataFrame:
+        """
+        What the store showed at a point in time: the newest revision of
+        every cell with as_of <= when
+
+        Args:
+            when: Datetime or "YYYY-MM-DD" (end of that day)
+            symbols: Only these symbols
+            mnemonics: Only these field mnemonics
+            periods: Only these fiscal periods ("FY2026" also matches "FY 2026 Est")
+            estimates: True for estimates only, False for actuals only
+
+        Returns:
+            One row per cell with the COLUMNS (as_of: when that value was first seen)
+        """
+        expr = ds.field("as_of") <= pa.scalar(_when(when).to_pydatetime(), pa.timestamp("us"))
+        if symbols:
+            expr = expr & ds.field("symbol").isin([bare_symbol(s) for s in symbols])
+        if mnemonics:
+            expr = expr & ds.field("mnemonic").isin(list(mnemonics))
+        if periods:
+            if not any(self.root.glob("mnemonic=*/*.parquet")):
+                return pd.DataFrame(columns=COLUMNS)
+            expr = expr & ds.field("fiscal_period").isin(self._periods(mnemonics, periods))
+        if estimates is not None:
+            expr = expr & (ds.field("is_estimate") == estimates)
+
+        frame = self._read(expr)
+        if frame.empty:
+            return frame
+        frame = frame.sort_values("as_of", kind="stable").drop_duplicates(KEY_COLUMNS, keep="last")
+        return frame.sort_values(KEY_COLUMNS)[COLUMNS].reset_index(drop=True)
+
+    def revisions(self, symbol: str, mnemonic: str, period: str, label: str = None,
+                  start=None, end=None) -> pd.DataFrame:
+        """
+        How one cell's value was revised over time (e.g. an estimate's path)
+
+        Args:
+            symbol: Symbol ("HDFCB"; "HDFCB IN Equity" also works)
+            mnemonic: Field mnemonic
+            period: Fiscal period ("FY 2026 Est"; "FY2026" matches loosely)
+            label: Only this row label (mnemonics like EBITDA have a margin row too)
+            start / end: Only revisions seen in this as_of range
+
+        Returns:
+            Rows ordered by as_of with 'value', 'previous' and 'change'
+        """
+        if not any(self.root.glob(f"mnemonic={mnemonic}/*.parquet")):
+            return pd.DataFrame(columns=COLUMNS + ["previous", "change"])
+        expr = ((ds.field("mnemonic") == mnemonic) & (ds.field("symbol") == bare_symbol(symbol))
+                & ds.field("fiscal_period").isin(self._periods([mnemonic], [period])))
+        if label:
+            expr = expr & (ds.field("label") == label)
+        if start is not None:
+            expr = expr & (ds.field("as_of") >= pa.scalar(pd.Timestamp(start).to_pydatetime(),
+                                                           pa.timestamp("us")))
+        if end is not None:
+            expr = expr & (ds.field("as_of") <= pa.scalar(_when(end).to_pydatetime(),
+                                                           pa.timestamp("us")))
+        frame = self._read(expr).sort_values(["label", "fiscal_period", "as_of"], kind="stable")
+        grouped = frame.groupby(["label", "fiscal_period"], sort=False)["value"]
+        frame["previous"] = grouped.shift()
+        frame["change"] = frame["value"] - frame["previous"]
+        return frame[COLUMNS + ["previous", "change"]].reset_index(drop=True)
+
+    def cross_section(self, mnemonic: str, period: str, when, label: str = None,
+                      symbols: list = None) -> pd.DataFrame:
+        """
+        One field for every symbol as the store showed it at a point in time
+
+        Args:
+            mnemonic: Field mnemonic
+            period: Fiscal period ("FY2026" matches "FY 2026" and "FY 2026 Est")
+            when: Datetime or "YYYY-MM-DD" (end of that day)
+            label: Only this row label
+            symbols: Only these symbols
+
+        Returns:
+            One row per symbol and label, sorted by symbol
+        """
+        frame = self.as_of(when, symbols=symbols, mnemonics=[mnemonic], periods=[period])
+        if label and not frame.empty:
+            frame = frame[frame["label"] == label]
+        return frame.reset_index(drop=True)
+
+    def stats(self) -> dict:
+        """Files, revisions, bytes on disk and the as_of range"""
+        files = list(self.root.glob("mnemonic=*/*.parquet"))
+        if not files:
+            return {'files': 0, 'rows': 0, 'bytes': 0, 'first': None, 'last': None}
+        as_of = self.dataset().to_table(columns=["as_of"]).column("as_of")
+        return {
+            'files': len(files),
+            'rows': len(as_of),
+            'bytes': sum(f.stat().st_size for f in files),
+            'first': pc.min(as_of).as_py(),
+            'last': pc.max(as_of).as_py(),
+        }
+
+
+class _Cells:
+    """Last stored value per cell of one symbol"""
+
+    def __init__(self):
+        self.keys = ()
+        self.values = np.empty(0)
+
+    def revise(self, keys: tuple, values: np.ndarray) -> np.ndarray:
+        """
+        Take a refresh's cells; returns the mask of cells that are new or
+        changed (NaN equals NaN)
+        """
+        if keys == self.keys:
+            # Same sheet layout as last time: one vectorized comparison
+            same = (self.values == values) | (np.isnan(self.values) & np.isnan(values))
+            self.values = np.array(values, dtype="float64")
+            return ~same
+
+        stored = dict(zip(self.keys, self.values))
+        known = np.fromiter((k in stored for k in keys), dtype=bool, count=len(keys))
+        old = np.fromiter((stored.get(k, np.nan) for k in keys), dtype="float64", count=len(keys))
+        same = known & ((old == values) | (np.isnan(old) & np.isnan(values)))
+        # Cells this refresh did not return keep their last value
+        stored.update(zip(keys, values))
+        if len(stored) == len(keys):
+            self.keys, self.values = keys, np.array(values, dtype="float64")
+        else:
+            self.keys = tuple(stored)
+            self.values = np.fromiter(stored.values(), dtype="float64", count=len(stored))
+        return ~same
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the point-in-time history store')
+    parser.add_argument('root', help='History store directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    as_of = commands.add_parser('as-of', help='Every cell as shown at a point in time')
+    as_of.add_argument('when', help='YYYY-MM-DD or "YYYY-MM-DD HH:MM"')
+    as_of.add_argument('--symbols', help='Comma-separated symbols')
+    as_of.add_argument('--mnemonics', help='Comma-separated mnemonics')
+    as_of.add_argument('--periods', help='Comma-separated fiscal periods')
+
+    revisions = commands.add_parser('revisions', help='Revision series of one cell')
+    revisions.add_argument('symbol')
+    revisions.add_argument('mnemonic')
+    revisions.add_argument('period')
+    revisions.add_argument('--label')
+
+    cross = commands.add_parser('cross-section', help='One field for every symbol at a date')
+    cross.add_argument('mnemonic')
+    cross.add_argument('period')
+    cross.add_argument('when')
+    cross.add_argument('--label')
+
+    commands.add_parser('stats', help='Size and time range of the store')
+    commands.add_parser('compact', help='Merge each mnemonic\'s files into one')
+    for sub in (as_of, revisions, cross):
+        sub.add_argument('--output', '-o', help='Write the result to this CSV')
+    args = parser.parse_args()
+
+    def split(value):
+        return [v.strip() for v in value.split(',') if v.strip()] if value else None
+
+    if not Path(args.root).exists():
+        print(f"❌ History store not found: {args.root}")
+        return
+    history = HistoryStore(args.root)
+    started = time.perf_counter()
+    if args.command == 'stats':
+        stats = history.stats()
+        print(f"📚 {stats['rows']:,} revisions in {stats['files']} files "
+              f"({stats['bytes'] / 1024 / 1024:.1f} MB), {stats['first']} → {stats['last']}")
+        return
+    if args.command == 'compact':
+        print(f"🧹 Compacted {history.compact()} mnemonics")
+        return
+    if args.command == 'as-of':
+        frame = history.as_of(args.when, split(args.symbols), split(args.mnemonics), split(args.periods))
+    elif args.command == 'revisions':
+        frame = history.revisions(args.symbol, args.mnemonic, args.period, args.label)
+    else:
+        frame = history.cross_section(args.mnemonic, args.period, args.when, args.label)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if args.output:
+        frame.to_csv(args.output, index=False)
+        print(f"✅ {len(frame)} rows in {elapsed:.1f} ms → {args.output}")
+    else:
+        with pd.option_context('display.max_rows', 200, 'display.width', 200):
+            print(frame.to_string(index=False) if not frame.empty else "(no rows)")
+        print(f"\n⏱️  {len(frame)} rows in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
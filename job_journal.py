@@ -0,0 +1,201 @@
+"""
+Batch Job Journal
+=================
+On-disk record of every symbol in a batch run, so an interrupted run can be
+resumed instead of started over.
+
+One SQLite row per symbol:
+
+    symbol | state | attempts | last_error | output | updated_at
+
+with state one of pending / running / done / failed and output the JSON
+paths dict returned by the downloader. State changes are kept in memory and
+written in one transaction every `flush_every` changes or `flush_seconds`
+seconds, so journaling costs nothing noticeable per symbol. A crash can
+lose the last few seconds of changes; those symbols are simply refreshed
+again on --resume (symbols still marked running are treated as pending).
+
+Usage:
+    journal = JobJournal("output/batch_journal.sqlite")
+    todo = journal.start(symbols, resume=True)
+    journal.mark_running(["HDFCB"])
+    journal.mark_done("HDFCB", result)
+    journal.close()
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    symbol     TEXT PRIMARY KEY,
+    state      TEXT NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    output     TEXT,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class JobJournal:
+    """SQLite-backed per-symbol job states with batched writes"""
+
+    def __init__(self, path, flush_every: int = 50, flush_seconds: float = 2.0):
+        """
+        Args:
+            path: SQLite file (created if missing)
+            flush_every: Write once this many rows changed
+            flush_seconds: ... or once this many seconds passed since the last write
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._rows = {}
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+
+    def start(self, symbols: list, resume: bool = False) -> list:
+        """
+        Register the symbols of a run
+
+        Args:
+            symbols: Every symbol the run covers
+            resume: Keep earlier states and skip symbols already done;
+                    otherwise every symbol starts again as pending
+
+        Returns:
+            The symbols still to download, in the given order
+        """
+        self._rows = {}
+        if resume:
+            for row in self._conn.execute(
+                    "SELECT symbol, state, attempts, last_error, output FROM jobs"):
+                symbol, state, attempts, last_error, output = row
+                self._rows[symbol] = {
+                    'state': PENDING if state == RUNNING else state,
+                    'attempts': attempts,
+                    'last_error': last_error,
+                    'output': output,
+                }
+
+        todo = []
+        for symbol in dict.fromkeys(symbols):
+            row = self._rows.get(symbol)
+            if row is None or not resume:
+                self._rows[symbol] = {'state': PENDING, 'attempts': 0,
+                                      'last_error': None, 'output': None}
+                self._dirty.add(symbol)
+            elif row['state'] == DONE:
+                continue
+            todo.append(symbol)
+        self.flush()
+        return todo
+
+    def mark_running(self, symbols: list) -> None:
+        """Record that an attempt at these symbols has started"""
+        for symbol in symbols:
+            row = self._row(symbol)
+            row['state'] = RUNNING
+            row['attempts'] += 1
+            self._dirty.add(symbol)
+        self._maybe_flush()
+
+    def mark_done(self, symbol: str, output: dict = None) -> None:
+        """Record a successful download and where its files went"""
+        row = self._row(symbol)
+        row.update(state=DONE, last_error=None, output=encode_output(output))
+        self._dirty.add(symbol)
+        self._maybe_flush()
+
+    def mark_failed(self, symbol: str, error: str = None) -> None:
+        """Record a failed attempt"""
+        row = self._row(symbol)
+        row.update(state=FAILED, last_error=error)
+        self._dirty.add(symbol)
+        self._maybe_flush()
+
+    def get(self, symbol: str) -> dict:
+        """State, attempts, last_error and output (decoded) of one symbol, or None"""
+        if symbol in self._rows:
+            row = dict(self._rows[symbol])
+        else:
+            found = self._conn.execute(
+                "SELECT state, attempts, last_error, output FROM jobs WHERE symbol = ?",
+                (symbol,)).fetchone()
+            if found is None:
+                return None
+            row = dict(zip(('state', 'attempts', 'last_error', 'output'), found))
+        row['output'] = json.loads(row['output']) if row['output'] else None
+        return row
+
+    def counts(self) -> dict:
+        """Number of symbols in each state for the current run"""
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for row in self._rows.values():
+            counts[row['state']] += 1
+        return counts
+
+    def _row(self, symbol: str) -> dict:
+        if symbol not in self._rows:
+            self._rows[symbol] = {'state': PENDING, 'attempts': 0,
+                                  'last_error': None, 'output': None}
+        return self._rows[symbol]
+
+    def _maybe_flush(self) -> None:
+        if (len(self._dirty) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_seconds):
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write every changed row in one transaction
+
+        Returns:
+            Number of rows written
+        """
+        self._last_flush = time.monotonic()
+        if not self._dirty:
+            return 0
+        now = time.time()
+        rows = [(symbol, self._rows[symbol]['state'], self._rows[symbol]['attempts'],
+                 self._rows[symbol]['last_error'], self._rows[symbol]['output'], now)
+                for symbol in self._dirty]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO jobs (symbol, state, attempts, last_error, output, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(symbol) DO UPDATE SET state = excluded.state, "
+                "attempts = excluded.attempts, last_error = excluded.last_error, "
+                "output = excluded.output, updated_at = excluded.updated_at",
+                rows,
+            )
+        self._dirty.clear()
+        return len(rows)
+
+    def close(self) -> None:
+        """Write anything pending and close the database"""
+        self.flush()
+        self._conn.close()
+
+
+def encode_output(output: dict):
+    """JSON for a downloader paths dict (Paths become strings; None, flags, numbers and lists stay)"""
+    if not output:
+        return None
+    return json.dumps({key: value if value is None or isinstance(value, (list, bool, int, float))
+                       else str(value) for key, value in output.items()})
@@ -0,0 +1,324 @@
+"""
+Bloomberg ↔ NSE/BSE Listing Map
+===============================
+Match every Bloomberg ticker in BB_symbol.csv ("HDFCB IN Equity") to its
+NSE/BSE listing in query-results.csv, and with it the listing's
+authoritative Industry Group / Industry.
+
+Matching, per ticker:
+- Bloomberg code equal to the NSE code, with a similar name → confidence 1.0
+- Bloomberg code equal to the NSE code, different name     → 0.85 .. 1.0
+- Otherwise the most similar listing name (trigram similarity on names with
+  LTD/CORP/... removed; Bloomberg's 16-character truncation counts as a
+  prefix match, Screener-style abbreviations as a 4-letter-per-word
+  match)                                                     → up to 0.9
+
+Matches below MIN_CONFIDENCE are kept (for review) but ignored by the
+industry lookups. The map is stored in .cache/listing_map.json next to
+BB_symbol.csv and refreshed incrementally: only new or renamed tickers are
+matched again, and when query-results.csv changes only tickers whose
+listing disappeared (or that had no confident match) are.
+
+Usage:
+    listings = ListingMap.load()
+    listings.industry_of("HDFCB")        # ("Banks", "Private Sector Bank")
+    listings.select(["Banks"])           # Bare symbols ("HDFCB"), largest first
+"""
+
+import csv
+import hashlib
+import heapq
+import json
+import os
+import re
+from collections import Counter
+from pathlib import Path
+
+from symbol_universe import DEFAULT_CSV, SymbolUniverse, bare_symbol
+
+
+DEFAULT_LISTINGS = "query-results.csv"
+CACHE_VERSION = 2
+MIN_CONFIDENCE = 0.6
+
+# Words that carry no identity in company names
+_STOP_WORDS = {'LTD', 'LIMITED', 'THE', 'CO', 'CORP', 'CORPN', 'CORPORATION',
+               'AND', 'OF', 'INDIA', 'IND', 'INC', 'PLC', 'PVT'}
+_NON_ALNUM_RE = re.compile(r"[^A-Z0-9]+")
+
+# Candidate listings scored in full per ticker (best by trigram overlap)
+_CANDIDATES = 8
+# Shortest truncated name accepted as a prefix match
+_MIN_PREFIX = 6
+
+
+def _words(name: str) -> list:
+    words = _NON_ALNUM_RE.sub(" ", str(name).upper()).split()
+    return [w for w in words if w not in _STOP_WORDS] or words
+
+
+def compact_name(name: str) -> str:
+    """Upper-case name without punctuation, spaces or stop words"""
+    return "".join(_words(name))
+
+
+def skeleton_name(name: str) -> str:
+    """compact_name with every word cut to 4 letters ("Hind. Unilever" → "HINDUNIL")"""
+    return "".join(w[:4] for w in _words(name))
+
+
+def _grams(text: str) -> set:
+    padded = f"^{text}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _stat(path: Path) -> dict:
+    stat = path.stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _sha1(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+class Listings:
+    """query-results.csv rows with a trigram index over their names"""
+
+    def __init__(self, csv_path=DEFAULT_LISTINGS):
+        path = Path(csv_path)
+        with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+            reader = csv.DictReader(f)
+            self.rows = [{
+                'listing': (row.get('Name') or "").strip(),
+                'nse': (row.get('NSE Code') or "").strip() or None,
+                'bse': (row.get('BSE Code') or "").strip().split(".")[0] or None,
+                'industry_group': (row.get('Industry Group') or "").strip() or None,
+                'industry': (row.get('Industry') or "").strip() or None,
+            } for row in reader]
+
+        self.compact = [compact_name(row['listing']) for row in self.rows]
+        self.skeletons = [skeleton_name(row['listing']) for row in self.rows]
+        self.grams = [_grams(c) for c in self.compact]
+        self.by_nse = {row['nse']: i for i, row in enumerate(self.rows) if row['nse']}
+        self.by_bse = {row['bse']: i for i, row in enumerate(self.rows) if row['bse']}
+        self.postings = {}
+        for i, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+    def find(self, key: dict):
+        """Row index of a previously matched listing (by NSE, then BSE code), or None"""
+        if key.get('nse') and key['nse'] in self.by_nse:
+            return self.by_nse[key['nse']]
+        if key.get('bse') and key['bse'] in self.by_bse:
+            return self.by_bse[key['bse']]
+        return None
+
+    def name_score(self, name: str, i: int, grams: set = None, skeleton: str = None) -> float:
+        """Similarity (0..1) of a compact Bloomberg name to listing i's name"""
+        other = self.compact[i]
+        if not name or not other:
+            return 0.0
+        if name == other:
+            return 1.0
+        # Abbreviated on either side ("HINDUSTAN UNILEV" / "Hind. Unilever")
+        if skeleton and len(skeleton) >= _MIN_PREFIX and skeleton == self.skeletons[i]:
+            return 0.9
+        grams = grams if grams is not None else _grams(name)
+        score = 2.0 * len(grams & self.grams[i]) / (len(grams) + len(self.grams[i]))
+        short, long = (name, other) if len(name) < len(other) else (other, name)
+        if len(short) >= _MIN_PREFIX and long.startswith(short):
+            score = max(score, 0.9)
+        return score
+
+    def match(self, symbol: str, name: str) -> tuple:
+        """
+        Best listing for one Bloomberg symbol
+
+        Returns:
+            (row index or None, confidence, method)
+        """
+        compact = compact_name(name)
+        skeleton = skeleton_name(name)
+        grams = _grams(compact)
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self.postings.get(gram, ()))
+        # Rank candidates by Dice overlap, then score the best few in full
+        ranked = heapq.nlargest(_CANDIDATES, overlap,
+                                key=lambda i: overlap[i] / (len(grams) + len(self.grams[i])))
+        best, best_score = None, 0.0
+        for i in ranked:
+            score = self.name_score(compact, i, grams, skeleton)
+            if score > best_score:
+                best, best_score = i, score
+        by_name = best_score * 0.9
+
+        i = self.by_nse.get(bare_symbol(symbol))
+        if i is not None:
+            score = self.name_score(compact, i, grams, skeleton)
+            by_code = 1.0 if score >= 0.5 else 0.85 + 0.3 * score
+            if by_code >= by_name or best is None:
+                return i, round(by_code, 3), "nse_code"
+        if best is None:
+            return None, 0.0, "none"
+        return best, round(by_name, 3), "name"
+
+
+class ListingMap:
+    """Bloomberg ticker → NSE/BSE listing and industry, with hash lookups"""
+
+    def __init__(self, entries: dict, universe: SymbolUniverse = None):
+        """
+        Use ListingMap.load() rather than calling this directly.
+
+        Args:
+            entries: {ticker: match dict keyed 'symbol' by bare code} in universe order
+            universe: The SymbolUniverse the tickers came from
+        """
+        self.entries = entries
+        self.universe = universe
+        self.stats = {}
+        self._index()
+
+    def _index(self) -> None:
+        self.by_symbol = {}
+        self.by_group = {}
+        self.by_industry = {}
+        for ticker, entry in self.entries.items():
+            self.by_symbol[entry['symbol']] = entry
+            if entry['confidence'] < MIN_CONFIDENCE:
+                continue
+            if entry['industry_group']:
+                self.by_group.setdefault(entry['industry_group'], []).append(entry['symbol'])
+            if entry['industry']:
+                self.by_industry.setdefault(entry['industry'], []).append(entry['symbol'])
+        self._lookup = {name.upper(): symbols
+                        for table in (self.by_industry, self.by_group)
+                        for name, symbols in table.items()}
+
+    @staticmethod
+    def cache_path(universe_csv=DEFAULT_CSV) -> Path:
+        return Path(universe_csv).parent / ".cache" / "listing_map.json"
+
+    @classmethod
+    def load(cls, universe_csv=DEFAULT_CSV, listings_csv=DEFAULT_LISTINGS) -> "ListingMap":
+        """
+        Load the map, matching only what changed since it was last saved
+
+        Args:
+            universe_csv: Bloomberg symbol CSV
+            listings_csv: NSE/BSE listings CSV (query-results.csv)
+
+        Returns:
+            ListingMap; .stats says how many tickers were matched vs reused
+        """
+        universe = SymbolUniverse.load(universe_csv)
+        listings_path = Path(listings_csv)
+        cache = cls.cache_path(universe_csv)
+        try:
+            state = json.loads(cache.read_text(encoding="utf-8"))
+            if state.get('version') != CACHE_VERSION:
+                state = None
+        except (OSError, ValueError):
+            state = None
+
+        old = state['entries'] if state else {}
+        listings_source = _stat(listings_path)
+        touched = state is None or state['listings'] != listings_source
+        listings_changed = touched
+        if touched and state is not None and state['listings_sha1'] == _sha1(listings_path):
+            listings_changed = False
+
+        listings = None
+        entries, matched, reused = {}, 0, 0
+        for row, ticker in enumerate(universe.tickers):
+            symbol, name = universe.symbols[row], universe.names[row]
+            entry = old.get(ticker)
+            fresh = entry is not None and entry['name'] == name
+            if fresh and listings_changed:
+                # Keep the match only if its listing is still there; pick up new industries
+                listings = listings or Listings(listings_path)
+                i = listings.find(entry) if entry['confidence'] >= MIN_CONFIDENCE else None
+                if i is None:
+                    fresh = False
+                else:
+                    entry.update(listings.rows[i])
+            if fresh:
+                entries[ticker] = entry
+                reused += 1
+                continue
+
+            listings = listings or Listings(listings_path)
+            i, confidence, method = listings.match(symbol, name)
+            entry = {'symbol': symbol, 'name': name, 'confidence': confidence, 'method': method,
+                     'listing': None, 'nse': None, 'bse': None,
+                     'industry_group': None, 'industry': None}
+            if i is not None:
+                entry.update(listings.rows[i])
+            entries[ticker] = entry
+            matched += 1
+
+        if matched or touched or len(entries) != len(old):
+            cls._save(cache, {
+                'version': CACHE_VERSION,
+                'listings': listings_source,
+                'listings_sha1': _sha1(listings_path),
+                'entries': entries,
+            })
+
+        listing_map = cls(entries, universe)
+        listing_map.stats = {'matched': matched, 'reused': reused}
+        return listing_map
+
+    @staticmethod
+    def _save(cache: Path, state: dict) -> None:
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(tmp, cache)
+        except OSError:
+            pass
+
+    def get(self, symbol: str):
+        """Match dict for a symbol ("HDFCB", "HDFCB IN") or ticker ("HDFCB IN Equity"), or None"""
+        if symbol in self.entries:
+            return self.entries[symbol]
+        return self.by_symbol.get(bare_symbol(symbol))
+
+    def industry_of(self, symbol: str):
+        """(Industry Group, Industry) of a confidently matched symbol, or None"""
+        entry = self.get(symbol)
+        if entry is None or entry['confidence'] < MIN_CONFIDENCE:
+            return None
+        return entry['industry_group'], entry['industry']
+
+    def groups(self) -> dict:
+        """{Industry Group: number of symbols}, largest first"""
+        return dict(sorted(((g, len(s)) for g, s in self.by_group.items()),
+                           key=lambda item: (-item[1], item[0])))
+
+    def select(self, names) -> list:
+        """
+        Symbols in any of the given industry groups or industries
+
+        Args:
+            names: Industry Group / Industry names (case-insensitive) or one name
+
+        Returns:
+            Bare symbols ("HDFCB", as --symbols takes them) in universe order
+            (largest market cap first)
+
+        Raises:
+            KeyError: A name is neither an industry group nor an industry
+        """
+        if isinstance(names, str):
+            names = [names]
+        wanted = set()
+        for name in names:
+            symbols = self._lookup.get(name.strip().upper())
+            if symbols is None:
+                raise KeyError(f"Unknown industry or industry group: {name}")
+            wanted.update(symbols)
+        return [entry['symbol'] for entry in self.entries.values() if entry['symbol'] in wanted]
@@ -0,0 +1,224 @@
+"""
+Download Metrics
+================
+Per-stage timings, written bytes and an outcome code for every symbol, so a
+slow night can be pinned on the step that was slow.
+
+Stages (seconds, monotonic clock):
+
+    patch        write the per-symbol / pack workbook from the template
+    open         get an Excel session and open the workbook (Excel startup included)
+    wait         Bloomberg filling in the formulas
+    copy         read the values back from Excel (COM copy)
+    save_values  write the values-only workbook (only with --formats values)
+    save         book.save of the workbook with formulas
+    csv          to_csv of the in-memory values
+    parse        highlights_parser on the in-memory values
+    snapshot     fingerprint and delta against the last snapshot
+    history      revised values into the point-in-time history store
+    store        Parquet store append
+
+open and wait are shared by every symbol in a pack. Outcome codes: ok,
+timeout, invalid_security, excel_error.
+
+The batch runner appends one JSON line per symbol to
+<metrics dir>/downloads.jsonl and rewrites a Prometheus textfile-collector
+file (bloomberg_download.prom) at the end of every run. Recording costs a
+couple of perf_counter() calls per stage.
+
+Usage:
+    with timed(stages, "wait"):
+        ...
+    sink = MetricsSink("output/metrics")
+    sink.add(records)
+    sink.close()
+    print(sink.percentiles())
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from refresh_backends import INVALID_SECURITY
+
+
+STAGES = ("patch", "open", "wait", "copy", "save_values", "save", "csv", "parse", "snapshot",
+          "history", "store")
+
+OK = "ok"
+TIMEOUT = "timeout"
+INVALID = "invalid_security"
+EXCEL_ERROR = "excel_error"
+OUTCOMES = (OK, TIMEOUT, INVALID, EXCEL_ERROR)
+
+QUANTILES = (0.5, 0.95, 0.99)
+PROM_FILE = "bloomberg_download.prom"
+
+
+@contextmanager
+def timed(stages: dict, name: str):
+    """Add the time spent in the with-block to stages[name]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def outcome_code(error) -> str:
+    """Outcome code for a downloader error message (None: success)"""
+    if not error:
+        return OK
+    if error == INVALID_SECURITY:
+        return INVALID
+    if error.endswith("still requesting data"):
+        return TIMEOUT
+    return EXCEL_ERROR
+
+
+def file_sizes(paths: dict) -> dict:
+    """{name: bytes} of the given files that exist"""
+    sizes = {}
+    for name, path in paths.items():
+        try:
+            sizes[name] = os.path.getsize(path)
+        except (OSError, TypeError):
+            pass
+    return sizes
+
+
+def record(symbol: str, error, stages: dict, sizes: dict = None) -> dict:
+    """One symbol's metrics record"""
+    stages = {name: round(seconds, 6) for name, seconds in stages.items()}
+    return {
+        'ts': round(time.time(), 3),
+        'symbol': symbol,
+        'outcome': outcome_code(error),
+        'error': error or None,
+        'seconds': round(sum(stages.values()), 6),
+        'stages': stages,
+        'bytes': sizes or {},
+    }
+
+
+def format_stages(stages: dict) -> str:
+    """"patch 0.05s · open 1.20s · ..." in STAGES order"""
+    return " · ".join(f"{name} {stages[name]:.2f}s" for name in STAGES if name in stages)
+
+
+def percentiles(records: list) -> dict:
+    """
+    Stage time percentiles over metrics records
+
+    Returns:
+        {stage: {'count', 'p50', 'p95', 'p99', 'sum'}} in STAGES order, plus 'total'
+    """
+    values = {}
+    for item in records:
+        for name, seconds in item['stages'].items():
+            values.setdefault(name, []).append(seconds)
+        values.setdefault('total', []).append(item['seconds'])
+    import numpy as np
+
+    report = {}
+    for name in [name for name in STAGES + ('total',) if name in values]:
+        array = np.asarray(values[name], dtype="float64")
+        p50, p95, p99 = np.percentile(array, [q * 100 for q in QUANTILES])
+        report[name] = {'count': len(array), 'p50': float(p50), 'p95': float(p95),
+                        'p99': float(p99), 'sum': float(array.sum())}
+    return report
+
+
+def load_records(path) -> list:
+    """Metrics records from a downloads.jsonl file"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class MetricsSink:
+    """Collects records of a run; JSON lines as they come, Prometheus file on close"""
+
+    def __init__(self, directory, prom_file: str = PROM_FILE):
+        """
+        Args:
+            directory: Where downloads.jsonl and the .prom file go
+            prom_file: Prometheus textfile-collector file name
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.jsonl_path = self.directory / "downloads.jsonl"
+        self.prom_path = self.directory / prom_file
+        self._jsonl = open(self.jsonl_path, "a", encoding="utf-8")
+        self.records = []
+        self.started = time.time()
+
+    def add(self, records) -> None:
+        """Keep records and append them to the JSON lines file"""
+        for item in records or ():
+            self.records.append(item)
+            self._jsonl.write(json.dumps(item) + "\n")
+        self._jsonl.flush()
+
+    def counts(self) -> dict:
+        """{outcome: number of symbols}"""
+        counts = dict.fromkeys(OUTCOMES, 0)
+        for item in self.records:
+            counts[item['outcome']] = counts.get(item['outcome'], 0) + 1
+        return counts
+
+    def percentiles(self) -> dict:
+        """{stage: {'count', 'p50', 'p95', 'p99', 'sum'}} over every record, plus 'total'"""
+        return percentiles(self.records)
+
+    def write_prometheus(self) -> Path:
+        """Atomically rewrite the textfile-collector file for this run"""
+        lines = [
+            "# HELP bloomberg_download_symbols Symbols processed in the last batch by outcome",
+            "# TYPE bloomberg_download_symbols gauge",
+        ]
+        lines += [f'bloomberg_download_symbols{{outcome="{outcome}"}} {count}'
+                  for outcome, count in self.counts().items()]
+
+        lines += [
+            "# HELP bloomberg_download_stage_seconds Per-symbol stage time in the last batch",
+            "# TYPE bloomberg_download_stage_seconds summary",
+        ]
+        for stage, stats in self.percentiles().items():
+            for q in QUANTILES:
+                lines.append(f'bloomberg_download_stage_seconds{{stage="{stage}",quantile="{q}"}} '
+                             f'{stats[f"p{round(q * 100)}"]:.6f}')
+            lines.append(f'bloomberg_download_stage_seconds_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+            lines.append(f'bloomberg_download_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+
+        written = {}
+        for item in self.records:
+            for name, size in item['bytes'].items():
+                written[name] = written.get(name, 0) + size
+        lines += [
+            "# HELP bloomberg_download_bytes Bytes written in the last batch by file kind",
+            "# TYPE bloomberg_download_bytes gauge",
+        ]
+        lines += [f'bloomberg_download_bytes{{file="{name}"}} {size}'
+                  for name, size in sorted(written.items())]
+
+        lines += [
+            "# HELP bloomberg_download_last_run_timestamp_seconds When the last batch finished",
+            "# TYPE bloomberg_download_last_run_timestamp_seconds gauge",
+            f"bloomberg_download_last_run_timestamp_seconds {time.time():.3f}",
+            "# HELP bloomberg_download_last_run_duration_seconds How long the last batch took",
+            "# TYPE bloomberg_download_last_run_duration_seconds gauge",
+            f"bloomberg_download_last_run_duration_seconds {time.time() - self.started:.3f}",
+        ]
+
+        # The collector may read at any moment: never let it see a half-written file
+        tmp = self.prom_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, self.prom_path)
+        return self.prom_path
+
+    def close(self) -> None:
+        """Close the JSON lines file and write the Prometheus file"""
+        self._jsonl.close()
+        self.write_prometheus()
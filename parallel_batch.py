@@ -0,0 +1,210 @@
+"""
+Parallel Batch Executor
+=======================
+Run symbol packs on several refresh workers at once.
+
+Each worker is a separate process with its own BloombergDataDownloader,
+its own refresh backend (so its own Excel instance with the excel backend)
+and its own temp directory under <output_dir>/.workers/worker-NN. Final
+output files still land in output_dir. Worker console output goes to
+worker.log in the worker's temp directory; the parent prints one progress
+line per finished pack.
+
+All workers draw data hits from one shared RateLimiter, so the configured
+per-minute and daily limits hold for the batch as a whole.
+
+Usage (see batch_download.py --workers):
+    config = worker_config(template, output_dir, backend="fake")
+    for outcome in run_parallel(packs, config, workers=4, limiter=limiter):
+        ...
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import util
+from pathlib import Path
+
+from download_bloomberg_data import BloombergDataDownloader
+from history_store import HistoryStore
+from parquet_store import ParquetStore
+from rate_limiter import RateLimitExceeded
+from refresh_backends import make_backend
+from snapshot_store import SnapshotStore
+
+
+# Per-process worker state, filled in by _init_worker
+_worker = {}
+
+
+def worker_config(template_path, output_dir, backend: str = "excel", backend_options: dict = None,
+                  formats=("xlsx", "csv"), store: str = None, wait_seconds: float = 15,
+                  hits_per_symbol: int = 0, snapshots: str = None,
+                  write_unchanged: bool = False, history: str = None, fields: str = None) -> dict:
+    """
+    Everything a worker process needs to build its own downloader
+
+    Args:
+        template_path: Bloomberg Excel template
+        output_dir: Directory for the final output files
+        backend: Refresh backend name (see refresh_backends.BACKENDS)
+        backend_options: Keyword arguments for make_backend
+        formats: Per-symbol files to write
+        store: Parquet store directory, or None
+        wait_seconds: Maximum seconds to wait for each refresh
+        hits_per_symbol: Data hits charged to the rate limiter per symbol
+        snapshots: Snapshot store file shared by the workers, or None
+        write_unchanged: Write per-symbol files even when nothing changed
+        history: History store directory, or None
+        fields: --fields selection of line items, or None for the whole template
+
+    Returns:
+        Plain dict, safe to send to spawned processes
+    """
+    return {
+        'template': str(template_path),
+        'output_dir': str(output_dir),
+        'backend': backend,
+        'backend_options': dict(backend_options or {}),
+        'formats': tuple(formats),
+        'store': str(store) if store else None,
+        'wait': wait_seconds,
+        'hits_per_symbol': hits_per_symbol,
+        'snapshots': str(snapshots) if snapshots else None,
+        'write_unchanged': write_unchanged,
+        'history': str(history) if history else None,
+        'fields': fields,
+    }
+
+
+def _init_worker(config: dict, limiter, counter) -> None:
+    """Process initializer: number the worker and start its own downloader"""
+    with counter.get_lock():
+        counter.value += 1
+        number = counter.value
+
+    temp_dir = Path(config['output_dir']) / ".workers" / f"worker-{number:02d}"
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    log = open(temp_dir / "worker.log", "a", encoding="utf-8", buffering=1)
+    sys.stdout = sys.stderr = log
+
+    _worker.update(number=number, limiter=limiter, config=config, downloader=None, error=None)
+    try:
+        downloader = BloombergDataDownloader(
+            template_path=config['template'],
+            output_dir=config['output_dir'],
+            backend=make_backend(config['backend'], **config['backend_options']),
+            formats=config['formats'],
+            store=ParquetStore(config['store']) if config['store'] else None,
+            temp_dir=temp_dir,
+            snapshots=SnapshotStore(config['snapshots']) if config['snapshots'] else None,
+            write_unchanged=config['write_unchanged'],
+            history=HistoryStore(config['history']) if config['history'] else None,
+            fields=config['fields'],
+        )
+    except Exception as e:
+        print(f"❌ Worker {number} failed to start: {e}")
+        _worker['error'] = f"worker {number} failed to start: {e}"
+        return
+    _worker['downloader'] = downloader
+    # Quit this worker's Excel and flush its store when the pool shuts down
+    util.Finalize(downloader, downloader.close, exitpriority=10)
+
+
+def _run_pack(pack: list) -> dict:
+    """Refresh one pack in this worker and report what happened"""
+    number = _worker['number']
+    outcome = {
+        'worker': number, 'pid': os.getpid(), 'symbols': pack,
+        'results': [None] * len(pack), 'errors': [_worker['error']] * len(pack),
+        'error': _worker['error'], 'rate_limited': False,
+        'throttled': 0.0, 'elapsed': 0.0, 'pool': None, 'metrics': [],
+    }
+    downloader = _worker['downloader']
+    if downloader is None:
+        return outcome
+
+    config = _worker['config']
+    limiter = _worker['limiter']
+    start = time.monotonic()
+    try:
+        if limiter is not None:
+            outcome['throttled'] = limiter.acquire(config['hits_per_symbol'] * len(pack))
+    except RateLimitExceeded as e:
+        outcome.update(error=str(e), errors=[str(e)] * len(pack), rate_limited=True)
+        return outcome
+
+    print(f"\n{'='*60}")
+    print(f"Worker {number}: {', '.join(pack)}")
+    print(f"{'='*60}\n")
+    try:
+        if len(pack) == 1:
+            outcome['results'] = [downloader.download_data(pack[0], wait_seconds=config['wait'])]
+        else:
+            outcome['results'] = downloader.download_pack(pack, wait_seconds=config['wait'])
+    except Exception as e:
+        print(f"❌ Failed to download {', '.join(pack)}: {e}")
+        outcome['error'] = str(e)
+    outcome['errors'] = [
+        None if result else (downloader.errors.get(symbol) or outcome['error'] or "download failed")
+        for symbol, result in zip(pack, outcome['results'])
+    ]
+
+    outcome['elapsed'] = time.monotonic() - start
+    outcome['metrics'] = downloader.drain_metrics()
+    pool = downloader.backend.pool
+    outcome['pool'] = dict(pool.stats) if pool is not None else None
+    return outcome
+
+
+def run_parallel(packs: list, config: dict, workers: int, limiter=None):
+    """
+    Refresh packs on a pool of worker processes
+
+    Once the daily data-hit limit is hit, packs that have not started are
+    cancelled and reported as failed with rate_limited set.
+
+    Args:
+        packs: Lists of symbols; each list is refreshed together
+        config: From worker_config()
+        workers: Number of worker processes
+        limiter: Shared RateLimiter, or None for no throttling
+
+    Yields:
+        One outcome dict per pack, in completion order, with 'worker',
+        'symbols', 'results' (paths dict or None per symbol), 'errors'
+        (failure message or None per symbol), 'error' (for the whole pack),
+        'rate_limited', 'throttled', 'elapsed', the worker's 'pool' stats
+        and per-symbol 'metrics' records
+    """
+    workers = max(1, min(workers, len(packs)))
+    counter = multiprocessing.Value("i", 0)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(config, limiter, counter)) as executor:
+        futures = {executor.submit(_run_pack, pack): pack for pack in packs}
+        exhausted = None
+        for future in as_completed(futures):
+            pack = futures[future]
+            if future.cancelled():
+                yield _unstarted(pack, exhausted)
+                continue
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = _unstarted(pack, f"worker crashed: {e}")
+                outcome['rate_limited'] = False
+            if outcome['rate_limited'] and exhausted is None:
+                exhausted = outcome['error']
+                for other in futures:
+                    other.cancel()
+            yield outcome
+
+
+def _unstarted(pack: list, error: str) -> dict:
+    return {
+        'worker': None, 'pid': None, 'symbols': pack, 'results': [None] * len(pack),
+        'errors': [error] * len(pack), 'error': error, 'rate_limited': True,
+        'throttled': 0.0, 'elapsed': 0.0, 'pool': None, 'metrics': [],
+    }
@@ -0,0 +1,221 @@
+"""
+Partitioned Parquet Store
+=========================
+One columnar dataset for every refresh instead of three timestamped files
+per symbol.
+
+Layout (hive partitioning):
+
+    store/run_date=2025-01-31/bucket=07/part-<uuid>.parquet
+
+Rows are the long table from highlights_parser plus an `as_of` timestamp
+(when the refresh ran). Symbols are spread over a fixed number of buckets by
+a stable hash, so a symbol filter only touches one bucket directory. Text
+columns are dictionary-encoded. Rows are deduplicated on
+(symbol, mnemonic, label, fiscal_period, as_of) when written and again when
+read, so re-running a refresh never double counts.
+
+Requires pyarrow (pip install pyarrow).
+
+Usage:
+    store = ParquetStore("./store")
+    store.append(long_table, as_of=datetime.now())
+    store.flush()
+    df = store.read(columns=["symbol", "value"], symbols=["HDFCB"], mnemonics=["EBITDA"])
+"""
+
+import uuid
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ds = pq = None
+
+
+# The row identity; label separates e.g. "EBITDA, Adj" from its "Margin %" row
+KEY_COLUMNS = ["symbol", "mnemonic", "label", "fiscal_period", "as_of"]
+DICTIONARY_COLUMNS = ["symbol", "mnemonic", "label", "fiscal_period"]
+
+
+def symbol_bucket(symbol: str, buckets: int) -> int:
+    """Stable bucket number for a symbol"""
+    return zlib.crc32(symbol.encode("utf-8")) % buckets
+
+
+class ParquetStore:
+    """Append-only, partitioned Parquet dataset of refreshed values"""
+
+    def __init__(self, root, buckets: int = 16, flush_rows: int = 50_000):
+        """
+        Args:
+            root: Directory holding the dataset
+            buckets: Number of symbol buckets per run date
+            flush_rows: Buffered rows that trigger a write
+        """
+        if pa is None:
+            raise ImportError("The Parquet store needs pyarrow: pip install pyarrow")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.buckets = buckets
+        self.flush_rows = flush_rows
+        self._pending = []
+        self._pending_rows = 0
+
+    def append(self, table: pd.DataFrame, as_of: datetime = None) -> None:
+        """
+        Buffer one refresh's long table; written on flush()
+
+        Args:
+            table: Long table from highlights_parser
+            as_of: When the refresh ran (default: now)
+        """
+        if table is None or table.empty:
+            return
+        frame = table.copy()
+        frame["as_of"] = pd.Timestamp(as_of or datetime.now())
+        self._pending.append(frame)
+        self._pending_rows += len(frame)
+        if self._pending_rows >= self.flush_rows:
+            self.flush()
+
+    def flush(self) -> list:
+        """
+        Write buffered rows, one file per (run date, bucket) partition
+
+        Returns:
+            Paths of the files written
+        """
+        if not self._pending:
+            return []
+        frame = pd.concat(self._pending, ignore_index=True)
+        self._pending, self._pending_rows = [], 0
+
+        frame = frame.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+        frame["run_date"] = frame["as_of"].dt.strftime("%Y-%m-%d")
+        symbols = frame["symbol"].astype(str)
+        bucket_of = {s: symbol_bucket(s, self.buckets) for s in symbols.unique()}
+        frame["bucket"] = symbols.map(bucket_of)
+
+        written = []
+        for (run_date, bucket), part in frame.groupby(["run_date", "bucket"], observed=True):
+            directory = self.root / f"run_date={run_date}" / f"bucket={bucket:02d}"
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"part-{uuid.uuid4().hex}.parquet"
+            self._write(part.drop(columns=["run_date", "bucket"]), path)
+            written.append(path)
+        return written
+
+    def _write(self, frame: pd.DataFrame, path: Path) -> None:
+        for column in DICTIONARY_COLUMNS:
+            frame[column] = frame[column].astype(str).astype("category")
+        # Sorted files make row-group statistics useful for range filters
+        frame = frame.sort_values(["symbol", "mnemonic", "period_end"], kind="stable")
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        pq.write_table(table, path, use_dictionary=DICTIONARY_COLUMNS, compression="zstd")
+
+    def close(self) -> None:
+        """Write anything still buffered"""
+        self.flush()
+
+    def dataset(self):
+        """The pyarrow dataset over every partition"""
+        partitioning = ds.partitioning(
+            pa.schema([("run_date", pa.string()), ("bucket", pa.int32())]), flavor="hive"
+        )
+        return ds.dataset(self.root, format="parquet", partitioning=partitioning)
+
+    def read(self, columns: list = None, symbols: list = None, mnemonics: list = None,
+             start=None, end=None, estimates: bool = None, filter=None,
+             dedupe: bool = True) -> pd.DataFrame:
+        """
+        Read rows with column and predicate pushdown
+
+        Args:
+            columns: Columns to return (default: all data columns)
+            symbols: Only these symbols (also prunes bucket directories)
+            mnemonics: Only these field mnemonics
+            start: Earliest run date, or as_of if a datetime (inclusive)
+            end: Latest run date, or as_of if a datetime (inclusive)
+            estimates: True for estimates only, False for actuals only
+            filter: Extra pyarrow.dataset expression ANDed with the above
+            dedupe: Drop rows repeated across files (same refresh written twice)
+
+        Returns:
+            DataFrame of matching rows
+        """
+        if not any(self.root.glob("run_date=*")):
+            return pd.DataFrame(columns=columns or KEY_COLUMNS)
+
+        expr = None
+
+        def both(a, b):
+            return b if a is None else a & b
+
+        if symbols:
+            buckets = sorted({symbol_bucket(s, self.buckets) for s in symbols})
+            expr = both(expr, ds.field("bucket").isin(buckets))
+            expr = both(expr, ds.field("symbol").isin(list(symbols)))
+        if mnemonics:
+            expr = both(expr, ds.field("mnemonic").isin(list(mnemonics)))
+        # Dates and strings select whole run dates; datetimes also cut on as_of
+        if start is not None:
+            expr = both(expr, ds.field("run_date") >= _day(start))
+            if isinstance(start, datetime):
+                expr = both(expr, ds.field("as_of") >= pa.scalar(start))
+        if end is not None:
+            expr = both(expr, ds.field("run_date") <= _day(end))
+            if isinstance(end, datetime):
+                expr = both(expr, ds.field("as_of") <= pa.scalar(end))
+        if estimates is not None:
+            expr = both(expr, ds.field("is_estimate") == estimates)
+        if filter is not None:
+            expr = both(expr, filter)
+
+        wanted = list(columns) if columns else None
+        read_columns = wanted
+        if wanted and dedupe:
+            read_columns = list(dict.fromkeys(wanted + KEY_COLUMNS))
+
+        table = self.dataset().to_table(columns=read_columns, filter=expr)
+        frame = table.to_pandas()
+        if dedupe and not frame.empty:
+            frame = frame.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+        if wanted:
+            frame = frame[wanted]
+        return frame.reset_index(drop=True)
+
+    def compact(self, run_date: str = None) -> int:
+        """
+        Merge each partition's files into one, deduplicated
+
+        Args:
+            run_date: Only compact this run date ("YYYY-MM-DD"; default: all)
+
+        Returns:
+            Number of partitions rewritten
+        """
+        pattern = f"run_date={run_date}/bucket=*" if run_date else "run_date=*/bucket=*"
+        rewritten = 0
+        for directory in sorted(self.root.glob(pattern)):
+            files = sorted(directory.glob("*.parquet"), key=lambda p: p.stat().st_mtime)
+            if len(files) < 2:
+                continue
+            frame = pd.concat([pq.read_table(f).to_pandas() for f in files], ignore_index=True)
+            frame = frame.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+            self._write(frame, directory / f"part-{uuid.uuid4().hex}.parquet")
+            for f in files:
+                f.unlink()
+            rewritten += 1
+        return rewritten
+
+
+def _day(value) -> str:
+    """Run-date partition value for a date, datetime or string"""
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
@@ -0,0 +1,217 @@
+"""
+Staged Refresh Pipeline
+=======================
+Overlap template preparation, Excel refresh and export in one process.
+
+    prepare ──queue──▶ refresh ──queue──▶ export
+
+- prepare: writes the per-symbol (or pack) workbook    (background thread)
+- refresh: opens it in Excel and waits for Bloomberg   (calling thread)
+- export:  CSV / Parquet store / cleanup of temp files (background thread)
+
+So while symbol i refreshes, symbol i+1's workbook is being written and
+symbol i-1's values exported. Refresh stays on the calling thread because
+Excel COM objects must be used from the thread that created them. The
+queues are bounded: prepare stops getting ahead once `depth` workbooks wait
+for Excel, so temp files never pile up.
+
+Usage (see batch_download.py --pipeline):
+    pipeline = Pipeline(downloader, wait_seconds=15)
+    for outcome in pipeline.run(packs):
+        ...
+    print(pipeline.report())
+"""
+
+import queue
+import threading
+import time
+
+from rate_limiter import RateLimitExceeded
+
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class StageStats:
+    """Busy time and input queue depth of one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.depth_max = 0
+
+    def sample(self, depth: int) -> None:
+        """Record the stage's input queue depth when it takes an item"""
+        self.depth_samples += 1
+        self.depth_total += depth
+        self.depth_max = max(self.depth_max, depth)
+
+    def as_dict(self, wall: float) -> dict:
+        return {
+            'stage': self.name,
+            'items': self.items,
+            'busy': self.busy,
+            'utilisation': self.busy / wall if wall > 0 else 0.0,
+            'queue_avg': self.depth_total / self.depth_samples if self.depth_samples else 0.0,
+            'queue_max': self.depth_max,
+        }
+
+
+class Pipeline:
+    """Three-stage prepare → refresh → export pipeline around one downloader"""
+
+    def __init__(self, downloader, wait_seconds: int = 15, depth: int = 2,
+                 limiter=None, hits_per_symbol: int = 0):
+        """
+        Args:
+            downloader: BloombergDataDownloader providing the stage methods
+            wait_seconds: Maximum seconds to wait for each refresh
+            depth: Jobs each queue may hold before the stage feeding it blocks
+            limiter: Shared RateLimiter, or None for no throttling
+            hits_per_symbol: Data hits charged to the limiter per symbol
+        """
+        self.downloader = downloader
+        self.wait_seconds = wait_seconds
+        self.depth = max(1, depth)
+        self.limiter = limiter
+        self.hits_per_symbol = hits_per_symbol
+        self.stats = {name: StageStats(name) for name in ('prepare', 'refresh', 'export')}
+        self.wall = 0.0
+
+    def run(self, packs: list):
+        """
+        Push packs through the pipeline
+
+        Args:
+            packs: Lists of symbols; each list is refreshed together
+
+        Yields:
+            One outcome dict per pack, in completion order, shaped like
+            parallel_batch.run_parallel's
+        """
+        # Compile once up front so the prepare thread never races on it
+        self.downloader.compile_template()
+        to_refresh = queue.Queue(maxsize=self.depth)
+        to_export = queue.Queue(maxsize=self.depth)
+        finished = queue.Queue()
+        stop = threading.Event()
+
+        prepare = threading.Thread(target=self._prepare, name="pipeline-prepare",
+                                   args=(packs, to_refresh, finished, stop), daemon=True)
+        export = threading.Thread(target=self._export, name="pipeline-export",
+                                  args=(to_export, finished), daemon=True)
+        start = time.monotonic()
+        prepare.start()
+        export.start()
+
+        stopped = None
+        stats = self.stats['refresh']
+        while True:
+            job = to_refresh.get()
+            if job is _DONE:
+                break
+            stats.sample(to_refresh.qsize())
+            if stopped is None:
+                began = time.monotonic()
+                try:
+                    if self.limiter is not None:
+                        job['throttled'] = self.limiter.acquire(
+                            self.hits_per_symbol * len(job['symbols']))
+                except RateLimitExceeded as e:
+                    print(f"🛑 {e}; stopping")
+                    stopped = str(e)
+                    stop.set()
+                if stopped is None:
+                    busy_from = time.monotonic()
+                    try:
+                        self.downloader.refresh_job(job, self.wait_seconds)
+                    except Exception as e:
+                        print(f"❌ Failed to refresh {', '.join(job['symbols'])}: {e}")
+                        job['error'] = str(e)
+                    stats.busy += time.monotonic() - busy_from
+                    stats.items += 1
+                job['elapsed'] = time.monotonic() - began
+            if stopped is not None:
+                job['error'] = stopped
+                job['rate_limited'] = True
+            to_export.put(job)
+            yield from _drain(finished)
+
+        to_export.put(_DONE)
+        export.join()
+        prepare.join()
+        yield from _drain(finished)
+        self.wall = time.monotonic() - start
+
+    def _prepare(self, packs, to_refresh, finished, stop) -> None:
+        stats = self.stats['prepare']
+        for pack in packs:
+            if stop.is_set():
+                finished.put(_outcome({'symbols': pack}, [None] * len(pack),
+                                      "not started: daily data-hit limit reached", True))
+                continue
+            began = time.monotonic()
+            try:
+                job = self.downloader.prepare_job(pack)
+            except Exception as e:
+                print(f"❌ Failed to prepare {', '.join(pack)}: {e}")
+                finished.put(_outcome({'symbols': pack}, [None] * len(pack), str(e)))
+                continue
+            finally:
+                stats.busy += time.monotonic() - began
+                stats.items += 1
+            # Blocks while `depth` workbooks are already waiting for Excel
+            to_refresh.put(job)
+        to_refresh.put(_DONE)
+
+    def _export(self, to_export, finished) -> None:
+        stats = self.stats['export']
+        while True:
+            job = to_export.get()
+            if job is _DONE:
+                break
+            stats.sample(to_export.qsize())
+            began = time.monotonic()
+            try:
+                results = self.downloader.finish_job(job)
+            except Exception as e:
+                print(f"❌ Failed to export {', '.join(job['symbols'])}: {e}")
+                results = [None] * len(job['symbols'])
+                job.setdefault('error', str(e))
+            stats.busy += time.monotonic() - began
+            stats.items += 1
+            outcome = _outcome(job, results, job.get('error'), job.get('rate_limited', False))
+            # Hand the stage records on as run_sequential does; the downloader keeps none back
+            outcome['metrics'] = self.downloader.drain_metrics()
+            pool = self.downloader.backend.pool
+            outcome['pool'] = dict(pool.stats) if pool is not None else None
+            finished.put(outcome)
+
+    def report(self) -> list:
+        """Per-stage items, busy seconds, utilisation and queue depth of the last run"""
+        return [stats.as_dict(self.wall) for stats in self.stats.values()]
+
+
+def _outcome(job: dict, results: list, error: str = None, rate_limited: bool = False) -> dict:
+    errors = job.get('errors') or {}
+    return {
+        'worker': 1, 'symbols': job['symbols'], 'results': results,
+        'errors': [None if result else (errors.get(symbol) or error or "download failed")
+                   for symbol, result in zip(job['symbols'], results)],
+        'error': error, 'rate_limited': rate_limited,
+        'throttled': job.get('throttled', 0.0), 'elapsed': job.get('elapsed', 0.0), 'pool': None,
+        'metrics': [],
+    }
+
+
+def _drain(finished):
+    """Yield every outcome already finished, without waiting"""
+    while True:
+        try:
+            yield finished.get_nowait()
+        except queue.Empty:
+            return
@@ -0,0 +1,169 @@
+"""
+Bloomberg Data-Hit Rate Limiter
+===============================
+Token bucket shared by every refresh worker process.
+
+Bloomberg meters Excel/API usage in data hits (roughly one per security and
+field) with both a short-term and a daily allowance. The bucket refills
+continuously at `per_minute / 60` hits per second up to `per_minute`, and a
+separate counter caps the total spent per calendar day. State lives in
+multiprocessing shared memory, so one limiter created in the parent process
+and handed to the workers (e.g. as a ProcessPoolExecutor initializer
+argument) throttles them all together.
+
+With a state_path the day's count outlives the run: it is loaded when the
+limiter is created and written back by close(), so a second batch on the
+same day starts from what the first one spent.
+
+Usage:
+    limiter = RateLimiter(per_minute=5000, per_day=500_000, state_path="output/data_hits.json")
+    limiter.acquire(106)    # blocks until 106 hits are available
+    limiter.close()         # today's count → data_hits.json
+"""
+
+import json
+import multiprocessing
+import time
+from datetime import date
+from pathlib import Path
+
+
+class RateLimitExceeded(RuntimeError):
+    """The daily data-hit allowance is used up"""
+
+
+class RateLimiter:
+    """Process-safe token bucket with a per-minute rate and a daily cap"""
+
+    def __init__(self, per_minute: float = None, per_day: int = None, context=None,
+                 state_path=None):
+        """
+        Args:
+            per_minute: Sustained data hits per minute, also the burst size (None: unlimited)
+            per_day: Data hits per calendar day (None: unlimited)
+            context: multiprocessing context the workers are started with
+            state_path: JSON file keeping the day's count across runs (None: this run only)
+        """
+        ctx = context or multiprocessing.get_context()
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.state_path = Path(state_path) if state_path else None
+        today = date.today()
+        spent = self._stored(today.isoformat())
+        self._lock = ctx.Lock()
+        self._tokens = ctx.Value("d", float(per_minute or 0), lock=False)
+        self._updated = ctx.Value("d", time.monotonic(), lock=False)
+        self._used_today = ctx.Value("q", spent, lock=False)
+        # Part of _used_today spent by other runs (already in the state file)
+        self._loaded = ctx.Value("q", spent, lock=False)
+        # Part this run spent that close() already wrote back
+        self._saved = ctx.Value("q", 0, lock=False)
+        self._day = ctx.Value("i", today.toordinal(), lock=False)
+        self._waited = ctx.Value("d", 0.0, lock=False)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.per_minute or self.per_day)
+
+    def _refill(self, now: float) -> None:
+        """Top up the bucket and roll the daily counter; caller holds the lock"""
+        if self.per_minute:
+            elapsed = max(0.0, now - self._updated.value)
+            self._tokens.value = min(float(self.per_minute),
+                                     self._tokens.value + elapsed * self.per_minute / 60.0)
+        self._updated.value = now
+        today = date.today().toordinal()
+        if today != self._day.value:
+            self._day.value = today
+            self._used_today.value = 0
+            self._loaded.value = 0
+            self._saved.value = 0
+
+    def try_acquire(self, hits: int = 1) -> float:
+        """
+        Take hits from the bucket without blocking
+
+        Args:
+            hits: Data hits about to be spent
+
+        Returns:
+            0.0 if the hits were taken, otherwise seconds until they should be
+
+        Raises:
+            RateLimitExceeded: The daily allowance cannot cover the request
+        """
+        # A request bigger than the bucket could never fit; let it drain the bucket instead
+        cost = min(float(hits), float(self.per_minute)) if self.per_minute else float(hits)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.per_day is not None and self._used_today.value + hits > self.per_day:
+                raise RateLimitExceeded(
+                    f"Daily data-hit limit reached ({self._used_today.value:,}/{self.per_day:,})"
+                )
+            if self.per_minute and self._tokens.value < cost:
+                return (cost - self._tokens.value) * 60.0 / self.per_minute
+            if self.per_minute:
+                self._tokens.value -= cost
+            self._used_today.value += hits
+            return 0.0
+
+    def acquire(self, hits: int = 1) -> float:
+        """
+        Block until hits are available and take them
+
+        Args:
+            hits: Data hits about to be spent
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            RateLimitExceeded: The daily allowance cannot cover the request
+        """
+        if not self.enabled:
+            return 0.0
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(hits)
+            if delay <= 0:
+                break
+            # Short naps so other workers get a fair go at the bucket
+            nap = min(delay, 1.0)
+            time.sleep(nap)
+            waited += nap
+        if waited:
+            with self._lock:
+                self._waited.value += waited
+        return waited
+
+    def stats(self) -> dict:
+        """Hits spent today (all runs) and by this run, and total seconds workers spent throttled"""
+        with self._lock:
+            return {'used_today': self._used_today.value,
+                    'spent': self._used_today.value - self._loaded.value,
+                    'waited': self._waited.value}
+
+    def close(self) -> None:
+        """Write today's count to state_path, adding what other runs saved meanwhile"""
+        if self.state_path is None or not self.enabled:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            day = date.fromordinal(self._day.value).isoformat()
+            unsaved = self._used_today.value - self._loaded.value - self._saved.value
+            used = self._stored(day) + unsaved
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.state_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({'day': day, 'used': used}))
+            tmp.replace(self.state_path)
+            self._saved.value += unsaved
+
+    def _stored(self, day: str) -> int:
+        """Hits the state file has for day (0 for another day or no file)"""
+        if self.state_path is None:
+            return 0
+        try:
+            state = json.loads(self.state_path.read_text())
+        except (OSError, ValueError):
+            return 0
+        return int(state.get('used', 0)) if state.get('day') == day else 0
@@ -0,0 +1,651 @@
+"""
+Bloomberg Refresh Backends
+==========================
+Everything that talks to the program evaluating the Bloomberg formulas
+lives behind RefreshBackend, so the rest of the downloader never touches
+Excel directly.
+
+- ExcelBackend: opens the workbook in pooled Excel sessions (xlwings) on Windows
+- FakeBackend:  resolves the template's formulas on a schedule, in-process,
+                so refresh and pooling logic can be exercised on Linux
+- ApiBackend:   answers the template's BDH/BDP formulas with batched Bloomberg
+                API requests (bloomberg_api.py), no Excel involved
+
+wait_until_ready() polls an open workbook until every formula cell has
+settled, Bloomberg reports an invalid security, or a hard timeout expires.
+Only cells showing "#N/A Requesting Data..." are waited for: xlwings reads
+Excel errors (#NAME? without the add-in, #DIV/0!) back as None, so blank
+cells cannot hold the refresh until the timeout.
+"""
+
+import math
+import random
+import re
+import time
+import zlib
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from excel_sessions import SessionPool, XlwingsSession, FakeSession
+
+
+# Cell text Bloomberg shows while a request is in flight
+PENDING_MARKERS = ("#N/A Requesting Data",)
+# Settled, but the security itself could not be resolved
+INVALID_SECURITY = "#N/A Invalid Security"
+# Settled, the field does not exist for this security
+FIELD_NOT_APPLICABLE = "#N/A Field Not Applicable"
+
+# The security a formula asks for ("IOCL IN Equity")
+SECURITY_RE = re.compile(r'"([^"]+ Equity)"')
+
+# Readiness outcomes
+READY = "ready"
+TIMEOUT = "timeout"
+INVALID = "invalid_security"
+# Every formula cell stayed blank (e.g. #NAME? because the add-in is not loaded)
+NO_DATA = "no_data"
+
+# Seconds blank formula cells are waited for while nothing has been calculated yet
+BLANK_GRACE = 3.0
+
+
+class SystemClock:
+    """Wall clock used by the real backends"""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class FakeClock:
+    """Virtual clock whose sleep() advances time instantly"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += max(0.0, seconds)
+
+
+class RefreshWorkbook(ABC):
+    """A workbook opened by a backend, with its Bloomberg formulas evaluating"""
+
+    # Set by mark_failed(); the backend recycles the session when the workbook closes
+    failed = False
+
+    def mark_failed(self) -> None:
+        """Report that the refresh in this workbook failed (stuck requests, no data)"""
+        self.failed = True
+
+    @abstractmethod
+    def sheet_names(self) -> list:
+        """Names of all sheets, in workbook order"""
+
+    @abstractmethod
+    def read_values(self, sheet_name: str) -> list:
+        """Current values of the sheet's used range as a 2D list"""
+
+    @abstractmethod
+    def read_formulas(self, sheet_name: str) -> list:
+        """Formulas of the sheet's used range as a 2D list (constants as-is)"""
+
+    @abstractmethod
+    def save(self, path: Path) -> None:
+        """Save the workbook, formulas included"""
+
+    @abstractmethod
+    def save_sheet(self, sheet_name: str, path: Path, new_name: str) -> None:
+        """Save a single sheet, formulas included, as its own workbook"""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Close the workbook without saving"""
+
+
+class RefreshBackend(ABC):
+    """Opens workbooks so their Bloomberg formulas get evaluated"""
+
+    name = "base"
+
+    def __init__(self, clock=None):
+        self.clock = clock or SystemClock()
+        self.pool = None
+
+    @abstractmethod
+    def open_workbook(self, xlsx_path: Path) -> RefreshWorkbook:
+        """Open a workbook and start the Bloomberg refresh"""
+
+    def close(self) -> None:
+        """Release whatever the backend holds (applications, connections)"""
+        if self.pool is not None:
+            self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _is_pending(value) -> bool:
+    """A cell whose Bloomberg request is in flight (not a blank or error cell)"""
+    return isinstance(value, str) and value.startswith(PENDING_MARKERS)
+
+
+def _formula_cells(formulas: list) -> list:
+    """(row, col) of every formula cell in a formula grid"""
+    return [(r, c)
+            for r, row in enumerate(formulas or [])
+            for c, formula in enumerate(row or [])
+            if isinstance(formula, str) and formula.startswith("=")]
+
+
+def _cell(grid: list, r: int, c: int):
+    try:
+        return grid[r][c]
+    except (IndexError, TypeError):
+        return None
+
+
+def sheet_status(values: list, cells: list) -> dict:
+    """
+    Classify the formula cells of one sheet
+
+    Args:
+        values: Current value grid of the sheet
+        cells: (row, col) of the sheet's formula cells
+
+    Returns:
+        Dictionary with the sheet status and pending/blank/invalid/not-applicable
+        counts; blank cells read back as None (Excel errors, empty results, or
+        not calculated yet)
+    """
+    pending = blank = invalid = not_applicable = 0
+    for r, c in cells:
+        value = _cell(values, r, c)
+        if value is None:
+            blank += 1
+        elif _is_pending(value):
+            pending += 1
+        elif isinstance(value, str):
+            if value.startswith(INVALID_SECURITY):
+                invalid += 1
+            elif value.startswith(FIELD_NOT_APPLICABLE):
+                not_applicable += 1
+
+    if pending:
+        status = TIMEOUT
+    elif invalid:
+        status = INVALID
+    elif cells and blank == len(cells):
+        status = NO_DATA
+    else:
+        status = READY
+    return {
+        'status': status,
+        'formulas': len(cells),
+        'pending': pending,
+        'blank': blank,
+        'invalid': invalid,
+        'not_applicable': not_applicable,
+    }
+
+
+def wait_until_ready(workbook: RefreshWorkbook, timeout: float = 15,
+                     poll_interval: float = 0.5, clock=None, sheets: list = None,
+                     blank_grace: float = BLANK_GRACE) -> dict:
+    """
+    Poll a workbook until every formula cell has settled
+
+    A cell is pending while it shows "#N/A Requesting Data...". Blank cells
+    are only waited for until Excel has calculated anything (some formula
+    shows a value or a request), at most blank_grace seconds; blanks left
+    once no request is in flight are errors or empty results, not pending.
+    Invalid-security and field-not-applicable results count as settled so
+    polling can stop early; they are reported per sheet.
+
+    Args:
+        workbook: Open workbook to watch
+        timeout: Hard limit in seconds
+        poll_interval: Seconds between polls
+        clock: Clock providing monotonic() and sleep() (default: wall clock)
+        sheets: Sheet names to watch (default: all sheets)
+        blank_grace: Seconds to wait for the first calculation while every
+                     formula cell is still blank
+
+    A TIMEOUT or NO_DATA outcome marks the workbook failed, so the Excel
+    session it lives in is recycled instead of reused (an invalid security
+    says nothing about the session).
+
+    Returns:
+        Dictionary with the overall 'status' (READY, TIMEOUT, INVALID or
+        NO_DATA), 'elapsed' seconds, 'pending' and 'blank' cell counts, and a
+        per-sheet breakdown under 'sheets'
+    """
+    clock = clock or SystemClock()
+    start = clock.monotonic()
+    names = sheets if sheets is not None else workbook.sheet_names()
+    cells = {name: _formula_cells(workbook.read_formulas(name)) for name in names}
+    formulas = sum(len(c) for c in cells.values())
+    calculated = False
+
+    while True:
+        report = {name: sheet_status(workbook.read_values(name), cells[name])
+                  for name in names}
+        elapsed = clock.monotonic() - start
+        pending = sum(s['pending'] for s in report.values())
+        blank = sum(s['blank'] for s in report.values())
+        calculated = calculated or pending > 0 or blank < formulas
+        uncalculated = not calculated and elapsed < min(blank_grace, timeout)
+
+        if (pending == 0 and not uncalculated) or elapsed >= timeout:
+            with_formulas = [s for s in report.values() if s['formulas']]
+            if pending:
+                status = TIMEOUT
+            elif any(s['status'] == INVALID for s in report.values()):
+                status = INVALID
+            elif with_formulas and all(s['status'] == NO_DATA for s in with_formulas):
+                status = NO_DATA
+            else:
+                status = READY
+            if status in (TIMEOUT, NO_DATA):
+                workbook.mark_failed()
+            return {'status': status, 'elapsed': elapsed, 'pending': pending, 'blank': blank,
+                    'sheets': report}
+
+        clock.sleep(min(poll_interval, max(0.0, timeout - elapsed)))
+
+
+class ExcelWorkbook(RefreshWorkbook):
+    """Workbook open in a pooled Excel session"""
+
+    def __init__(self, app, book, on_close=None):
+        """
+        Args:
+            app: xlwings App the workbook lives in
+            book: xlwings Book
+            on_close: Called with failed=True/False once the workbook is closed
+                      (failed if the refresh was marked failed or closing raised)
+        """
+        self.app = app
+        self.book = book
+        self.on_close = on_close
+
+    def sheet_names(self) -> list:
+        return [sh.name for sh in self.book.sheets]
+
+    def read_values(self, sheet_name: str) -> list:
+        return self.book.sheets[sheet_name].used_range.options(ndim=2).value
+
+    def read_formulas(self, sheet_name: str) -> list:
+        formulas = self.book.sheets[sheet_name].used_range.formula
+        # A single cell comes back as a string, a single row as a flat tuple
+        if isinstance(formulas, str):
+            return [[formulas]]
+        return [list(row) if isinstance(row, (list, tuple)) else [row] for row in formulas]
+
+    def save(self, path: Path) -> None:
+        self.book.save(str(path))
+
+    def save_sheet(self, sheet_name: str, path: Path, new_name: str) -> None:
+        formula_book = self.app.books.add()
+        try:
+            self.book.sheets[sheet_name].copy(before=formula_book.sheets[0], name=new_name)
+            for extra in list(formula_book.sheets)[1:]:
+                extra.delete()
+            formula_book.save(str(path))
+        finally:
+            formula_book.close()
+
+    def close(self) -> None:
+        failed = self.failed
+        try:
+            self.book.close()
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if self.on_close is not None:
+                self.on_close(failed)
+
+
+class ExcelBackend(RefreshBackend):
+    """Refresh through Excel and the Bloomberg add-in (Windows only)"""
+
+    name = "excel"
+
+    def __init__(self, sessions: int = 1, max_uses: int = 50, max_memory_mb: float = 1500,
+                 visible: bool = False, clock=None):
+        """
+        Args:
+            sessions: Excel instances kept alive at the same time
+            max_uses: Workbooks refreshed per instance before it is restarted
+            max_memory_mb: Restart an instance whose memory exceeds this
+            visible: Show the Excel windows
+            clock: Clock providing monotonic() and sleep()
+        """
+        super().__init__(clock)
+        try:
+            import xlwings as xw
+        except ImportError as e:
+            raise ImportError(f"{e}. The Excel backend needs: pip install xlwings") from e
+        if max_memory_mb and not XlwingsSession.measures_memory:
+            print(f"⚠️  psutil is not installed: Excel memory is not measured and the "
+                  f"{max_memory_mb:.0f} MB limit (--max-excel-mb) is ignored (pip install psutil)")
+        self.pool = SessionPool(lambda: XlwingsSession(xw, visible=visible),
+                                size=sessions, max_uses=max_uses,
+                                max_memory_mb=max_memory_mb)
+
+    def open_workbook(self, xlsx_path: Path) -> RefreshWorkbook:
+        session = self.pool.acquire()
+        try:
+            book = session.open_book(xlsx_path)
+        except Exception:
+            self.pool.release(session, failed=True)
+            raise
+        return ExcelWorkbook(session.app, book,
+                             on_close=lambda failed: self.pool.release(session, failed))
+
+
+def _read_formula_sheets(xlsx_path: Path) -> dict:
+    """{sheet name: formula grid} of a workbook, read with openpyxl"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(xlsx_path)
+    sheets = {ws.title: [list(row) for row in ws.iter_rows(values_only=True)]
+              for ws in wb.worksheets}
+    wb.close()
+    return sheets
+
+
+def _save_formula_sheet(formulas: list, path: Path, new_name: str) -> None:
+    """Save a formula grid as a one-sheet workbook"""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = new_name
+    for row in formulas:
+        ws.append(list(row))
+    wb.save(path)
+
+
+def fake_value(formula: str) -> float:
+    """Deterministic stand-in number for a Bloomberg formula"""
+    return round((zlib.crc32(formula.encode("utf-8")) % 10_000_000) / 10, 1)
+
+
+class FakeWorkbook(RefreshWorkbook):
+    """
+    Workbook whose formula cells resolve on a schedule
+
+    Each formula cell reads "#N/A Requesting Data..." until its resolve time,
+    then the final value. Formulas mentioning an invalid security resolve to
+    "#N/A Invalid Security".
+    """
+
+    def __init__(self, source_path: Path, sheets: dict, clock, resolve_after, on_close=None):
+        """
+        Args:
+            source_path: File the workbook was opened from
+            sheets: {sheet name: (value grid, formula grid)} of final contents
+            clock: Clock shared with the poller
+            resolve_after: Callable (sheet, row, col) -> seconds until the cell resolves
+            on_close: Called with failed=True/False once the workbook is closed
+        """
+        self.source_path = Path(source_path)
+        self.sheets = sheets
+        self.clock = clock
+        self.resolve_after = resolve_after
+        self.on_close = on_close
+        self.opened_at = clock.monotonic()
+        self.closed = False
+
+    def sheet_names(self) -> list:
+        return list(self.sheets)
+
+    def read_values(self, sheet_name: str) -> list:
+        values, formulas = self.sheets[sheet_name]
+        age = self.clock.monotonic() - self.opened_at
+        grid = []
+        for r, row in enumerate(values):
+            out = []
+            for c, value in enumerate(row):
+                formula = formulas[r][c]
+                if (isinstance(formula, str) and formula.startswith("=")
+                        and age < self.resolve_after(sheet_name, r, c)):
+                    value = "#N/A Requesting Data..."
+                out.append(value)
+            grid.append(out)
+        return grid
+
+    def read_formulas(self, sheet_name: str) -> list:
+        return [list(row) for row in self.sheets[sheet_name][1]]
+
+    def save(self, path: Path) -> None:
+        shutil.copyfile(self.source_path, path)
+
+    def save_sheet(self, sheet_name: str, path: Path, new_name: str) -> None:
+        _save_formula_sheet(self.sheets[sheet_name][1], path, new_name)
+
+    def close(self) -> None:
+        if not self.closed and self.on_close is not None:
+            self.on_close(self.failed)
+        self.closed = True
+
+
+class FakeBackend(RefreshBackend):
+    """
+    In-process stand-in for Excel + Bloomberg
+
+    Opens the patched template with openpyxl and resolves every formula cell
+    after a configurable latency, so the downloader can run end-to-end on any
+    platform without a terminal.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 2.0, jitter: float = 0.0,
+                 invalid_symbols=(), never_resolve=(), sessions: int = 1,
+                 max_uses: int = 50, max_memory_mb: float = 1500,
+                 session_factory=FakeSession, clock=None, latency_sigma: float = 0.0,
+                 invalid_rate: float = 0.0, timeout_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            latency: Seconds until a formula cell resolves (median per security)
+            jitter: Extra per-cell delay, spread deterministically in [0, jitter)
+            invalid_symbols: Symbols Bloomberg should report as invalid
+            never_resolve: Symbols whose cells stay pending forever
+            sessions: Fake sessions kept alive at the same time
+            max_uses: Workbooks per session before it is restarted
+            max_memory_mb: Restart a session whose simulated memory exceeds this
+            session_factory: Callable returning a new FakeSession
+            clock: Clock providing monotonic() and sleep() (default: wall clock)
+            latency_sigma: Log-normal spread of the latency between securities
+            invalid_rate: Share of securities reported as invalid
+            timeout_rate: Share of securities whose cells never resolve
+            seed: Picks which securities are slow / invalid / never resolve;
+                  the same seed gives the same picks in every process
+        """
+        super().__init__(clock)
+        self.pool = SessionPool(session_factory, size=sessions, max_uses=max_uses,
+                                max_memory_mb=max_memory_mb)
+        self.latency = latency
+        self.jitter = jitter
+        self.invalid_symbols = {s.upper() for s in invalid_symbols}
+        self.never_resolve = {s.upper() for s in never_resolve}
+        self.latency_sigma = latency_sigma
+        self.invalid_rate = invalid_rate
+        self.timeout_rate = timeout_rate
+        self.seed = seed
+        self._profiles = {}
+        self.opened = []
+
+    def _profile(self, formula: str) -> tuple:
+        """(latency, outcome) of the security a formula asks for; outcome None, INVALID or TIMEOUT"""
+        match = SECURITY_RE.search(formula)
+        security = match.group(1) if match else ""
+        profile = self._profiles.get(security)
+        if profile is None:
+            code = security[:-len(" IN Equity")].upper() if security.endswith(" IN Equity") else None
+            rng = random.Random(zlib.crc32(f"{self.seed}:{security}".encode()))
+            draw = rng.random()
+            if code in self.invalid_symbols or draw < self.invalid_rate:
+                outcome = INVALID
+            elif code in self.never_resolve or draw < self.invalid_rate + self.timeout_rate:
+                outcome = TIMEOUT
+            else:
+                outcome = None
+            latency = self.latency
+            if self.latency_sigma:
+                latency *= math.exp(rng.gauss(0.0, self.latency_sigma))
+            profile = self._profiles[security] = (latency, outcome)
+        return profile
+
+    def _formula_value(self, formula: str):
+        if self._profile(formula)[1] == INVALID:
+            return INVALID_SECURITY
+        return fake_value(formula)
+
+    def _resolve_after(self, sheets: dict):
+        def resolve_after(sheet_name, r, c):
+            formula = sheets[sheet_name][1][r][c]
+            latency, outcome = self._profile(formula)
+            if outcome == TIMEOUT:
+                return float("inf")
+            spread = (zlib.crc32(f"{sheet_name}!{r}:{c}".encode()) % 1000) / 1000
+            return latency + self.jitter * spread
+        return resolve_after
+
+    def open_workbook(self, xlsx_path: Path) -> RefreshWorkbook:
+        session = self.pool.acquire()
+        try:
+            session.open_book(xlsx_path)
+            formula_sheets = _read_formula_sheets(xlsx_path)
+        except Exception:
+            self.pool.release(session, failed=True)
+            raise
+        sheets = {}
+        for title, formulas in formula_sheets.items():
+            values = [[self._formula_value(v) if isinstance(v, str) and v.startswith("=") else v
+                       for v in row] for row in formulas]
+            sheets[title] = (values, formulas)
+
+        workbook = FakeWorkbook(xlsx_path, sheets, self.clock, self._resolve_after(sheets),
+                                on_close=lambda failed: self.pool.release(session, failed))
+        self.opened.append(workbook)
+        return workbook
+
+
+class ApiWorkbook(RefreshWorkbook):
+    """Workbook whose Bloomberg formulas were answered before it was handed out"""
+
+    def __init__(self, source_path: Path, sheets: dict):
+        """
+        Args:
+            source_path: File the workbook was opened from
+            sheets: {sheet name: (value grid, formula grid)}
+        """
+        self.source_path = Path(source_path)
+        self.sheets = sheets
+
+    def sheet_names(self) -> list:
+        return list(self.sheets)
+
+    def read_values(self, sheet_name: str) -> list:
+        return [list(row) for row in self.sheets[sheet_name][0]]
+
+    def read_formulas(self, sheet_name: str) -> list:
+        return [list(row) for row in self.sheets[sheet_name][1]]
+
+    def save(self, path: Path) -> None:
+        shutil.copyfile(self.source_path, path)
+
+    def save_sheet(self, sheet_name: str, path: Path, new_name: str) -> None:
+        _save_formula_sheet(self.sheets[sheet_name][1], path, new_name)
+
+    def close(self) -> None:
+        pass
+
+
+class ApiBackend(RefreshBackend):
+    """
+    Refresh through the Bloomberg API instead of Excel
+
+    Opening a workbook reads its formulas, groups every BDH/BDP cell of every
+    sheet into a few batched requests (bloomberg_api.RequestPlan) and fills in
+    the answers, so the workbook is ready as soon as it is opened. Packing
+    symbols (--pack) puts more securities into each request.
+    """
+
+    name = "api"
+
+    def __init__(self, url: str = None, host: str = "localhost", port: int = 8194,
+                 max_securities: int = None, clock=None):
+        """
+        Args:
+            url: HTTP endpoint to send the requests to (e.g. bloomberg_api.py serve);
+                 None opens a blpapi session instead
+            host / port: blpapi endpoint (default: the terminal's Desktop API)
+            max_securities: Securities per request (default: the service limit)
+            clock: Clock providing monotonic() and sleep()
+        """
+        super().__init__(clock)
+        from bloomberg_api import MAX_SECURITIES, BlpapiService, HttpService
+
+        limit = max_securities or MAX_SECURITIES
+        if url:
+            self.service = HttpService(url, max_securities=limit)
+        else:
+            self.service = BlpapiService(host, port, max_securities=limit)
+
+    def open_workbook(self, xlsx_path: Path) -> RefreshWorkbook:
+        from bloomberg_api import RequestPlan
+
+        formula_sheets = _read_formula_sheets(xlsx_path)
+        plan = RequestPlan.build(((title, r, c), formulas[r][c])
+                                 for title, formulas in formula_sheets.items()
+                                 for r, c in _formula_cells(formulas))
+        answers = plan.fetch(self.service)
+        sheets = {}
+        for title, formulas in formula_sheets.items():
+            values = [list(row) for row in formulas]
+            for r, c in _formula_cells(formulas):
+                values[r][c] = answers[(title, r, c)]
+            sheets[title] = (values, formulas)
+        return ApiWorkbook(xlsx_path, sheets)
+
+    def close(self) -> None:
+        self.service.close()
+        super().close()
+
+
+BACKENDS = {
+    ExcelBackend.name: ExcelBackend,
+    FakeBackend.name: FakeBackend,
+    ApiBackend.name: ApiBackend,
+}
+
+
+def make_backend(name: str = "excel", **options) -> RefreshBackend:
+    """
+    Create a refresh backend by name
+
+    Args:
+        name: One of BACKENDS ("excel", "fake", "api")
+        **options: Passed to the backend constructor
+
+    Returns:
+        The backend instance
+    """
+    try:
+        return BACKENDS[name](**options)
+    except KeyError:
+        raise ValueError(f"Unknown backend: {name} (choose from {', '.join(BACKENDS)})")
@@ -0,0 +1,292 @@
+"""
+Freshness-Aware Refresh Cache
+=============================
+Most of the FA1 sheet is annual / LTM data that only moves when a company
+reports, so a symbol refreshed since its last results can be served from its
+previous output instead of going through Excel again.
+
+One SQLite row per symbol that ever refreshed successfully:
+
+    symbol | refreshed_at | seconds | result_date | annual_result_date | periods | output
+
+result_date / annual_result_date are query-results.csv's "Last result date"
+and "Last annual result date" (YYYYMM) as they were at refresh time. A
+symbol is refreshed again when:
+
+- it has never been refreshed, or --force is given
+- query-results.csv now shows newer results than at the last refresh
+- its estimate columns ("FY 2026 Est") are older than the estimates TTL
+  (estimates move without the company reporting)
+- its last refresh is older than the reported TTL (backstop, e.g. for
+  symbols without a confident NSE/BSE listing match)
+- its previous output files (or Parquet store) are gone
+
+Symbols and result dates are keyed by the bare code ("HDFCB", as --symbols
+takes it), so "HDFCB IN" or a full ticker finds the same dates.
+
+Usage:
+    cache = RefreshCache("output/refresh_cache.sqlite")
+    plan = cache.plan(symbols, load_result_dates())
+    ... refresh plan['refresh'] ...
+    cache.record("HDFCB", result, seconds=12.5, dates=(202509, 202503))
+    cache.close()
+"""
+
+import json
+import math
+import sqlite3
+import time
+from pathlib import Path
+
+from job_journal import encode_output
+from listing_map import DEFAULT_LISTINGS, MIN_CONFIDENCE, ListingMap
+from symbol_universe import bare_symbol
+
+
+# Maximum age in days per field class
+DEFAULT_TTL = {'estimates': 7, 'reported': 90}
+
+FRESH = "fresh"
+NEVER = "never refreshed"
+FORCED = "forced"
+NEW_RESULTS = "new results"
+ESTIMATES_EXPIRED = "estimates expired"
+EXPIRED = "expired"
+MISSING = "previous output missing"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS refreshes (
+    symbol             TEXT PRIMARY KEY,
+    refreshed_at       REAL NOT NULL,
+    seconds            REAL,
+    result_date        INTEGER,
+    annual_result_date INTEGER,
+    periods            TEXT,
+    output             TEXT
+)
+"""
+_FILE_KEYS = ('excel', 'values', 'csv', 'store')
+_COLUMNS = ('refreshed_at', 'seconds', 'result_date', 'annual_result_date', 'periods', 'output')
+
+
+def parse_ttl(value: str) -> dict:
+    """
+    Turn "estimates=7,reported=90" into {field class: days}
+
+    Raises:
+        ValueError: Unknown field class or a non-numeric number of days
+    """
+    ttl = dict(DEFAULT_TTL)
+    for part in (value or "").split(","):
+        if not part.strip():
+            continue
+        name, _, days = part.partition("=")
+        name = name.strip().lower()
+        if name not in DEFAULT_TTL:
+            raise ValueError(f"Unknown TTL field class '{name}' (use: {', '.join(DEFAULT_TTL)})")
+        ttl[name] = float(days)
+    return ttl
+
+
+def _month(value):
+    """YYYYMM as int, or None for a missing value"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return int(value)
+
+
+def load_result_dates(listings_csv=DEFAULT_LISTINGS, listing_map: ListingMap = None) -> dict:
+    """
+    Latest result dates of every confidently mapped symbol
+
+    Args:
+        listings_csv: query-results.csv
+        listing_map: ListingMap to map listings with (default: ListingMap.load())
+
+    Returns:
+        {bare symbol: (Last result date, Last annual result date)} as YYYYMM
+        ints or None; empty if the listings file is missing
+    """
+    from screener import ListingTable
+
+    if not Path(listings_csv).exists():
+        return {}
+    table = ListingTable.load(listings_csv)
+    listing_map = listing_map or ListingMap.load(listings_csv=listings_csv)
+
+    latest = table.numeric.get('Last result date')
+    annual = table.numeric.get('Last annual result date')
+    if latest is None or annual is None:
+        return {}
+    rows = {}
+    for i, (nse, bse) in enumerate(zip(table.text['NSE Code'], table.text['BSE Code'])):
+        rows[('nse', nse) if nse else ('bse', bse.split(".")[0])] = i
+
+    dates = {}
+    for entry in listing_map.entries.values():
+        if entry['confidence'] < MIN_CONFIDENCE:
+            continue
+        i = rows.get(('nse', entry['nse']) if entry['nse'] else ('bse', entry['bse']))
+        if i is not None:
+            dates[bare_symbol(entry['symbol'])] = (_month(latest[i]), _month(annual[i]))
+    return dates
+
+
+class RefreshCache:
+    """When each symbol last refreshed, what it returned and where it went"""
+
+    def __init__(self, path, flush_every: int = 50):
+        """
+        Args:
+            path: SQLite file (created if missing)
+            flush_every: Write once this many symbols were recorded
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._rows = {
+            row[0]: dict(zip(_COLUMNS, row[1:]))
+            for row in self._conn.execute(f"SELECT symbol, {', '.join(_COLUMNS)} FROM refreshes")
+        }
+        self._dirty = set()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, symbol: str) -> dict:
+        """Last refresh of a symbol (periods and output decoded), or None"""
+        row = self._rows.get(symbol)
+        if row is None:
+            return None
+        row = dict(row)
+        row['periods'] = json.loads(row['periods']) if row['periods'] else []
+        row['output'] = json.loads(row['output']) if row['output'] else None
+        return row
+
+    def check(self, symbol: str, dates: tuple = None, ttl: dict = None, now: float = None) -> str:
+        """
+        Why a symbol needs refreshing, or FRESH if its last output can be served
+
+        Args:
+            symbol: Bloomberg symbol
+            dates: (Last result date, Last annual result date) from
+                   load_result_dates(), or None if unknown
+            ttl: {field class: days} (default: DEFAULT_TTL)
+            now: Current time (default: time.time())
+        """
+        row = self.get(symbol)
+        if row is None:
+            return NEVER
+        ttl = ttl or DEFAULT_TTL
+        age_days = ((now or time.time()) - row['refreshed_at']) / 86400
+
+        if dates is not None:
+            for current, seen in zip(dates, (row['result_date'], row['annual_result_date'])):
+                if current is not None and (seen is None or current > seen):
+                    return NEW_RESULTS
+        if age_days > ttl['reported']:
+            return EXPIRED
+        if age_days > ttl['estimates'] and any(p.upper().endswith("EST") for p in row['periods']):
+            return ESTIMATES_EXPIRED
+        if not _servable(row['output']):
+            return MISSING
+        return FRESH
+
+    def plan(self, symbols: list, result_dates: dict = None, ttl: dict = None,
+             force: bool = False) -> dict:
+        """
+        Split symbols into those to refresh and those served from the cache
+
+        Args:
+            symbols: Symbols of the run
+            result_dates: From load_result_dates() ({} or None: TTLs only)
+            ttl: {field class: days} (default: DEFAULT_TTL)
+            force: Refresh everything
+
+        Returns:
+            {'refresh': [symbols], 'skip': [symbols], 'reasons': {symbol: reason},
+             'saved_seconds': refresh seconds the skipped symbols took last time}
+        """
+        result_dates = result_dates or {}
+        now = time.time()
+        plan = {'refresh': [], 'skip': [], 'reasons': {}, 'saved_seconds': 0.0}
+        for symbol in dict.fromkeys(symbols):
+            if force:
+                reason = FORCED
+            else:
+                reason = self.check(symbol, result_dates.get(bare_symbol(symbol)), ttl, now)
+            plan['reasons'][symbol] = reason
+            if reason == FRESH:
+                plan['skip'].append(symbol)
+                plan['saved_seconds'] += self._rows[symbol]['seconds'] or 0.0
+            else:
+                plan['refresh'].append(symbol)
+        return plan
+
+    def record(self, symbol: str, output: dict, seconds: float = None, dates: tuple = None) -> None:
+        """
+        Remember a successful refresh
+
+        Args:
+            symbol: Bloomberg symbol
+            output: Paths dict from the downloader (with 'periods'); for a
+                    refresh that changed nothing ('changed' False) the files
+                    of the previous refresh are kept
+            seconds: Terminal time the refresh took
+            dates: (Last result date, Last annual result date) at refresh time
+        """
+        dates = dates or (None, None)
+        previous = self.get(symbol)
+        if output and output.get('changed') is False and previous and previous['output']:
+            output = {**output, **{key: previous['output'].get(key) for key in _FILE_KEYS
+                                   if output.get(key) is None}}
+        self._rows[symbol] = {
+            'refreshed_at': time.time(),
+            'seconds': seconds,
+            'result_date': dates[0],
+            'annual_result_date': dates[1],
+            'periods': json.dumps((output or {}).get('periods') or []),
+            'output': encode_output(output),
+        }
+        self._dirty.add(symbol)
+        if len(self._dirty) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write every recorded row in one transaction
+
+        Returns:
+            Number of rows written
+        """
+        if not self._dirty:
+            return 0
+        rows = [(symbol, *(self._rows[symbol][c] for c in _COLUMNS)) for symbol in self._dirty]
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO refreshes (symbol, {', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})",
+                rows,
+            )
+        self._dirty.clear()
+        return len(rows)
+
+    def close(self) -> None:
+        """Write anything pending and close the database"""
+        self.flush()
+        self._conn.close()
+
+
+def _servable(output: dict) -> bool:
+    """Whether a previous refresh's values still exist somewhere"""
+    if not output:
+        return False
+    if output.get('store') and Path(output['store']).exists():
+        return True
+    if output.get('snapshot') and Path(output['snapshot']).exists():
+        return True
+    return any(output.get(key) and Path(output[key]).exists() for key in ('csv', 'values'))
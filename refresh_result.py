@@ -0,0 +1,122 @@
+"""
+In-Memory Refresh Result
+========================
+The values Bloomberg filled in for one symbol, as read back from Excel,
+handed straight to the exporters instead of going through a values-only
+workbook on disk:
+
+    refresh ──grid──▶ RefreshResult ──▶ CSV / Parquet store / values .xlsx
+
+Previously every symbol's values were copied into a second Excel workbook
+through COM, saved, and read back with pd.read_excel just to write the CSV.
+Now the CSV, the long table for the Parquet store and (only if asked for)
+the values-only workbook are all produced from the grid in memory.
+
+Usage:
+    result = RefreshResult("HDFCB", {"BBG Adj Highlights": grid})
+    result.to_csv("HDFCB.csv")
+    store.append(result.table(), as_of)
+    result.to_xlsx("HDFCB_values.xlsx")
+"""
+
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from highlights_parser import parse_grid
+from template_patcher import SHEET_NAME
+
+
+class RefreshResult:
+    """Value grids of one refreshed symbol"""
+
+    def __init__(self, symbol: str, grids: dict, as_of: datetime = None):
+        """
+        Args:
+            symbol: Bloomberg symbol
+            grids: {sheet name: 2D list of values} as read from the workbook
+            as_of: When the refresh ran (default: now)
+        """
+        self.symbol = symbol
+        self.grids = grids
+        self.as_of = as_of or datetime.now()
+        self._table = None
+
+    @property
+    def grid(self) -> list:
+        """The "BBG Adj Highlights" grid (or the only sheet's)"""
+        if SHEET_NAME in self.grids:
+            return self.grids[SHEET_NAME]
+        return next(iter(self.grids.values()), [])
+
+    def frame(self) -> pd.DataFrame:
+        """
+        The main sheet as pd.read_excel would have returned it from the
+        values workbook: first row as header, whole numbers as ints
+        """
+        rows = [[_cell(v) for v in row] for row in _rows(self.grid)]
+        if not rows:
+            return pd.DataFrame()
+        width = max(len(row) for row in rows)
+        rows = [row + [None] * (width - len(row)) for row in rows]
+        return pd.DataFrame(rows[1:], columns=_header(rows[0]))
+
+    def to_csv(self, path) -> Path:
+        """Write the main sheet as CSV (header row as pandas.read_excel gives it)"""
+        self.frame().to_csv(path, index=False, encoding='utf-8-sig')
+        return Path(path)
+
+    def table(self) -> pd.DataFrame:
+        """Long table (see highlights_parser), parsed once"""
+        if self._table is None:
+            self._table = parse_grid(self.grid, self.symbol)
+        return self._table
+
+    def periods(self) -> list:
+        """Fiscal period columns the refresh returned"""
+        return [str(p) for p in self.table()['fiscal_period'].unique()]
+
+    def to_xlsx(self, path) -> Path:
+        """Write the values-only workbook (one sheet per grid)"""
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        for sheet_name, grid in self.grids.items():
+            ws = wb.create_sheet(sheet_name)
+            for row in _rows(grid):
+                ws.append(list(row))
+        wb.save(path)
+        return Path(path)
+
+
+def _rows(grid) -> list:
+    """Excel returns a single row / cell unwrapped; always give a list of rows"""
+    if grid is None:
+        return []
+    if not isinstance(grid, (list, tuple)):
+        return [[grid]]
+    if grid and not isinstance(grid[0], (list, tuple)):
+        return [list(grid)]
+    return [list(row) for row in grid]
+
+
+def _cell(value):
+    # Excel hands back every number as a float; a saved workbook reads back 5.0 as 5
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _header(row: list) -> list:
+    """Column names the way pandas names them when reading a sheet"""
+    names, seen = [], {}
+    for i, value in enumerate(row):
+        name = f"Unnamed: {i}" if value is None or value == "" else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
@@ -0,0 +1,378 @@
+"""
+Listing Screener
+================
+Pick symbols with a small expression language over the numeric columns of
+query-results.csv, e.g.
+
+    Market Capitalization > 5000 and Profit growth 3Years > 15 and Debt < 1000
+    (Price to Earning < 20 or Sales growth 5Years >= 25) and not Debt > Net profit
+    Industry Group == "Banks" and Market Capitalization > 20000
+
+- Column names are matched case-insensitively and may contain spaces
+- Comparisons: > >= < <= == != against a number, a quoted string (text
+  columns) or another column
+- Combine with and / or / not and parentheses
+- Missing values never pass a comparison
+
+The CSV is converted once into a typed columnar copy (float64 arrays for the
+numeric columns) cached in .cache/ and rebuilt only when the file changes.
+Screens compile to NumPy boolean masks and the matching listings are mapped
+to Bloomberg symbols through listing_map.py.
+
+Usage:
+    python screener.py "Market Capitalization > 5000 and Debt < 1000"
+    python screener.py --columns
+    python batch_download.py --screen "Market Capitalization > 5000 and Debt < 1000"
+"""
+
+import argparse
+import csv
+import difflib
+import hashlib
+import operator
+import os
+import pickle
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+
+from listing_map import DEFAULT_LISTINGS, MIN_CONFIDENCE, ListingMap
+from symbol_universe import bare_symbol
+
+
+CACHE_VERSION = 1
+# Columns kept as text even though some values look numeric
+TEXT_COLUMNS = {"Name", "BSE Code", "NSE Code", "Industry Group", "Industry"}
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?)(?![A-Za-z_])
+      | (?P<string>"[^"]*"|'[^']*')
+      | (?P<op>>=|<=|==|!=|>|<|=)
+      | (?P<paren>[()])
+      | (?P<word>[A-Za-z0-9_.%/&-]+)
+    )""", re.X)
+
+_COMPARE = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le,
+            '==': operator.eq, '=': operator.eq, '!=': operator.ne}
+_KEYWORDS = {'and', 'or', 'not'}
+
+
+class ScreenError(ValueError):
+    """A screen expression that does not parse or names an unknown column"""
+
+
+def _number(value: str) -> float:
+    try:
+        return float(value.replace(",", ""))
+    except ValueError:
+        return np.nan
+
+
+class ListingTable:
+    """Typed, column-oriented copy of query-results.csv"""
+
+    def __init__(self, numeric: dict, text: dict, source: dict = None):
+        """
+        Args:
+            numeric: {column: float64 array}
+            text: {column: list of str}
+            source: Size, mtime and hash of the CSV
+        """
+        self.numeric = numeric
+        self.text = text
+        self.source = source or {}
+        self.columns = {name.lower(): name for name in list(text) + list(numeric)}
+        self.rows = len(next(iter(text.values()))) if text else 0
+        # Text columns as object arrays for vectorized equality
+        self._text_arrays = {name: np.array(values, dtype=object) for name, values in text.items()}
+
+    @classmethod
+    def from_csv(cls, csv_path=DEFAULT_LISTINGS) -> "ListingTable":
+        path = Path(csv_path)
+        with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+            reader = csv.reader(f)
+            header = [h.strip() for h in next(reader)]
+            body = [row for row in reader if row]
+
+        numeric, text = {}, {}
+        for col, name in enumerate(header):
+            if name in numeric or name in text:
+                continue
+            values = [row[col].strip() if col < len(row) else "" for row in body]
+            if name in TEXT_COLUMNS:
+                text[name] = values
+            else:
+                numeric[name] = np.array([_number(v) if v else np.nan for v in values],
+                                         dtype="float64")
+
+        stat = path.stat()
+        source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                  'sha1': hashlib.sha1(path.read_bytes()).hexdigest()}
+        return cls(numeric, text, source)
+
+    @classmethod
+    def load(cls, csv_path=DEFAULT_LISTINGS) -> "ListingTable":
+        """Load from the .cache copy, rebuilding it if the CSV changed"""
+        path = Path(csv_path)
+        cache = path.parent / ".cache" / f"{path.name}.columns.pkl"
+        stat = path.stat()
+        try:
+            with open(cache, "rb") as f:
+                state = pickle.load(f)
+            source = state['source']
+            if (state['version'] == CACHE_VERSION and source['size'] == stat.st_size
+                    and source['mtime_ns'] == stat.st_mtime_ns):
+                return cls(state['numeric'], state['text'], source)
+        except Exception:
+            pass
+
+        table = cls.from_csv(path)
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump({'version': CACHE_VERSION, 'source': table.source,
+                             'numeric': table.numeric, 'text': table.text},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache)
+        except OSError:
+            pass
+        return table
+
+    def column(self, name: str):
+        """Array of a column (float64 for numeric, object for text)"""
+        if name in self.numeric:
+            return self.numeric[name]
+        return self._text_arrays[name]
+
+
+class Screen:
+    """A compiled screen expression"""
+
+    def __init__(self, expression: str, table: ListingTable):
+        """
+        Args:
+            expression: Screen text, e.g. "Market Capitalization > 5000 and Debt < 1000"
+            table: ListingTable whose columns the expression refers to
+
+        Raises:
+            ScreenError: Syntax error or unknown column
+        """
+        self.expression = expression
+        self.table = table
+        self._tokens = self._tokenize(expression)
+        self._pos = 0
+        self._evaluate = self._or()
+        if self._pos < len(self._tokens):
+            raise ScreenError(f"Unexpected '{self._tokens[self._pos][1]}' in screen")
+
+    @staticmethod
+    def _tokenize(expression: str) -> list:
+        tokens, pos = [], 0
+        expression = expression.strip()
+        while pos < len(expression):
+            match = _TOKEN_RE.match(expression, pos)
+            if match is None or match.end() == pos:
+                raise ScreenError(f"Cannot read screen at: {expression[pos:]!r}")
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'word' and value.lower() in _KEYWORDS:
+                kind = value.lower()
+            tokens.append((kind, value))
+            pos = match.end()
+        return tokens
+
+    def _peek(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else (None, None)
+
+    def _take(self, kind: str = None):
+        token = self._peek()
+        if token[0] is None or (kind and token[0] != kind):
+            expected = kind or "more input"
+            raise ScreenError(f"Expected {expected} in screen, got {token[1] or 'end'}")
+        self._pos += 1
+        return token
+
+    def _or(self):
+        left = self._and()
+        while self._peek()[0] == 'or':
+            self._take()
+            left = _combine(np.logical_or, left, self._and())
+        return left
+
+    def _and(self):
+        left = self._not()
+        while self._peek()[0] == 'and':
+            self._take()
+            left = _combine(np.logical_and, left, self._not())
+        return left
+
+    def _not(self):
+        if self._peek()[0] == 'not':
+            self._take()
+            inner = self._not()
+            return lambda: np.logical_not(inner())
+        if self._peek() == ('paren', '('):
+            self._take()
+            inner = self._or()
+            if self._peek() != ('paren', ')'):
+                raise ScreenError("Missing ')' in screen")
+            self._take()
+            return inner
+        return self._comparison()
+
+    def _comparison(self):
+        left = self._operand()
+        kind, op = self._take('op')
+        right = self._operand()
+        compare = _COMPARE[op]
+        text = isinstance(left, str) or isinstance(right, str) or self._is_text(left) \
+            or self._is_text(right)
+        if text and op not in ('==', '=', '!='):
+            raise ScreenError(f"Only == and != work on text columns ({op} used)")
+
+        def values(side):
+            if isinstance(side, _Column):
+                return self.table.column(side.name)
+            return side
+
+        def evaluate():
+            a, b = values(left), values(right)
+            if text:
+                return np.asarray(compare(a, b), dtype=bool)
+            # NaN compares False for every operator, != included
+            with np.errstate(invalid="ignore"):
+                mask = compare(a, b)
+            if op == '!=':
+                for side in (a, b):
+                    if isinstance(side, np.ndarray):
+                        mask &= ~np.isnan(side)
+            return mask
+        return evaluate
+
+    def _is_text(self, side) -> bool:
+        return isinstance(side, _Column) and side.name in self.table.text
+
+    def _operand(self):
+        kind, value = self._take()
+        if kind == 'number':
+            return float(value)
+        if kind == 'string':
+            return value[1:-1]
+        if kind != 'word':
+            raise ScreenError(f"Expected a column or value in screen, got {value}")
+        words = [value]
+        while self._peek()[0] in ('word', 'number'):
+            words.append(self._take()[1])
+        name = " ".join(words)
+        column = self.table.columns.get(name.lower())
+        if column is None:
+            close = difflib.get_close_matches(name.lower(), self.table.columns, n=3, cutoff=0.6)
+            hint = f" (did you mean: {', '.join(self.table.columns[c] for c in close)}?)" if close else ""
+            raise ScreenError(f"Unknown column '{name}'{hint}")
+        return _Column(column)
+
+    def mask(self) -> np.ndarray:
+        """Boolean mask over the table's rows"""
+        return np.asarray(self._evaluate(), dtype=bool)
+
+
+class _Column:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+def _combine(func, left, right):
+    return lambda: func(left(), right())
+
+
+def screen_symbols(expression: str, listings_csv=DEFAULT_LISTINGS, listing_map: ListingMap = None,
+                   table: ListingTable = None) -> dict:
+    """
+    Evaluate a screen and map the matching listings to Bloomberg symbols
+
+    Args:
+        expression: Screen text
+        listings_csv: query-results.csv
+        listing_map: ListingMap to map listings with (default: ListingMap.load())
+        table: ListingTable to screen (default: ListingTable.load(listings_csv))
+
+    Returns:
+        {'symbols': bare symbols as --symbols takes them ("HDFCB"), largest market cap first,
+         'listings': number of listings that passed,
+         'unmapped': names of passing listings with no confident Bloomberg match,
+         'elapsed_ms': time spent compiling and evaluating}
+    """
+    table = table or ListingTable.load(listings_csv)
+    listing_map = listing_map or ListingMap.load(listings_csv=listings_csv)
+
+    start = time.perf_counter()
+    rows = np.flatnonzero(Screen(expression, table).mask())
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    nse, bse, names = table.text['NSE Code'], table.text['BSE Code'], table.text['Name']
+    codes = set()
+    for i in rows:
+        codes.add(('nse', nse[i]) if nse[i] else ('bse', bse[i].split(".")[0]))
+
+    symbols, mapped = [], set()
+    for entry in listing_map.entries.values():
+        if entry['confidence'] < MIN_CONFIDENCE:
+            continue
+        key = ('nse', entry['nse']) if entry['nse'] else ('bse', entry['bse'])
+        if key in codes:
+            symbols.append(bare_symbol(entry['symbol']))
+            mapped.add(key)
+    unmapped = [names[i] for i in rows
+                if (('nse', nse[i]) if nse[i] else ('bse', bse[i].split(".")[0])) not in mapped]
+
+    return {'symbols': symbols, 'listings': len(rows), 'unmapped': unmapped,
+            'elapsed_ms': elapsed_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Screen query-results.csv listings and map them to Bloomberg symbols'
+    )
+    parser.add_argument('expression', nargs='?',
+                       help='Screen, e.g. "Market Capitalization > 5000 and Debt < 1000"')
+    parser.add_argument('--columns', action='store_true',
+                       help='List the columns a screen can use')
+    parser.add_argument('--listings', default=DEFAULT_LISTINGS,
+                       help='Listings CSV (default: query-results.csv)')
+    args = parser.parse_args()
+
+    table = ListingTable.load(args.listings)
+    if args.columns or not args.expression:
+        print(f"\nNumeric columns ({len(table.numeric)}):")
+        for name in table.numeric:
+            print(f"   {name}")
+        print(f"\nText columns (== / != only): {', '.join(table.text)}\n")
+        return
+
+    try:
+        result = screen_symbols(args.expression, args.listings, table=table)
+    except ScreenError as e:
+        print(f"❌ {e}")
+        raise SystemExit(2)
+
+    print(f"\n🔎 {args.expression}")
+    print(f"   {result['listings']} listings passed in {result['elapsed_ms']:.2f} ms → "
+          f"{len(result['symbols'])} Bloomberg symbols")
+    for symbol in result['symbols'][:50]:
+        print(f"   - {symbol}")
+    if len(result['symbols']) > 50:
+        print(f"   ... and {len(result['symbols']) - 50} more")
+    if result['unmapped']:
+        print(f"\n⚠️  {len(result['unmapped'])} passing listings have no Bloomberg symbol, e.g. "
+              f"{', '.join(result['unmapped'][:5])}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
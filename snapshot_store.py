@@ -0,0 +1,317 @@
+"""
+Snapshot Store
+==============
+Fingerprint every refresh's parsed values and keep only what changed.
+
+For annual fundamentals most refreshes return exactly yesterday's numbers,
+yet every refresh used to write a new set of timestamped files. Each
+refresh's long table (see highlights_parser) is now fingerprinted and
+compared with the symbol's previous snapshot:
+
+- same fingerprint: nothing is written (and the downloader skips the
+  per-symbol files too)
+- a few values differ: a delta with only the changed cells is written,
+  pointing at the symbol's last full snapshot
+- the layout changed (other rows / periods) or the delta would cover more
+  than `rebase_ratio` of the cells: a new full snapshot is written
+
+Deltas always point at a full snapshot, never at another delta, so any
+snapshot is rebuilt from at most two rows. One SQLite row per snapshot:
+
+    symbol | seq | taken_at | fingerprint | base_seq | cells | changed | payload
+
+base_seq is NULL for full snapshots; payload is zlib-compressed JSON (all
+rows for a full snapshot, {row: value} for a delta). Symbols are stored by
+their bare code ("HDFCB"); "HDFCB IN" / "HDFCB IN Equity" find the same rows.
+
+Usage:
+    snapshots = SnapshotStore("output/snapshots.sqlite")
+    saved = snapshots.save("HDFCB", table)      # {'kind': 'unchanged' | 'delta' | 'full', ...}
+    table = snapshots.load("HDFCB", seq=3)      # full long table, rebuilt
+
+    python snapshot_store.py output/snapshots.sqlite
+    python snapshot_store.py output/snapshots.sqlite HDFCB --seq 3 --output hdfcb.csv
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from highlights_parser import COLUMNS
+from symbol_universe import bare_symbol
+
+
+FULL = "full"
+DELTA = "delta"
+UNCHANGED = "unchanged"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    symbol      TEXT NOT NULL,
+    seq         INTEGER NOT NULL,
+    taken_at    REAL NOT NULL,
+    fingerprint TEXT NOT NULL,
+    base_seq    INTEGER,
+    cells       INTEGER NOT NULL,
+    changed     INTEGER NOT NULL,
+    payload     BLOB NOT NULL,
+    PRIMARY KEY (symbol, seq)
+)
+"""
+
+
+def fingerprint(table: pd.DataFrame) -> str:
+    """Hash of a long table's layout and values (symbol column ignored)"""
+    return _digest(_rows(table))
+
+
+def _digest(rows: list) -> str:
+    return hashlib.sha256(json.dumps(rows, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _rows(table: pd.DataFrame) -> list:
+    """Long table as JSON-safe rows: [mnemonic, label, period, period_end, is_estimate, value]"""
+    ends = table["period_end"]
+    ends = np.where(ends.isna(), None, ends.dt.strftime("%Y-%m-%d")) if len(table) else []
+    values = table["value"].to_numpy(dtype="float64")
+    return [
+        [str(m), str(l), str(p), e, bool(est), None if np.isnan(v) else float(v)]
+        for m, l, p, e, est, v in zip(table["mnemonic"], table["label"], table["fiscal_period"],
+                                      ends, table["is_estimate"], values)
+    ]
+
+
+def _pack(data) -> bytes:
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def _unpack(payload: bytes):
+    return json.loads(zlib.decompress(payload))
+
+
+class SnapshotStore:
+    """Full and delta snapshots of every symbol's parsed values"""
+
+    def __init__(self, path, rebase_ratio: float = 0.5):
+        """
+        Args:
+            path: SQLite file (created if missing)
+            rebase_ratio: Write a full snapshot instead of a delta once more
+                          than this share of the cells changed
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.rebase_ratio = rebase_ratio
+        # The pipeline exports on a background thread and workers share the file
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.stats = {FULL: 0, DELTA: 0, UNCHANGED: 0, 'bytes': 0, 'cells': 0}
+
+    def latest(self, symbol: str) -> dict:
+        """Newest snapshot's seq, taken_at, fingerprint and base_seq, or None"""
+        symbol = bare_symbol(symbol)
+        row = self._conn.execute(
+            "SELECT seq, taken_at, fingerprint, base_seq FROM snapshots "
+            "WHERE symbol = ? ORDER BY seq DESC LIMIT 1", (symbol,)).fetchone()
+        return dict(zip(('seq', 'taken_at', 'fingerprint', 'base_seq'), row)) if row else None
+
+    def save(self, symbol: str, table: pd.DataFrame, taken_at: datetime = None) -> dict:
+        """
+        Record one refresh of a symbol, writing as little as possible
+
+        Args:
+            symbol: Symbol ("HDFCB"; "HDFCB IN Equity" also works)
+            table: Long table of the refresh (highlights_parser.parse_grid)
+            taken_at: When the refresh ran (default: now)
+
+        Returns:
+            {'kind': 'unchanged' | 'delta' | 'full', 'seq', 'base_seq',
+             'changed' (cells that differ from the previous snapshot), 'bytes'}
+        """
+        symbol = bare_symbol(symbol)
+        rows = _rows(table)
+        digest = _digest(rows)
+        taken = (taken_at or datetime.now()).timestamp()
+
+        with self._lock:
+            latest = self.latest(symbol)
+            if latest is not None and latest['fingerprint'] == digest:
+                self.stats[UNCHANGED] += 1
+                return {'kind': UNCHANGED, 'seq': latest['seq'], 'base_seq': latest['base_seq'],
+                        'changed': 0, 'bytes': 0}
+
+            kind, base_seq, payload = FULL, None, rows
+            changed = len(rows)
+            if latest is not None:
+                base_seq = latest['base_seq'] if latest['base_seq'] is not None else latest['seq']
+                base = self._payload(symbol, base_seq)
+                previous = self._rebuild(symbol, latest['seq'], base)
+                changed = _count_changes(previous, rows)
+                delta = _delta(base, rows)
+                if delta is not None and len(delta) <= self.rebase_ratio * len(rows):
+                    kind, payload = DELTA, delta
+                else:
+                    base_seq = None
+
+            blob = _pack(payload)
+            seq = latest['seq'] + 1 if latest is not None else 1
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO snapshots (symbol, seq, taken_at, fingerprint, base_seq, cells, "
+                    "changed, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (symbol, seq, taken, digest, base_seq, len(rows), changed, blob))
+            self.stats[kind] += 1
+            self.stats['bytes'] += len(blob)
+            self.stats['cells'] += changed
+        return {'kind': kind, 'seq': seq, 'base_seq': base_seq, 'changed': changed,
+                'bytes': len(blob)}
+
+    def load(self, symbol: str, seq: int = None, as_of: datetime = None) -> pd.DataFrame:
+        """
+        Rebuild a full snapshot
+
+        Args:
+            symbol: Symbol ("HDFCB"; "HDFCB IN Equity" also works)
+            seq: Snapshot number (default: the newest)
+            as_of: Instead of seq, the newest snapshot taken at or before this time
+
+        Returns:
+            Long table with the highlights_parser columns, or None if there is no such snapshot
+        """
+        symbol = bare_symbol(symbol)
+        query = "SELECT seq FROM snapshots WHERE symbol = ?"
+        params = [symbol]
+        if seq is not None:
+            query += " AND seq = ?"
+            params.append(seq)
+        elif as_of is not None:
+            query += " AND taken_at <= ?"
+            params.append(as_of.timestamp())
+        found = self._conn.execute(query + " ORDER BY seq DESC LIMIT 1", params).fetchone()
+        if found is None:
+            return None
+        rows = self._rebuild(symbol, found[0])
+        frame = pd.DataFrame(rows, columns=COLUMNS[1:])
+        frame.insert(0, "symbol", symbol)
+        frame["period_end"] = pd.to_datetime(frame["period_end"]).astype("datetime64[ns]")
+        frame["is_estimate"] = frame["is_estimate"].astype(bool)
+        frame["value"] = frame["value"].astype("float64")
+        for column in ("symbol", "mnemonic", "label", "fiscal_period"):
+            frame[column] = frame[column].astype("category")
+        return frame
+
+    def rows(self, symbol: str) -> list:
+        """Newest snapshot as [mnemonic, label, period, period_end, is_estimate, value] rows, or None"""
+        symbol = bare_symbol(symbol)
+        latest = self.latest(symbol)
+        return self._rebuild(symbol, latest['seq']) if latest is not None else None
+
+    def fingerprints(self) -> dict:
+        """{symbol: fingerprint of its newest snapshot} for every symbol"""
+        return dict(self._conn.execute(
+            "SELECT symbol, fingerprint FROM snapshots AS s "
+            "WHERE seq = (SELECT MAX(seq) FROM snapshots WHERE symbol = s.symbol)"))
+
+    def history(self, symbol: str = None) -> list:
+        """Every snapshot (without payload) of one symbol, or of all symbols"""
+        query = ("SELECT symbol, seq, taken_at, fingerprint, base_seq, cells, changed, "
+                 "length(payload) FROM snapshots")
+        params = ()
+        if symbol is not None:
+            query += " WHERE symbol = ?"
+            params = (bare_symbol(symbol),)
+        keys = ('symbol', 'seq', 'taken_at', 'fingerprint', 'base_seq', 'cells', 'changed', 'bytes')
+        return [dict(zip(keys, row)) for row in self._conn.execute(query + " ORDER BY symbol, seq", params)]
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _payload(self, symbol: str, seq: int):
+        row = self._conn.execute("SELECT payload FROM snapshots WHERE symbol = ? AND seq = ?",
+                                 (symbol, seq)).fetchone()
+        return _unpack(row[0])
+
+    def _rebuild(self, symbol: str, seq: int, base: list = None) -> list:
+        """Rows of snapshot seq (base: the full snapshot's rows, if already loaded)"""
+        base_seq, payload = self._conn.execute(
+            "SELECT base_seq, payload FROM snapshots WHERE symbol = ? AND seq = ?",
+            (symbol, seq)).fetchone()
+        if base_seq is None:
+            return _unpack(payload)
+        rows = [list(row) for row in (base if base is not None else self._payload(symbol, base_seq))]
+        for i, value in _unpack(payload).items():
+            rows[int(i)][-1] = value
+        return rows
+
+
+def _delta(base: list, rows: list) -> dict:
+    """{row: value} turning base into rows, or None if their layouts differ"""
+    if len(base) != len(rows):
+        return None
+    delta = {}
+    for i, (old, new) in enumerate(zip(base, rows)):
+        if old[:-1] != new[:-1]:
+            return None
+        if old[-1] != new[-1]:
+            delta[i] = new[-1]
+    return delta
+
+
+def _count_changes(previous: list, rows: list) -> int:
+    """Cells that differ between two snapshots (every cell if the layout changed)"""
+    if len(previous) != len(rows):
+        return len(rows)
+    return sum(1 for old, new in zip(previous, rows) if old != new)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List or rebuild refresh snapshots')
+    parser.add_argument('store', help='Snapshot store (e.g. output/snapshots.sqlite)')
+    parser.add_argument('symbol', nargs='?', help='Symbol to list or rebuild')
+    parser.add_argument('--seq', type=int, help='Snapshot to rebuild (default: newest)')
+    parser.add_argument('--output', '-o', help='Write the rebuilt snapshot to this CSV')
+    args = parser.parse_args()
+
+    if not Path(args.store).exists():
+        print(f"❌ Snapshot store not found: {args.store}")
+        return
+    store = SnapshotStore(args.store)
+    try:
+        if args.output:
+            started = time.perf_counter()
+            table = store.load(args.symbol, seq=args.seq)
+            if table is None:
+                print(f"❌ No snapshot for {args.symbol}")
+                return
+            table.to_csv(args.output, index=False)
+            print(f"✅ Rebuilt {len(table)} values in {(time.perf_counter() - started) * 1000:.1f} ms "
+                  f"→ {args.output}")
+            return
+
+        history = store.history(args.symbol)
+        print(f"{'symbol':16s} {'seq':>4s} {'taken':16s} {'kind':6s} {'changed':>8s} {'bytes':>7s}")
+        for item in history:
+            kind = FULL if item['base_seq'] is None else f"Δ{item['base_seq']}"
+            taken = datetime.fromtimestamp(item['taken_at']).strftime("%Y-%m-%d %H:%M")
+            print(f"{item['symbol']:16s} {item['seq']:4d} {taken:16s} {kind:6s} "
+                  f"{item['changed']:8d} {item['bytes']:7d}")
+        total = sum(item['bytes'] for item in history)
+        print(f"\n📦 {len(history)} snapshots, {total / 1024:.1f} KB")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
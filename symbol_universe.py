@@ -0,0 +1,316 @@
+"""
+Symbol Universe Index
+=====================
+BB_symbol.csv parsed once into compact arrays plus a search index, cached on
+disk and rebuilt only when the CSV actually changes.
+
+- Rows keep the CSV order (largest market cap first)
+- Numeric columns are float64 arrays (array.array, so loading the cache
+  does not import numpy); text columns are plain lists
+- Prefix index: sorted symbol keys and sorted name words, searched by bisect
+- Trigram index: trigram → row ids over symbol and short name, for substring
+  and typo-tolerant matches ranked by trigram similarity
+
+The cache (.cache/<csv name>.universe.pkl next to the CSV) is reused while
+the CSV's size and mtime are unchanged; if those changed but the content
+hash did not (e.g. the file was copied), the cache is kept too.
+
+Usage:
+    universe = SymbolUniverse.load("BB_symbol.csv")
+    for row, score in universe.search("hdfc bank", limit=10):
+        print(universe.symbols[row], universe.names[row], score)
+
+universe.symbols holds the bare exchange codes ("HDFCB"), the form the
+template and --symbols expect; universe.tickers keeps "HDFCB IN Equity".
+"""
+
+import bisect
+import csv
+import math
+import hashlib
+import os
+import pickle
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+
+
+CACHE_VERSION = 3
+DEFAULT_CSV = "BB_symbol.csv"
+TICKER_SUFFIX = " Equity"
+EXCHANGE_SUFFIX = " IN"
+
+# Relevance scores; trigram similarity (0..1) is added on top
+EXACT_SYMBOL = 100.0
+SYMBOL_PREFIX = 80.0
+NAME_PREFIX = 60.0
+SUBSTRING = 40.0
+FUZZY = 20.0
+# Share of the query's trigrams a fuzzy (non prefix/substring) match must contain
+FUZZY_THRESHOLD = 0.5
+
+_NON_ALNUM_RE = re.compile(r"[^A-Z0-9&]+")
+
+
+def normalise(text) -> str:
+    """Upper-case, punctuation folded to single spaces"""
+    return _NON_ALNUM_RE.sub(" ", str(text).upper()).strip()
+
+
+def bare_symbol(symbol) -> str:
+    """
+    Exchange code of a symbol or ticker, as the template expects it
+
+    "HDFCB IN Equity", "HDFCB IN" and "hdfcb" all become "HDFCB".
+    """
+    code = str(symbol).strip().upper()
+    if code.endswith(TICKER_SUFFIX.upper()):
+        code = code[:-len(TICKER_SUFFIX)].rstrip()
+    if code.endswith(EXCHANGE_SUFFIX):
+        code = code[:-len(EXCHANGE_SUFFIX)].rstrip()
+    return code
+
+
+def trigrams(text: str) -> set:
+    """Trigrams of a normalised string, padded so word starts count"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def _number(value: str) -> float:
+    try:
+        return float(value.replace(",", ""))
+    except (AttributeError, ValueError):
+        return math.nan
+
+
+class SymbolUniverse:
+    """In-memory Bloomberg symbol list with prefix and trigram indexes"""
+
+    def __init__(self, tickers: list, names: list, numeric: dict, source: dict = None):
+        """
+        Use SymbolUniverse.load() rather than calling this directly.
+
+        Args:
+            tickers: Bloomberg tickers ("HDFCB IN Equity"), in CSV order
+            names: Short names, same order
+            numeric: {column name: float64 array('d')} for the numeric columns
+            source: Size, mtime and hash of the CSV the arrays came from
+        """
+        self.tickers = tickers
+        self.symbols = [bare_symbol(t) for t in tickers]
+        self.names = names
+        self.numeric = numeric
+        self.source = source or {}
+        self._build_index()
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def _build_index(self) -> None:
+        self._symbol_keys = [normalise(s) for s in self.symbols]
+        self._name_keys = [normalise(n) for n in self.names]
+
+        # Sorted (key, row) pairs for bisect prefix lookups
+        self._symbol_sorted = sorted((key, row) for row, key in enumerate(self._symbol_keys))
+        words = set()
+        for row, key in enumerate(self._name_keys):
+            words.add((key, row))
+            words.update((word, row) for word in key.split())
+        self._name_sorted = sorted(words)
+        self.row_of = {symbol: row for row, symbol in enumerate(self._symbol_keys)}
+
+        postings = {}
+        self._gram_counts = []
+        for row in range(len(self)):
+            grams = trigrams(self._symbol_keys[row]) | trigrams(self._name_keys[row])
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(row)
+        self._postings = postings
+
+    @classmethod
+    def from_csv(cls, csv_path=DEFAULT_CSV) -> "SymbolUniverse":
+        """
+        Parse BB_symbol.csv (a Bloomberg screen export)
+
+        Lines above the "Ticker,..." header row (screen settings) are skipped.
+        """
+        path = Path(csv_path)
+        with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+            rows = list(csv.reader(f))
+
+        header_at = next((i for i, row in enumerate(rows)
+                          if row and row[0].strip() == "Ticker"), None)
+        if header_at is None:
+            raise ValueError(f"No 'Ticker' header row found in {path}")
+        header = [h.strip() for h in rows[header_at]]
+        body = [row for row in rows[header_at + 1:] if row and row[0].strip()]
+
+        tickers = [row[0].strip() for row in body]
+        name_at = header.index("Short Name") if "Short Name" in header else None
+        names = [row[name_at].strip() if name_at is not None and len(row) > name_at else ""
+                 for row in body]
+
+        numeric = {}
+        for col, column in enumerate(header):
+            if col in (0, name_at) or not column or column in numeric:
+                continue
+            numeric[column] = array(
+                "d", [_number(row[col]) if len(row) > col else math.nan for row in body]
+            )
+
+        stat = path.stat()
+        source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': _file_hash(path)}
+        return cls(tickers, names, numeric, source)
+
+    @staticmethod
+    def cache_path(csv_path) -> Path:
+        path = Path(csv_path)
+        return path.parent / ".cache" / f"{path.name}.universe.pkl"
+
+    @classmethod
+    def load(cls, csv_path=DEFAULT_CSV, use_cache: bool = True) -> "SymbolUniverse":
+        """
+        Load the universe from the on-disk cache, rebuilding it if the CSV changed
+
+        Args:
+            csv_path: Bloomberg symbol CSV
+            use_cache: Read/write the cache file (False always parses the CSV)
+
+        Returns:
+            SymbolUniverse
+        """
+        path = Path(csv_path)
+        if not use_cache:
+            return cls.from_csv(path)
+
+        cache = cls.cache_path(path)
+        stat = path.stat()
+        state = None
+        try:
+            with open(cache, "rb") as f:
+                state = pickle.load(f)
+        except Exception:
+            pass
+
+        if state is not None and state.get('version') == CACHE_VERSION:
+            source = state['source']
+            if source['size'] == stat.st_size and source['mtime_ns'] == stat.st_mtime_ns:
+                return cls._from_state(state)
+            if source['size'] == stat.st_size and source['sha1'] == _file_hash(path):
+                # Touched or copied but not changed: keep the cache, note the new mtime
+                state['source']['mtime_ns'] = stat.st_mtime_ns
+                cls._write_cache(cache, state)
+                return cls._from_state(state)
+
+        universe = cls.from_csv(path)
+        cls._write_cache(cache, universe._state())
+        return universe
+
+    def _state(self) -> dict:
+        return {
+            'version': CACHE_VERSION,
+            'source': self.source,
+            'tickers': self.tickers,
+            'names': self.names,
+            'numeric': self.numeric,
+            'index': (self._symbol_keys, self._name_keys, self._symbol_sorted,
+                      self._name_sorted, self.row_of, self._gram_counts, self._postings),
+        }
+
+    @classmethod
+    def _from_state(cls, state: dict) -> "SymbolUniverse":
+        universe = cls.__new__(cls)
+        universe.tickers = state['tickers']
+        universe.symbols = [bare_symbol(t) for t in universe.tickers]
+        universe.names = state['names']
+        universe.numeric = state['numeric']
+        universe.source = state['source']
+        (universe._symbol_keys, universe._name_keys, universe._symbol_sorted,
+         universe._name_sorted, universe.row_of, universe._gram_counts,
+         universe._postings) = state['index']
+        return universe
+
+    @staticmethod
+    def _write_cache(cache: Path, state: dict) -> None:
+        """Write atomically so a half-written cache is never read"""
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _prefixed(sorted_pairs: list, prefix: str):
+        """Rows whose key starts with prefix, from (key, row) pairs sorted by key"""
+        i = bisect.bisect_left(sorted_pairs, (prefix,))
+        while i < len(sorted_pairs) and sorted_pairs[i][0].startswith(prefix):
+            yield sorted_pairs[i]
+            i += 1
+
+    def lookup(self, symbol: str):
+        """Row of an exact symbol ("HDFCB", "HDFCB IN" or "HDFCB IN Equity"), or None"""
+        return self.row_of.get(normalise(bare_symbol(symbol)))
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """
+        Relevance-ranked matches on symbol and short name
+
+        Exact symbol > symbol prefix > name word prefix > substring > fuzzy.
+        Prefix tiers are ordered by market cap, the others by trigram
+        similarity and then market cap.
+
+        Args:
+            query: Search text (case and punctuation are ignored)
+            limit: Maximum number of results (None: all)
+
+        Returns:
+            [(row, score)] best first
+        """
+        q = normalise(bare_symbol(query))
+        if not q:
+            return []
+        scores = {}
+
+        for key, row in self._prefixed(self._symbol_sorted, q):
+            scores[row] = EXACT_SYMBOL if key == q else SYMBOL_PREFIX
+        for _, row in self._prefixed(self._name_sorted, q):
+            scores.setdefault(row, NAME_PREFIX)
+
+        grams = trigrams(q)
+        hits = Counter()
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings:
+                hits.update(postings)
+
+        for row, count in hits.items():
+            similarity = 2.0 * count / (len(grams) + self._gram_counts[row])
+            if row in scores:
+                # Prefix matches rank by market cap (row order) within their tier
+                continue
+            if q in self._symbol_keys[row] or q in self._name_keys[row]:
+                scores[row] = SUBSTRING + similarity
+            elif count / len(grams) >= FUZZY_THRESHOLD:
+                scores[row] = FUZZY + similarity
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
+
+    def to_frame(self):
+        """The universe as a DataFrame (Ticker, Symbol, Short Name, numeric columns)"""
+        import pandas as pd
+        frame = pd.DataFrame({'Ticker': self.tickers, 'Symbol': self.symbols,
+                              'Short Name': self.names})
+        for column, values in self.numeric.items():
+            frame[column] = values
+        return frame
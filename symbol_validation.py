@@ -0,0 +1,178 @@
+"""
+Pre-flight Symbol Validation
+============================
+Catch bad tickers before any template is patched or Excel is opened.
+
+A typo, a delisted name or a ticker missing from BB_symbol.csv used to cost
+a full template rewrite plus a 15-20s refresh, only to come back as
+"#N/A Invalid Security". Before a run, every requested symbol is now:
+
+- looked up in the cached symbol universe (see symbol_universe); symbols it
+  does not know are reported with close matches and left out (unless
+  --allow-unknown, since the CSV can lag behind new listings)
+- checked against a negative cache of symbols Bloomberg rejected earlier;
+  those are skipped until their entry expires (default 30 days), then
+  tried once more
+
+One SQLite row per rejected symbol:
+
+    symbol | first_seen | last_seen | failures | seconds | error
+
+A symbol that later refreshes fine is removed from the negative cache.
+
+Usage:
+    invalid = InvalidSymbolCache("output/invalid_symbols.sqlite")
+    report = preflight(["HDFCB", "HDFBC"], SymbolUniverse.load(), invalid)
+    print_preflight(report)
+    ... refresh report['ok'] ...
+    invalid.record("XXXX", "Invalid Security", seconds=17.5)
+    invalid.close()
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+
+
+DEFAULT_INVALID_TTL = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS invalid_symbols (
+    symbol     TEXT PRIMARY KEY,
+    first_seen REAL NOT NULL,
+    last_seen  REAL NOT NULL,
+    failures   INTEGER NOT NULL,
+    seconds    REAL,
+    error      TEXT
+)
+"""
+
+
+class InvalidSymbolCache:
+    """Symbols Bloomberg rejected, with when and how long the attempt took"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: SQLite file (created if missing)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM invalid_symbols").fetchone()[0]
+
+    def check(self, symbols: list, ttl_days: float = DEFAULT_INVALID_TTL, now: float = None) -> dict:
+        """
+        Symbols rejected within the last ttl_days
+
+        Returns:
+            {symbol: {'first_seen', 'last_seen', 'failures', 'seconds', 'error'}}
+        """
+        cutoff = (now or time.time()) - ttl_days * 86400
+        found = {}
+        symbols = list(dict.fromkeys(symbols))
+        # Stay under SQLite's limit on bound parameters
+        for i in range(0, len(symbols), 500):
+            chunk = symbols[i:i + 500]
+            rows = self._conn.execute(
+                "SELECT symbol, first_seen, last_seen, failures, seconds, error FROM invalid_symbols "
+                f"WHERE last_seen >= ? AND symbol IN ({', '.join('?' * len(chunk))})",
+                [cutoff, *chunk])
+            for symbol, *values in rows:
+                found[symbol] = dict(zip(('first_seen', 'last_seen', 'failures', 'seconds', 'error'),
+                                         values))
+        return found
+
+    def record(self, symbol: str, error: str, seconds: float = None) -> None:
+        """Remember that Bloomberg rejected a symbol (again)"""
+        now = time.time()
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO invalid_symbols (symbol, first_seen, last_seen, failures, seconds, error) "
+                "VALUES (?, ?, ?, 1, ?, ?) ON CONFLICT(symbol) DO UPDATE SET "
+                "last_seen = excluded.last_seen, failures = failures + 1, "
+                "seconds = COALESCE(excluded.seconds, seconds), error = excluded.error",
+                (symbol, now, now, seconds, error))
+
+    def clear(self, symbols: list) -> int:
+        """
+        Forget symbols that refreshed fine after all
+
+        Returns:
+            Number of entries removed
+        """
+        with self._conn:
+            return sum(self._conn.execute("DELETE FROM invalid_symbols WHERE symbol = ?",
+                                          (symbol,)).rowcount for symbol in symbols)
+
+    def typical_seconds(self) -> float:
+        """Median time a rejected symbol's refresh took, or None if none was timed"""
+        import statistics
+
+        seconds = [row[0] for row in self._conn.execute(
+            "SELECT seconds FROM invalid_symbols WHERE seconds IS NOT NULL")]
+        return statistics.median(seconds) if seconds else None
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def preflight(symbols: list, universe=None, invalid: InvalidSymbolCache = None,
+              ttl_days: float = DEFAULT_INVALID_TTL, allow_unknown: bool = False,
+              suggestions: int = 3, refresh_seconds: float = 15.0) -> dict:
+    """
+    Split symbols into those worth refreshing and those that would fail
+
+    Args:
+        symbols: Requested symbols ("HDFCB" or "HDFCB IN")
+        universe: SymbolUniverse to check against (None: no universe check)
+        invalid: Negative cache (None: no negative cache check)
+        ttl_days: Days a rejected symbol stays skipped
+        allow_unknown: Keep symbols the universe does not know
+        suggestions: Close matches listed per unknown symbol
+        refresh_seconds: Estimated cost of a refresh nobody timed yet
+
+    Returns:
+        {'ok': [symbols to refresh], 'unknown': {symbol: [close matches]},
+         'invalid': {symbol: negative cache entry}, 'kept_unknown': bool,
+         'saved_seconds': estimated terminal time the skipped symbols save}
+    """
+    report = {'ok': [], 'unknown': {}, 'invalid': {}, 'kept_unknown': allow_unknown,
+              'saved_seconds': 0.0}
+    symbols = list(dict.fromkeys(symbols))
+    rejected = invalid.check(symbols, ttl_days) if invalid is not None else {}
+    typical = (invalid.typical_seconds() if invalid is not None else None) or refresh_seconds
+
+    for symbol in symbols:
+        if symbol in rejected:
+            report['invalid'][symbol] = rejected[symbol]
+            report['saved_seconds'] += rejected[symbol]['seconds'] or typical
+            continue
+        if universe is not None and universe.lookup(symbol) is None:
+            report['unknown'][symbol] = [universe.symbols[row]
+                                         for row, _ in universe.search(symbol, limit=suggestions)]
+            if not allow_unknown:
+                report['saved_seconds'] += typical
+                continue
+        report['ok'].append(symbol)
+    return report
+
+
+def print_preflight(report: dict, ttl_days: float = DEFAULT_INVALID_TTL) -> None:
+    """Console report of what preflight() left out and why"""
+    if report['unknown']:
+        action = "refreshing anyway" if report['kept_unknown'] else "skipped, --allow-unknown to refresh"
+        print(f"❓ {len(report['unknown'])} symbols not in BB_symbol.csv ({action}):")
+        for symbol, matches in report['unknown'].items():
+            hint = f" - did you mean {', '.join(matches)}?" if matches else ""
+            print(f"   {symbol}{hint}")
+    if report['invalid']:
+        print(f"🚫 {len(report['invalid'])} symbols Bloomberg rejected in the last {ttl_days:g} days "
+              f"(skipped, --invalid-ttl 0 to retry):")
+        for symbol, entry in report['invalid'].items():
+            print(f"   {symbol}: {entry['error']} ({entry['failures']}x, last "
+                  f"{time.strftime('%Y-%m-%d', time.localtime(entry['last_seen']))})")
@@ -0,0 +1,340 @@
+"""
+Template Catalog
+================
+Index every sheet of the FA template by line item (mnemonic) and period
+column, and cut the template down to the rows a job actually needs.
+
+A job that only wants market cap and EV still refreshed every formula of
+the template (each one a data hit) and copied every sheet back through COM.
+With a field set the downloader patches a trimmed template instead:
+
+- rows of "BBG Adj Highlights" whose mnemonic is not selected are removed
+  (title, period header and "12 Months Ending" rows stay, so the values
+  parse exactly as before, only with fewer line items)
+- other sheets are dropped; only "BBG Adj Highlights" is rewritten per
+  symbol, the rest only add refresh time and copies
+- calcChain.xml is dropped (it lists the removed cells); Excel rebuilds it
+  on the full recalculation the patched copies ask for anyway
+
+Removed rows leave empty rows behind rather than renumbering the sheet, so
+kept formulas that point at other cells still point at the right ones (a
+kept row computed from a removed one, e.g. a margin, comes back empty).
+
+Fields are named sets (see FIELD_SETS) and/or mnemonics, comma-separated:
+"valuation", "valuation,EBITDA", "SALES_REV_TURN,EBITDA".
+
+Usage:
+    catalog = TemplateCatalog.build("FA1_vwijagme.xlsx")
+    catalog.resolve("valuation")                 # ['HISTORICAL_MARKET_CAP', ...]
+    compiled = compile_template("FA1_vwijagme.xlsx", fields="valuation")
+    compiled.write("HDFCB", "temp_HDFCB.xlsx")
+
+    python template_catalog.py FA1_vwijagme.xlsx
+    python template_catalog.py FA1_vwijagme.xlsx --fields valuation -o valuation.xlsx
+"""
+
+import argparse
+import io
+import re
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from highlights_parser import MNEMONIC_RE, PERIOD_RE
+from template_patcher import (CALC_CHAIN_PART, CELL_RE, CONTENT_TYPES_PART, SHARED_INDEX_RE,
+                              SHEET_NAME, TEXT_RE, WORKBOOK_PART, WORKBOOK_RELS_PART,
+                              CompiledTemplate, _member_info, _resolve_sheet_part,
+                              _shared_strings, _unescape)
+
+
+# Named field sets for --fields
+FIELD_SETS = {
+    'valuation': ("HISTORICAL_MARKET_CAP", "CASH_AND_MARKETABLE_SECURITIES",
+                  "PFD_EQTY_MINORTY_INTEREST", "SHORT_AND_LONG_TERM_DEBT", "ENTERPRISE_VALUE"),
+    'income': ("SALES_REV_TURN", "SALES_GROWTH", "GROSS_PROFIT", "EBITDA", "EARN_FOR_COMMON",
+               "IS_DIL_EPS_CONT_OPS", "DILUTED_EPS_AFT_XO_ITEMS_GROWTH"),
+    'cashflow': ("CF_CASH_FROM_OPER", "CAPITAL_EXPEND", "CF_FREE_CASH_FLOW"),
+    # Everything fundamentals.py computes its ratios from
+    'ratios': ("HISTORICAL_MARKET_CAP", "CASH_AND_MARKETABLE_SECURITIES",
+               "PFD_EQTY_MINORTY_INTEREST", "SHORT_AND_LONG_TERM_DEBT", "ENTERPRISE_VALUE",
+               "SALES_REV_TURN", "GROSS_PROFIT", "EBITDA", "EARN_FOR_COMMON",
+               "IS_DIL_EPS_CONT_OPS", "CF_CASH_FROM_OPER", "CAPITAL_EXPEND", "CF_FREE_CASH_FLOW"),
+}
+
+ROW_RE = re.compile(r'<row\b[^>]*?\br="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.S)
+CELL_COLUMN_RE = re.compile(r'\br="([A-Z]+)\d+"')
+INLINE_TEXT_RE = re.compile(r"<is>(.*?)</is>", re.S)
+NUMBER_RE = re.compile(r"<v>(.*?)</v>", re.S)
+SHEET_TAG_RE = re.compile(r'<sheet\b[^>]*\bname="([^"]*)"[^>]*/>')
+DEFINED_NAME_RE = re.compile(r"<definedName\b[^>]*>.*?</definedName>|<definedName\b[^>]*/>", re.S)
+
+
+def _cell_text(cell: str, shared: list) -> str:
+    """Displayed text of a string cell ("" for numbers, formulas and blanks)"""
+    if 't="s"' in cell:
+        index = SHARED_INDEX_RE.search(cell)
+        if index is not None and int(index.group(1)) < len(shared):
+            return shared[int(index.group(1))].strip()
+        return ""
+    if 't="inlineStr"' in cell:
+        inline = INLINE_TEXT_RE.search(cell)
+        if inline is not None:
+            return "".join(_unescape(t.group(1) or "") for t in TEXT_RE.finditer(inline.group(1))
+                           if not t.group(0).startswith("<rPh")).strip()
+    if 't="str"' in cell and "<f" not in cell:
+        value = NUMBER_RE.search(cell)
+        return _unescape(value.group(1)).strip() if value else ""
+    return ""
+
+
+def _index_sheet(sheet_xml: str, shared: list) -> dict:
+    """
+    Line items and period columns of one worksheet
+
+    Returns:
+        {'periods': {column: period}, 'rows': [{'row', 'label', 'mnemonic',
+         'formulas'}] for every row with a mnemonic in column B, 'formulas'
+         (formula cells on the whole sheet)}
+    """
+    index = {'periods': {}, 'rows': [], 'formulas': 0}
+    for row_match in ROW_RE.finditer(sheet_xml):
+        texts, formulas = {}, 0
+        for cell in CELL_RE.findall(row_match.group(0)):
+            column = CELL_COLUMN_RE.search(cell)
+            if column is None:
+                continue
+            if "<f" in cell:
+                formulas += 1
+            else:
+                texts[column.group(1)] = _cell_text(cell, shared)
+        index['formulas'] += formulas
+
+        periods = {c: t for c, t in texts.items() if PERIOD_RE.match(t)}
+        if not index['periods'] and len(periods) >= 2:
+            index['periods'] = periods
+            continue
+        mnemonic = texts.get("B", "")
+        if MNEMONIC_RE.match(mnemonic):
+            index['rows'].append({'row': int(row_match.group(1)), 'label': texts.get("A", ""),
+                                  'mnemonic': mnemonic, 'formulas': formulas})
+    return index
+
+
+class TemplateCatalog:
+    """Every sheet's line items and periods, and trimmed copies of the template"""
+
+    def __init__(self, source: bytes, sheets: dict, parts: dict):
+        """
+        Use TemplateCatalog.build() rather than calling this directly.
+
+        Args:
+            source: Template file contents
+            sheets: {sheet name: index} in workbook order (see _index_sheet)
+            parts: {sheet name: zip member of the worksheet}
+        """
+        self.source = source
+        self.sheets = sheets
+        self.parts = parts
+
+    @classmethod
+    def build(cls, template_path) -> "TemplateCatalog":
+        """Scan every worksheet of the template once"""
+        source = Path(template_path).read_bytes()
+        sheets, parts = {}, {}
+        with zipfile.ZipFile(io.BytesIO(source)) as archive:
+            workbook = archive.read(WORKBOOK_PART).decode("utf-8")
+            try:
+                shared = _shared_strings(archive.read("xl/sharedStrings.xml").decode("utf-8"))
+            except KeyError:
+                shared = []
+            for name in SHEET_TAG_RE.findall(workbook):
+                name = _unescape(name)
+                parts[name] = _resolve_sheet_part(archive, name)
+                sheets[name] = _index_sheet(archive.read(parts[name]).decode("utf-8"), shared)
+        return cls(source, sheets, parts)
+
+    def mnemonics(self, sheet_name: str = SHEET_NAME) -> list:
+        """Mnemonics of a sheet in row order, each once"""
+        return list(dict.fromkeys(row['mnemonic'] for row in self.sheets[sheet_name]['rows']))
+
+    def resolve(self, fields: str, sheet_name: str = SHEET_NAME) -> list:
+        """
+        Turn a --fields value into the mnemonics to keep
+
+        Args:
+            fields: Field set names and/or mnemonics, comma-separated
+            sheet_name: Sheet the mnemonics must be on
+
+        Returns:
+            Mnemonics in template row order
+
+        Raises:
+            ValueError: Unknown field set, or a mnemonic the sheet does not have
+        """
+        available = self.mnemonics(sheet_name)
+        wanted = set()
+        for name in (part.strip() for part in (fields or "").split(",")):
+            if not name:
+                continue
+            if name.lower() in FIELD_SETS:
+                wanted.update(m for m in FIELD_SETS[name.lower()] if m in available)
+            elif name.upper() in available:
+                wanted.add(name.upper())
+            else:
+                raise ValueError(f"Unknown field '{name}': not a field set ({', '.join(FIELD_SETS)}) "
+                                 f"or a mnemonic of {sheet_name}")
+        if not wanted:
+            raise ValueError(f"No {sheet_name} rows match the fields '{fields}'")
+        return [m for m in available if m in wanted]
+
+    def formula_count(self, mnemonics: list = None, sheet_name: str = SHEET_NAME) -> int:
+        """Formula cells refreshed per symbol: the whole template, or only these rows"""
+        if mnemonics is None:
+            return sum(index['formulas'] for index in self.sheets.values())
+        keep = set(mnemonics)
+        return sum(row['formulas'] for row in self.sheets[sheet_name]['rows']
+                   if row['mnemonic'] in keep)
+
+    def trim(self, mnemonics: list, sheet_name: str = SHEET_NAME) -> bytes:
+        """
+        Template with only the rows of these mnemonics and no other sheets
+
+        Args:
+            mnemonics: Mnemonics to keep (see resolve)
+            sheet_name: The sheet rewritten per symbol
+
+        Returns:
+            xlsx file contents
+        """
+        keep = set(mnemonics)
+        drop_rows = {row['row'] for row in self.sheets[sheet_name]['rows']
+                     if row['mnemonic'] not in keep}
+        drop_sheets = [name for name in self.sheets if name != sheet_name]
+
+        with zipfile.ZipFile(io.BytesIO(self.source)) as archive:
+            infos = {info.filename: info for info in archive.infolist()}
+            sheet_xml = archive.read(self.parts[sheet_name]).decode("utf-8")
+            workbook = archive.read(WORKBOOK_PART).decode("utf-8")
+            rels = archive.read(WORKBOOK_RELS_PART).decode("utf-8")
+            content_types = archive.read(CONTENT_TYPES_PART).decode("utf-8")
+
+            sheet_xml = ROW_RE.sub(lambda m: "" if int(m.group(1)) in drop_rows else m.group(0),
+                                   sheet_xml)
+            exclude = {CALC_CHAIN_PART}
+            rels = re.sub(r'<Relationship\b[^>]*Target="[^"]*calcChain\.xml"[^>]*/>', "", rels)
+            content_types = re.sub(r'<Override\b[^>]*PartName="/xl/calcChain\.xml"[^>]*/>', "",
+                                   content_types)
+            if drop_sheets:
+                workbook, rels, content_types = self._drop_sheets(
+                    drop_sheets, workbook, rels, content_types, exclude)
+
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w") as trimmed:
+                replaced = {self.parts[sheet_name]: sheet_xml, WORKBOOK_PART: workbook,
+                            WORKBOOK_RELS_PART: rels, CONTENT_TYPES_PART: content_types}
+                for name, info in infos.items():
+                    if name in exclude:
+                        continue
+                    data = replaced[name].encode("utf-8") if name in replaced else archive.read(info)
+                    trimmed.writestr(_member_info(info), data)
+        return buffer.getvalue()
+
+    def _drop_sheets(self, names: list, workbook: str, rels: str, content_types: str,
+                     exclude: set) -> tuple:
+        """Remove whole sheets from the workbook parts; their members go into exclude"""
+        order = [_unescape(n) for n in SHEET_TAG_RE.findall(workbook)]
+        kept = [n for n in order if n not in names]
+        for name in names:
+            part = self.parts[name]
+            exclude.add(part)
+            exclude.add(f"{part.rsplit('/', 1)[0]}/_rels/{part.rsplit('/', 1)[1]}.rels")
+            tag = re.search(r'<sheet\b[^>]*\bname="%s"[^>]*/>' % re.escape(escape(name)), workbook)
+            rel_id = re.search(r'\br:id="([^"]*)"', tag.group(0)).group(1)
+            workbook = workbook.replace(tag.group(0), "")
+            rels = re.sub(r'<Relationship\b[^>]*\bId="%s"[^>]*/>' % re.escape(rel_id), "", rels)
+            content_types = re.sub(r'<Override\b[^>]*PartName="/%s"[^>]*/>' % re.escape(part), "",
+                                   content_types)
+
+        # Names scoped to or pointing at a dropped sheet go; local scopes are renumbered
+        def defined_name(match):
+            tag = match.group(0)
+            local = re.search(r'\blocalSheetId="(\d+)"', tag)
+            if local is not None:
+                old = order[int(local.group(1))]
+                if old in names:
+                    return ""
+                tag = tag.replace(local.group(0), f'localSheetId="{kept.index(old)}"')
+            if any(f"{escape(n)}!" in tag or f"'{escape(n)}'!" in tag for n in names):
+                return ""
+            return tag
+
+        workbook = DEFINED_NAME_RE.sub(defined_name, workbook)
+        workbook = re.sub(r"<definedNames>\s*</definedNames>", "", workbook)
+        # The active / first visible tab may have been a dropped sheet
+        workbook = re.sub(r'\s(?:activeTab|firstSheet)="\d+"', "", workbook)
+        return workbook, rels, content_types
+
+
+def compile_template(template_path, fields: str = None, default_symbol: str = "IOCL") -> CompiledTemplate:
+    """
+    Compile the template, trimmed to a field selection if one is given
+
+    Args:
+        template_path: Bloomberg Excel template
+        fields: --fields value (None: the whole template)
+        default_symbol: Symbol used in the template
+
+    Returns:
+        CompiledTemplate ready to render per-symbol copies
+    """
+    if not fields:
+        return CompiledTemplate.compile(template_path, default_symbol)
+    catalog = TemplateCatalog.build(template_path)
+    return CompiledTemplate.compile(catalog.trim(catalog.resolve(fields)), default_symbol)
+
+
+def fields_suffix(fields: str) -> str:
+    """File name suffix for state that depends on the field selection ("" for the whole template)"""
+    if not fields:
+        return ""
+    return "_" + re.sub(r"[^a-z0-9]+", "_", fields.lower()).strip("_")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List the line items of the template and write trimmed copies')
+    parser.add_argument('template', help='Bloomberg Excel template')
+    parser.add_argument('--fields',
+                       help=f'Field sets ({", ".join(FIELD_SETS)}) and/or mnemonics, comma-separated')
+    parser.add_argument('--output', '-o', help='Write the template trimmed to --fields here')
+    args = parser.parse_args()
+
+    catalog = TemplateCatalog.build(args.template)
+    total = catalog.formula_count()
+    for name, index in catalog.sheets.items():
+        print(f"📄 {name}: {len(index['rows'])} line items × {len(index['periods'])} periods, "
+              f"{index['formulas']} formulas")
+    print(f"\n🧮 {total} formulas refreshed per symbol with the whole template")
+
+    if not args.fields:
+        available = set(catalog.mnemonics())
+        print("\nField sets (--fields):")
+        for name, mnemonics in FIELD_SETS.items():
+            found = [m for m in mnemonics if m in available]
+            print(f"   {name:10s} {len(found):2d} mnemonics, {catalog.formula_count(found):4d} formulas")
+        return
+
+    try:
+        mnemonics = catalog.resolve(args.fields)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    count = catalog.formula_count(mnemonics)
+    print(f"✂️  --fields {args.fields}: {len(mnemonics)} mnemonics, {count} of {total} formulas")
+    print(f"   {', '.join(mnemonics)}")
+    if args.output:
+        Path(args.output).write_bytes(catalog.trim(mnemonics))
+        print(f"💾 Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""
+Compiled Template Patcher
+=========================
+Rewrite the Bloomberg symbol in the FA1 template without a full
+openpyxl load/save per symbol.
+
+The template is "compiled" once: the "BBG Adj Highlights" worksheet XML is
+scanned for every cell (formula, inline string or shared string) that
+contains the default symbol, and the rest of the xlsx zip is packed into a
+reusable skeleton. Producing a per-symbol copy then only renders that one
+worksheet part; every other zip member is copied byte-for-byte.
+
+Usage:
+    from template_patcher import CompiledTemplate
+    compiled = CompiledTemplate.compile("FA1_vwijagme.xlsx", "IOCL")
+    compiled.write("HDFCB", "temp_HDFCB.xlsx")
+"""
+
+import io
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+
+SHEET_NAME = "BBG Adj Highlights"
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# A single <c> element, either self-closing or with children
+CELL_RE = re.compile(r"<c\b[^>]*?(?:/>|>.*?</c>)", re.S)
+CELL_REF_RE = re.compile(r'\br="[A-Z]+(\d+)"')
+CELL_TYPE_RE = re.compile(r'\s+t="[^"]*"')
+CACHED_VALUE_RE = re.compile(r"<v>.*?</v>|<v/>", re.S)
+SHARED_INDEX_RE = re.compile(r"<v>(\d+)</v>")
+STRING_ITEM_RE = re.compile(r"<si>(.*?)</si>|<si/>", re.S)
+# Rich-text runs keep their text in <t>; phonetic hints (<rPh>) are skipped
+TEXT_RE = re.compile(r"<rPh\b.*?</rPh>|<t\b[^>]*?(?:/>|>(.*?)</t>)", re.S)
+CALC_PR_RE = re.compile(r"<calcPr\b[^>]*?/>")
+# A cell's formula: attributes (t="shared" si="..") and text, empty for shared-formula children
+FORMULA_RE = re.compile(r"<f\b([^>]*?)(?:/>|>(.*?)</f>)", re.S)
+SHARED_ID_RE = re.compile(r'\bsi="(\d+)"')
+# Bloomberg data functions; each cell calling one is a data request
+DATA_FUNCTION_RE = re.compile(r"\b(?:_xll\.)?BD[HPS]\(", re.I)
+
+WORKBOOK_PART = "xl/workbook.xml"
+WORKBOOK_RELS_PART = "xl/_rels/workbook.xml.rels"
+CONTENT_TYPES_PART = "[Content_Types].xml"
+CALC_CHAIN_PART = "xl/calcChain.xml"
+
+
+def escape(text: str) -> str:
+    """XML-escape &, < and > (as xml.sax.saxutils.escape, which pulls in urllib at import)"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _unescape(text: str) -> str:
+    """Undo the XML escaping used inside <t> elements"""
+    return (text.replace("&lt;", "<").replace("&gt;", ">")
+                .replace("&quot;", '"').replace("&apos;", "'")
+                .replace("&amp;", "&"))
+
+
+def _shared_strings(xml: str) -> list:
+    """Return the plain text of every <si> entry in sharedStrings.xml"""
+    strings = []
+    for match in STRING_ITEM_RE.finditer(xml):
+        body = match.group(1) or ""
+        strings.append("".join(_unescape(t.group(1) or "")
+                               for t in TEXT_RE.finditer(body)
+                               if not t.group(0).startswith("<rPh")))
+    return strings
+
+
+def _member_info(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    """Fresh ZipInfo for a member so repeated writes never share state"""
+    member = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    member.compress_type = info.compress_type
+    member.external_attr = info.external_attr
+    return member
+
+
+def _resolve_sheet_part(archive: zipfile.ZipFile, sheet_name: str) -> str:
+    """Find the zip member holding the named worksheet"""
+    workbook = ET.fromstring(archive.read(WORKBOOK_PART))
+    rel_id = None
+    for sheet in workbook.iter(f"{{{NS_MAIN}}}sheet"):
+        if sheet.get("name") == sheet_name:
+            rel_id = sheet.get(f"{{{NS_REL}}}id")
+            break
+    if rel_id is None:
+        raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+    rels = ET.fromstring(archive.read(WORKBOOK_RELS_PART))
+    for rel in rels.iter(f"{{{NS_PKG_REL}}}Relationship"):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+    raise KeyError(f"Relationship {rel_id} for {sheet_name} not found")
+
+
+class CompiledTemplate:
+    """A template with the placeholder symbol locations precomputed"""
+
+    def __init__(self, source: bytes, sheet_name: str, sheet_part: str,
+                 sheet_parts: list, default_symbol: str, replacements: list,
+                 data_formulas: int = 0):
+        """
+        Use CompiledTemplate.compile() rather than calling this directly.
+
+        Args:
+            source: Original template file contents
+            sheet_name: Worksheet whose cells are rewritten
+            sheet_part: Zip member name of that worksheet
+            sheet_parts: Worksheet XML split at every placeholder occurrence
+            default_symbol: Placeholder symbol found in the template
+            replacements: Cell references of every patched cell
+            data_formulas: Cells calling BDH / BDP / BDS, the data hits of one symbol
+        """
+        self.source = source
+        self.sheet_name = sheet_name
+        self.sheet_part = sheet_part
+        self.sheet_parts = sheet_parts
+        self.default_symbol = default_symbol
+        self.replacements = replacements
+        self.data_formulas = data_formulas
+
+        with zipfile.ZipFile(io.BytesIO(source)) as archive:
+            self._infos = {info.filename: info for info in archive.infolist()}
+            self._originals = {
+                name: archive.read(name).decode("utf-8")
+                for name in (WORKBOOK_PART, WORKBOOK_RELS_PART, CONTENT_TYPES_PART)
+            }
+        self.workbook_xml = self._force_full_calc(self._originals[WORKBOOK_PART]).encode("utf-8")
+        self._skeletons = {}
+
+    @classmethod
+    def compile(cls, template_path, default_symbol: str = "IOCL",
+                sheet_name: str = SHEET_NAME, min_row: int = 2) -> "CompiledTemplate":
+        """
+        Scan the template once and record every cell containing the placeholder
+
+        Args:
+            template_path: Path to the Bloomberg Excel template (or its
+                           contents, e.g. a trimmed copy from template_catalog)
+            default_symbol: Symbol used in the template (the one to replace)
+            sheet_name: Worksheet whose cells are rewritten
+            min_row: First row eligible for replacement (row 1 is the header)
+
+        Returns:
+            CompiledTemplate ready to render per-symbol copies
+        """
+        placeholder = escape(default_symbol)
+        source = template_path if isinstance(template_path, bytes) else Path(template_path).read_bytes()
+
+        with zipfile.ZipFile(io.BytesIO(source)) as archive:
+            sheet_part = _resolve_sheet_part(archive, sheet_name)
+            sheet_xml = archive.read(sheet_part).decode("utf-8")
+            try:
+                shared = _shared_strings(archive.read("xl/sharedStrings.xml").decode("utf-8"))
+            except KeyError:
+                shared = []
+
+        parts = [""]
+        replacements = []
+        pos = 0
+        for match in CELL_RE.finditer(sheet_xml):
+            cell = match.group(0)
+            ref = CELL_REF_RE.search(cell)
+            if ref is not None and int(ref.group(1)) < min_row:
+                continue
+
+            patched = cls._prepare_cell(cell, default_symbol, placeholder, shared)
+            if patched is None:
+                continue
+
+            parts[-1] += sheet_xml[pos:match.start()]
+            segments = patched.split(placeholder)
+            parts[-1] += segments[0]
+            parts.extend(segments[1:])
+            replacements.append(ref.group(0)[3:-1] if ref else "?")
+            pos = match.end()
+        parts[-1] += sheet_xml[pos:]
+
+        return cls(source, sheet_name, sheet_part, parts, default_symbol, replacements,
+                   cls._count_data_formulas(sheet_xml))
+
+    @staticmethod
+    def _count_data_formulas(sheet_xml: str) -> int:
+        """Formula cells calling a Bloomberg data function (title and label cells are not)"""
+        count = 0
+        shared = {}
+        for match in FORMULA_RE.finditer(sheet_xml):
+            attrs, text = match.group(1), match.group(2)
+            index = SHARED_ID_RE.search(attrs)
+            if text:
+                calls = DATA_FUNCTION_RE.search(_unescape(text)) is not None
+                if index is not None:
+                    shared[index.group(1)] = calls
+            else:
+                # Shared-formula children repeat their master's formula
+                calls = index is not None and shared.get(index.group(1), False)
+            count += calls
+        return count
+
+    def _skeleton(self, exclude: frozenset) -> bytes:
+        """Zip archive with every member except the excluded ones, built once"""
+        if exclude not in self._skeletons:
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(io.BytesIO(self.source)) as archive, \
+                    zipfile.ZipFile(buffer, "w") as skeleton:
+                for info in archive.infolist():
+                    if info.filename not in exclude:
+                        skeleton.writestr(_member_info(info), archive.read(info))
+            self._skeletons[exclude] = buffer.getvalue()
+        return self._skeletons[exclude]
+
+    @staticmethod
+    def _prepare_cell(cell: str, default_symbol: str, placeholder: str, shared: list):
+        """
+        Return the cell XML to render per symbol, or None if it has no placeholder
+
+        Shared-string cells are turned into inline strings so sharedStrings.xml
+        stays untouched. Cached formula results are dropped so Excel cannot
+        show the template symbol's stale numbers before recalculating.
+        """
+        if 't="s"' in cell:
+            index = SHARED_INDEX_RE.search(cell)
+            if index is None or int(index.group(1)) >= len(shared):
+                return None
+            text = shared[int(index.group(1))]
+            if default_symbol not in text:
+                return None
+            head = CELL_TYPE_RE.sub("", cell[:cell.index(">")].rstrip("/"))
+            return (f'{head} t="inlineStr"><is><t xml:space="preserve">'
+                    f"{escape(text)}</t></is></c>")
+
+        if placeholder not in cell:
+            return None
+        if "<f" in cell:
+            return CACHED_VALUE_RE.sub("", cell)
+        if 't="inlineStr"' in cell:
+            return cell
+        return None
+
+    @staticmethod
+    def _force_full_calc(workbook_xml: str) -> str:
+        """Ask Excel to recalculate every formula when the copy is opened"""
+        calc_pr = CALC_PR_RE.search(workbook_xml)
+        if calc_pr is None:
+            return workbook_xml.replace("</workbook>", '<calcPr fullCalcOnLoad="1"/></workbook>')
+        tag = calc_pr.group(0)
+        if "fullCalcOnLoad" in tag:
+            patched = re.sub(r'fullCalcOnLoad="[^"]*"', 'fullCalcOnLoad="1"', tag)
+        else:
+            patched = tag[:-2].rstrip() + ' fullCalcOnLoad="1"/>'
+        return workbook_xml.replace(tag, patched)
+
+    def render_sheet(self, symbol: str) -> bytes:
+        """Return the worksheet XML with the placeholder replaced by symbol"""
+        return escape(symbol).join(self.sheet_parts).encode("utf-8")
+
+    def render(self, symbol: str) -> bytes:
+        """
+        Build the complete per-symbol xlsx in memory
+
+        Args:
+            symbol: Bloomberg symbol (e.g., HDFCB, IOCL)
+
+        Returns:
+            The xlsx file contents
+        """
+        buffer = io.BytesIO()
+        buffer.write(self._skeleton(frozenset((self.sheet_part, WORKBOOK_PART))))
+        with zipfile.ZipFile(buffer, "a") as archive:
+            archive.writestr(_member_info(self._infos[WORKBOOK_PART]), self.workbook_xml)
+            archive.writestr(_member_info(self._infos[self.sheet_part]),
+                             self.render_sheet(symbol))
+        return buffer.getvalue()
+
+    def write(self, symbol: str, output_path) -> int:
+        """
+        Write the per-symbol xlsx to disk
+
+        Args:
+            symbol: Bloomberg symbol (e.g., HDFCB, IOCL)
+            output_path: Where to save the patched template
+
+        Returns:
+            Number of cells that were rewritten
+        """
+        Path(output_path).write_bytes(self.render(symbol))
+        return len(self.replacements)
+
+    def render_pack(self, symbols: list) -> tuple:
+        """
+        Build one xlsx holding a copy of the sheet per symbol
+
+        The template sheet is renamed to the first symbol and clones for the
+        remaining symbols are appended after the last sheet, so existing
+        sheet indices (and sheet-local defined names) keep their meaning.
+        calcChain.xml is dropped because it only covers the original sheet;
+        Excel rebuilds it on the full recalculation.
+
+        Args:
+            symbols: Bloomberg symbols, one sheet each
+
+        Returns:
+            (xlsx file contents, {sheet name: symbol})
+        """
+        if not symbols:
+            raise ValueError("A pack needs at least one symbol")
+        sheet_rels = posixpath.join(posixpath.dirname(self.sheet_part), "_rels",
+                                    posixpath.basename(self.sheet_part) + ".rels")
+        if sheet_rels in self._infos:
+            raise ValueError(f"Cannot clone {self.sheet_name}: the sheet has its own relationships")
+
+        names = pack_sheet_names(symbols)
+        workbook = self._originals[WORKBOOK_PART]
+        rels = self._originals[WORKBOOK_RELS_PART]
+        content_types = self._originals[CONTENT_TYPES_PART]
+
+        # Rename the template sheet (and references to it) to the first symbol
+        sheet_tag = re.search(r'<sheet\b[^>]*\bname="%s"[^>]*/>' % re.escape(escape(self.sheet_name)),
+                              workbook).group(0)
+        quoted = "'%s'!" % escape(self.sheet_name).replace("'", "''")
+        workbook = workbook.replace(sheet_tag, sheet_tag.replace(
+            f'name="{escape(self.sheet_name)}"', f'name="{escape(names[0])}"'))
+        workbook = workbook.replace(quoted, "'%s'!" % escape(names[0]).replace("'", "''"))
+
+        next_id = max(int(i) for i in re.findall(r'<sheet\b[^>]*\bsheetId="(\d+)"', workbook)) + 1
+        sheet_dir = posixpath.dirname(self.sheet_part)
+        clones = []
+        new_sheets, new_rels, new_types = "", "", ""
+        for offset, name in enumerate(names[1:], start=1):
+            part = f"{sheet_dir}/pack_sheet{offset}.xml"
+            rel_id = f"rIdPack{offset}"
+            clones.append(part)
+            new_sheets += f'<sheet name="{escape(name)}" sheetId="{next_id + offset - 1}" r:id="{rel_id}"/>'
+            new_rels += (f'<Relationship Id="{rel_id}" Type="{NS_REL}/worksheet" '
+                         f'Target="{posixpath.relpath(part, "xl")}"/>')
+            new_types += (f'<Override PartName="/{part}" ContentType='
+                          '"application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>')
+        workbook = workbook.replace("</sheets>", new_sheets + "</sheets>")
+        workbook = self._force_full_calc(workbook)
+
+        # Drop the calculation chain
+        exclude = {self.sheet_part, WORKBOOK_PART, WORKBOOK_RELS_PART, CONTENT_TYPES_PART}
+        if CALC_CHAIN_PART in self._infos:
+            exclude.add(CALC_CHAIN_PART)
+            rels = re.sub(r'<Relationship\b[^>]*Target="[^"]*calcChain\.xml"[^>]*/>', "", rels)
+            content_types = re.sub(r'<Override\b[^>]*PartName="/xl/calcChain\.xml"[^>]*/>', "",
+                                   content_types)
+        rels = rels.replace("</Relationships>", new_rels + "</Relationships>")
+        content_types = content_types.replace("</Types>", new_types + "</Types>")
+
+        buffer = io.BytesIO()
+        buffer.write(self._skeleton(frozenset(exclude)))
+        with zipfile.ZipFile(buffer, "a") as archive:
+            archive.writestr(_member_info(self._infos[WORKBOOK_PART]), workbook.encode("utf-8"))
+            archive.writestr(_member_info(self._infos[WORKBOOK_RELS_PART]), rels.encode("utf-8"))
+            archive.writestr(_member_info(self._infos[CONTENT_TYPES_PART]),
+                             content_types.encode("utf-8"))
+            sheet_info = self._infos[self.sheet_part]
+            archive.writestr(_member_info(sheet_info), self.render_sheet(symbols[0]))
+            for part, symbol in zip(clones, symbols[1:]):
+                info = _member_info(sheet_info)
+                info.filename = part
+                # Only one tab may be selected, otherwise Excel groups the sheets
+                archive.writestr(info, self.render_sheet(symbol).replace(b' tabSelected="1"', b""))
+
+        return buffer.getvalue(), dict(zip(names, symbols))
+
+    def write_pack(self, symbols: list, output_path) -> dict:
+        """
+        Write a multi-symbol pack workbook to disk
+
+        Args:
+            symbols: Bloomberg symbols, one sheet each
+            output_path: Where to save the pack
+
+        Returns:
+            {sheet name: symbol} for every sheet in the pack
+        """
+        contents, sheets = self.render_pack(symbols)
+        Path(output_path).write_bytes(contents)
+        return sheets
+
+
+def pack_sheet_names(symbols: list) -> list:
+    """
+    Turn symbols into unique, valid Excel sheet names
+
+    Args:
+        symbols: Bloomberg symbols
+
+    Returns:
+        One sheet name per symbol, in the same order
+    """
+    names = []
+    seen = set()
+    for symbol in symbols:
+        base = re.sub(r"[\[\]:*?/\\]", "_", symbol).strip("'")[:31] or "Sheet"
+        name, n = base, 2
+        while name.upper() in seen:
+            suffix = f"~{n}"
+            name, n = base[:31 - len(suffix)] + suffix, n + 1
+        seen.add(name.upper())
+        names.append(name)
+    return names
@@ -0,0 +1,99 @@
+"""
+Bloomberg API backend tests against the stand-in service
+
+Covers how a pack's formulas are batched into requests, partial responses,
+retries, invalid securities / fields and the api refresh backend end to end.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from bloomberg_api import (BloombergApiError, HttpService, RequestPlan, StandInServer,
+                           _template_cells, parse_formula)
+from refresh_backends import (FIELD_NOT_APPLICABLE, INVALID, INVALID_SECURITY, READY,
+                              ApiBackend, FakeClock, wait_until_ready)
+from template_patcher import CompiledTemplate
+
+HERE = Path(__file__).parent
+TEMPLATE = HERE / "FA1_vwijagme_value_copy.xlsx"
+
+
+@pytest.fixture(scope="module")
+def cells():
+    """(key, formula) of a pack of the template for HDFCB, BSE and XXXX"""
+    return _template_cells(str(TEMPLATE), ["HDFCB", "BSE", "XXXX"])
+
+
+def _security(formula):
+    return parse_formula(formula)[1]
+
+
+def test_pack_needs_one_request_per_group(cells):
+    plan = RequestPlan.build(cells)
+    assert not plan.unsupported
+    requests = plan.requests()
+    assert len(requests) == len(plan.groups) == 4
+    assert all(request['securities'] == ["HDFCB IN Equity", "BSE IN Equity", "XXXX IN Equity"]
+               for request in requests)
+
+
+def test_requests_split_at_security_limit(cells):
+    plan = RequestPlan.build(cells)
+    assert len(plan.requests(max_securities=2)) == 8
+    assert all(len(request['securities']) <= 2 for request in plan.requests(max_securities=2))
+
+
+def test_fetch_follows_partial_responses_and_retries(cells):
+    plan = RequestPlan.build(cells)
+    with StandInServer(page_size=2, fail_every=3) as server:
+        service = HttpService(server.url)
+        values = plan.fetch(service)
+        service.close()
+    assert server.stats['requests'] == 4
+    assert server.stats['pages'] == 8
+    assert service.stats['retries'] == server.stats['failed'] > 0
+    assert all(isinstance(values[key], float)
+               for key, formula in cells if _security(formula) != "XXXX IN Equity")
+
+
+def test_invalid_security_and_field(cells):
+    plan = RequestPlan.build(cells)
+    field = plan.requests()[0]['fields'][0]
+    with StandInServer(invalid={"XXXX IN Equity"}, not_applicable={field}) as server:
+        service = HttpService(server.url)
+        values = plan.fetch(service)
+        service.close()
+    for key, formula in cells:
+        _, security, cell_field, *_ = parse_formula(formula)
+        if security == "XXXX IN Equity":
+            assert values[key] == INVALID_SECURITY
+        elif cell_field == field:
+            assert values[key] == FIELD_NOT_APPLICABLE
+        else:
+            assert isinstance(values[key], float)
+
+
+def test_too_many_securities_rejected(cells):
+    plan = RequestPlan.build(cells)
+    with StandInServer(max_securities=2) as server:
+        service = HttpService(server.url, max_securities=3)
+        with pytest.raises(BloombergApiError, match="BAD_ARGS"):
+            plan.fetch(service)
+        service.close()
+    assert server.stats['rejected'] == 1
+
+
+@pytest.mark.parametrize("symbol, status", [("HDFCB", READY), ("XXXX", INVALID)])
+def test_api_backend_refresh(tmp_path, symbol, status):
+    path = tmp_path / f"{symbol}.xlsx"
+    CompiledTemplate.compile(TEMPLATE).write(symbol, path)
+    with StandInServer(invalid={"XXXX IN Equity"}) as server:
+        backend = ApiBackend(url=server.url, clock=FakeClock())
+        workbook = backend.open_workbook(path)
+        ready = wait_until_ready(workbook, timeout=5, clock=backend.clock)
+        workbook.close()
+        backend.close()
+    assert ready['status'] == status
+    assert ready['elapsed'] == 0
+    assert server.stats['requests'] == 4
@@ -88,7 +88,8 @@ def main():
             print("="*60)
             print(f"\nFiles saved:")
             print(f"  📊 Excel: {result['excel']}")
-            print(f"  📄 Values: {result['values']}")
+            if result['values']:
+                print(f"  📄 Values: {result['values']}")
             print(f"  📝 CSV: {result['csv']}")
             print("\n" + "="*60 + "\n")
         
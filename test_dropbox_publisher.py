@@ -0,0 +1,103 @@
+"""
+Dropbox publisher tests against the stand-in server
+
+Covers batched commits, chunked uploads, content_hash skipping, retries with
+backoff on 429 / 5xx and failure entries in finish_batch_v2 replies. Backoff
+sleeps are recorded instead of slept.
+"""
+
+import pytest
+
+import dropbox_publisher
+from dropbox_publisher import DropboxClient, DropboxPublisher, StandInServer
+
+FINISH = "files/upload_session/finish_batch_v2"
+START = "files/upload_session/start"
+APPEND = "files/upload_session/append_v2"
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(dropbox_publisher.time, "sleep", slept.append)
+    return slept
+
+
+@pytest.fixture
+def outputs(tmp_path):
+    paths = []
+    for symbol in ("HDFCB", "BSE", "RELIANCE"):
+        path = tmp_path / f"{symbol}.csv"
+        path.write_text(f"symbol,revenue\n{symbol},{len(symbol) * 100}\n")
+        paths.append(path)
+    return paths
+
+
+def _publish(server, paths, retries=4, **options):
+    client = DropboxClient("stand-in", api_url=server.url, content_url=server.url, retries=retries)
+    publisher = DropboxPublisher(client, "/Bloomberg", **options)
+    for path in paths:
+        publisher.publish(path)
+    return publisher.close()
+
+
+def test_uploads_commit_in_one_batch(outputs):
+    with StandInServer() as server:
+        stats = _publish(server, outputs)
+        assert stats['uploaded'] == 3 and stats['failed'] == 0
+        assert stats['commits'] == 1
+        assert server.calls[FINISH] == 1
+        assert server.files["/bloomberg/hdfcb.csv"] == outputs[0].read_bytes()
+
+
+def test_commit_every_splits_batches(outputs):
+    with StandInServer() as server:
+        stats = _publish(server, outputs, workers=1, commit_every=2)
+        assert stats['uploaded'] == 3
+        assert stats['commits'] == server.calls[FINISH] == 2
+
+
+def test_large_file_uploads_in_chunks(tmp_path):
+    path = tmp_path / "HDFCB.csv"
+    path.write_bytes(b"x" * 25)
+    with StandInServer() as server:
+        stats = _publish(server, [path], chunk_size=10)
+        assert stats['uploaded'] == 1
+        assert server.calls[START] == 1 and server.calls[APPEND] == 2
+        assert server.files["/bloomberg/hdfcb.csv"] == b"x" * 25
+
+
+def test_unchanged_files_are_skipped(outputs):
+    with StandInServer() as server:
+        _publish(server, outputs)
+        outputs[1].write_text("symbol,revenue\nBSE,1\n")
+        stats = _publish(server, outputs)
+        assert stats['skipped'] == 2 and stats['uploaded'] == 1
+        assert server.calls[START] == 4
+        assert server.files["/bloomberg/bse.csv"] == b"symbol,revenue\nBSE,1\n"
+
+
+def test_throttled_and_failed_requests_are_retried(outputs, sleeps):
+    with StandInServer(errors={FINISH: [429, 503], START: [500]}) as server:
+        stats = _publish(server, outputs)
+        assert stats['uploaded'] == 3 and stats['failed'] == 0
+        assert server.calls[FINISH] == 3
+        # No Retry-After from the stand-in: exponential backoff per request
+        assert sorted(sleeps) == [1, 1, 2]
+
+
+def test_retries_give_up(outputs, sleeps):
+    with StandInServer(errors={FINISH: [503, 503]}) as server:
+        stats = _publish(server, outputs, retries=1)
+        assert stats['uploaded'] == 0 and stats['failed'] == 3
+        assert all("503" in message for message in stats['errors'].values())
+        assert sleeps == [1]
+        assert not server.files
+
+
+def test_failure_entries_count_as_failed(outputs):
+    with StandInServer(reject={"/bloomberg/bse.csv"}) as server:
+        stats = _publish(server, outputs)
+        assert stats['uploaded'] == 2 and stats['failed'] == 1
+        assert "insufficient_space" in stats['errors']["/Bloomberg/BSE.csv"]
+        assert "/bloomberg/bse.csv" not in server.files
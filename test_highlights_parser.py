@@ -0,0 +1,18 @@
+"""
+Highlights parser tests: Bloomberg display values decoded to numbers
+"""
+
+import numpy as np
+
+from highlights_parser import decode_numbers
+
+
+def test_decode_numbers():
+    values = [12.5, 7, "15,33,095.8", "(2,188.2)", "-5,000.5", " 3.1% ", "₹ 1,000",
+              "—", "#N/A Field Not Applicable", "#NAME?", "", None]
+    expected = [12.5, 7.0, 1533095.8, -2188.2, -5000.5, 3.1, 1000.0] + [np.nan] * 5
+    np.testing.assert_array_equal(decode_numbers(values), np.array(expected))
+
+
+def test_decode_numbers_all_numeric():
+    assert decode_numbers([1, 2.5, None]).tolist()[:2] == [1.0, 2.5]
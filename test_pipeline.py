@@ -0,0 +1,24 @@
+"""
+Pipeline tests: every refreshed symbol's stage record reaches the batch
+"""
+
+from pathlib import Path
+
+from download_bloomberg_data import BloombergDataDownloader
+from pipeline import Pipeline
+from refresh_backends import FakeBackend
+
+HERE = Path(__file__).parent
+
+
+def test_stage_records_are_forwarded(tmp_path):
+    downloader = BloombergDataDownloader(HERE / "FA1_vwijagme_value_copy.xlsx", tmp_path,
+                                         backend=FakeBackend(latency=0.05), formats=("csv",))
+    outcomes = list(Pipeline(downloader, wait_seconds=5).run([["HDFCB"], ["BSE", "IOCL"]]))
+    downloader.close()
+
+    records = [record for outcome in outcomes for record in outcome['metrics']]
+    assert sorted(record['symbol'] for record in records) == ["BSE", "HDFCB", "IOCL"]
+    assert all(record['stages'] for record in records)
+    # Drained as they were exported, like run_sequential does
+    assert downloader.metrics == []
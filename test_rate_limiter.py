@@ -0,0 +1,44 @@
+"""
+Rate limiter tests: the daily count carries over between runs on the same day
+"""
+
+import json
+from datetime import date
+
+import pytest
+
+from rate_limiter import RateLimiter, RateLimitExceeded
+
+
+def test_daily_count_carries_over(tmp_path):
+    state = tmp_path / "data_hits.json"
+    first = RateLimiter(per_day=300, state_path=state)
+    first.acquire(212)
+    first.close()
+    assert json.loads(state.read_text()) == {'day': date.today().isoformat(), 'used': 212}
+
+    second = RateLimiter(per_day=300, state_path=state)
+    assert second.stats()['used_today'] == 212
+    with pytest.raises(RateLimitExceeded):
+        second.acquire(106)
+    second.acquire(88)
+    second.close()
+    assert second.stats()['spent'] == 88
+    assert json.loads(state.read_text())['used'] == 300
+
+
+def test_concurrent_runs_add_up(tmp_path):
+    state = tmp_path / "data_hits.json"
+    one, two = (RateLimiter(per_day=1000, state_path=state) for _ in range(2))
+    one.acquire(100)
+    two.acquire(50)
+    one.close()
+    two.close()
+    two.close()
+    assert json.loads(state.read_text())['used'] == 150
+
+
+def test_other_day_starts_at_zero(tmp_path):
+    state = tmp_path / "data_hits.json"
+    state.write_text(json.dumps({'day': "2000-01-01", 'used': 999}))
+    assert RateLimiter(per_day=1000, state_path=state).stats()['used_today'] == 0
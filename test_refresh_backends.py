@@ -0,0 +1,156 @@
+"""
+Readiness polling tests against a stub xlwings workbook, and session
+recycling after failed refreshes in the fake backend
+
+The stub answers book.sheets[name].used_range the way xlwings does: values
+via .options(ndim=2).value (Excel errors read back as None) and formulas via
+.formula. Time is a FakeClock, so every scenario runs instantly.
+"""
+
+from pathlib import Path
+
+from refresh_backends import (BLANK_GRACE, INVALID, INVALID_SECURITY, NO_DATA, READY, TIMEOUT,
+                              ExcelWorkbook, FakeBackend, FakeClock, wait_until_ready)
+from template_patcher import CompiledTemplate
+
+HERE = Path(__file__).parent
+
+REQUESTING = "#N/A Requesting Data..."
+FORMULAS = [["Revenue", '=BDH("IOCL IN Equity","SALES_REV_TURN")'],
+            ["EBITDA", '=BDH("IOCL IN Equity","EBITDA")'],
+            ["Margin", "=B2/B1"]]
+
+
+class StubRange:
+    def __init__(self, sheet):
+        self.sheet = sheet
+
+    def options(self, ndim=None):
+        return self
+
+    @property
+    def value(self):
+        return self.sheet.values_at(self.sheet.clock.monotonic())
+
+    @property
+    def formula(self):
+        return tuple(tuple(row) for row in self.sheet.formulas)
+
+
+class StubSheet:
+    """One sheet whose cell values follow a timeline: [(from second, value grid)]"""
+
+    def __init__(self, name, clock, timeline, formulas=FORMULAS):
+        self.name = name
+        self.clock = clock
+        self.timeline = timeline
+        self.formulas = formulas
+
+    def values_at(self, now):
+        grid = self.timeline[0][1]
+        for since, values in self.timeline:
+            if now >= since:
+                grid = values
+        return [list(row) for row in grid]
+
+    @property
+    def used_range(self):
+        return StubRange(self)
+
+
+class StubSheets(list):
+    """book.sheets: iterable, and indexable by sheet name"""
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return next(sheet for sheet in self if sheet.name == key)
+        return super().__getitem__(key)
+
+
+class StubBook:
+    def __init__(self, sheets):
+        self.sheets = StubSheets(sheets)
+
+    def close(self):
+        pass
+
+
+def _wait(timeline, timeout=15, formulas=FORMULAS):
+    clock = FakeClock()
+    book = StubBook([StubSheet("BBG Adj Highlights", clock, timeline, formulas)])
+    workbook = ExcelWorkbook(app=None, book=book)
+    return wait_until_ready(workbook, timeout=timeout, poll_interval=0.5, clock=clock)
+
+
+def _grid(revenue, ebitda, margin):
+    return [["Revenue", revenue], ["EBITDA", ebitda], ["Margin", margin]]
+
+
+def test_ready_once_requests_resolve():
+    ready = _wait([(0, _grid(REQUESTING, REQUESTING, None)),
+                   (2, _grid(100.0, REQUESTING, None)),
+                   (4, _grid(100.0, 20.0, 0.2))])
+    assert ready['status'] == READY
+    assert ready['elapsed'] == 4
+    assert ready['blank'] == 0
+
+
+def test_error_cells_do_not_wait_for_timeout():
+    # #DIV/0! reads back as None: settled as soon as nothing is requesting data
+    ready = _wait([(0, _grid(REQUESTING, REQUESTING, None)),
+                   (1, _grid(0.0, 20.0, None))])
+    assert ready['status'] == READY
+    assert ready['elapsed'] == 1
+    assert ready['blank'] == 1
+
+
+def test_add_in_not_loaded_is_no_data():
+    # #NAME? on every formula cell: nothing is ever requested
+    ready = _wait([(0, _grid(None, None, None))])
+    assert ready['status'] == NO_DATA
+    assert ready['elapsed'] == BLANK_GRACE
+
+
+def test_blank_until_first_calculation():
+    ready = _wait([(0, _grid(None, None, None)),
+                   (1, _grid(REQUESTING, REQUESTING, None)),
+                   (2, _grid(100.0, 20.0, 5.0))])
+    assert ready['status'] == READY
+    assert ready['elapsed'] == 2
+
+
+def test_stuck_request_times_out():
+    ready = _wait([(0, _grid(REQUESTING, 20.0, None))], timeout=5)
+    assert ready['status'] == TIMEOUT
+    assert ready['pending'] == 1
+    assert ready['elapsed'] == 5
+
+
+def test_invalid_security():
+    ready = _wait([(0, _grid(REQUESTING, REQUESTING, None)),
+                   (1, _grid(INVALID_SECURITY, INVALID_SECURITY, None))])
+    assert ready['status'] == INVALID
+    assert ready['elapsed'] == 1
+
+
+def _fake_refresh(tmp_path, symbol, **options):
+    """Refresh one symbol's copy of the bundled template in a FakeBackend; returns (status, pool stats)"""
+    path = tmp_path / f"{symbol}.xlsx"
+    CompiledTemplate.compile(HERE / "FA1_vwijagme_value_copy.xlsx").write(symbol, path)
+    backend = FakeBackend(latency=1.0, clock=FakeClock(), **options)
+    workbook = backend.open_workbook(path)
+    ready = wait_until_ready(workbook, timeout=5, clock=backend.clock)
+    workbook.close()
+    return ready['status'], backend.pool.stats
+
+
+def test_timed_out_refresh_recycles_session(tmp_path):
+    status, stats = _fake_refresh(tmp_path, "HDFCB", never_resolve={"HDFCB"})
+    assert status == TIMEOUT
+    assert stats['recycled'] == 1
+
+
+def test_invalid_security_keeps_session(tmp_path):
+    status, stats = _fake_refresh(tmp_path, "HDFCB", invalid_symbols={"HDFCB"})
+    assert status == INVALID
+    assert stats['recycled'] == 0
@@ -0,0 +1,43 @@
+"""
+Refresh cache tests: result dates reach the symbols a run actually uses
+"""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from listing_map import ListingMap
+from refresh_cache import FRESH, NEW_RESULTS, RefreshCache, load_result_dates
+
+HERE = Path(__file__).parent
+
+
+@pytest.fixture(scope="module")
+def result_dates(tmp_path_factory):
+    """load_result_dates() over copies of the repo CSVs (the listing map cache goes to tmp)"""
+    folder = tmp_path_factory.mktemp("listings")
+    for name in ("BB_symbol.csv", "query-results.csv"):
+        shutil.copy(HERE / name, folder / name)
+    listings = folder / "query-results.csv"
+    listing_map = ListingMap.load(folder / "BB_symbol.csv", listings)
+    return load_result_dates(listings, listing_map)
+
+
+def test_listed_symbol_gets_result_date(result_dates):
+    # Keyed the way --symbols HDFCB spells it, not "HDFCB IN"
+    assert result_dates.get("HDFCB") == (202509, 202503)
+    assert not any(" " in symbol for symbol in result_dates)
+
+
+def test_new_results_invalidate_cached_symbol(tmp_path, result_dates):
+    output = tmp_path / "HDFCB.csv"
+    output.write_text("x")
+    cache = RefreshCache(tmp_path / "refresh_cache.sqlite")
+    cache.record("HDFCB", {'csv': str(output), 'periods': []}, seconds=12.0, dates=(202506, 202503))
+    cache.record("RELIANCE", {'csv': str(output), 'periods': []}, seconds=12.0,
+                 dates=result_dates["RELIANCE"])
+
+    plan = cache.plan(["HDFCB", "RELIANCE"], result_dates)
+    assert plan['reasons'] == {"HDFCB": NEW_RESULTS, "RELIANCE": FRESH}
+    cache.close()
@@ -0,0 +1,23 @@
+"""
+Template patcher tests: data hits counted from the Bloomberg formula cells
+"""
+
+from pathlib import Path
+
+from template_patcher import CompiledTemplate
+
+HERE = Path(__file__).parent
+
+
+def test_data_formulas_exclude_title_cell():
+    compiled = CompiledTemplate.compile(HERE / "FA1_vwijagme_value_copy.xlsx")
+    # The title cell holds the symbol too, but requests no data
+    assert len(compiled.replacements) == 106
+    assert compiled.data_formulas == 105
+
+
+def test_shared_formula_children_count():
+    sheet = ('<c r="B2"><f t="shared" ref="B2:D2" si="0">_xll.BDP("IOCL IN Equity","PX_LAST")</f></c>'
+             '<c r="C2"><f t="shared" si="0"/></c><c r="D2"><f t="shared" si="0"/></c>'
+             '<c r="E2"><f>SUM(B2:D2)</f></c><c r="F2"><f>BDH(&quot;IOCL IN Equity&quot;,&quot;EBITDA&quot;)</f></c>')
+    assert CompiledTemplate._count_data_formulas(sheet) == 4